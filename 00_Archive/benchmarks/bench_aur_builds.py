@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the parallel AUR build engine against local git repos standing in for the AUR.
+Version: 1.3.0
+
+What the script does
+--------------------
+Creates a throw-away "AUR": one local git repo per pkgbase with a .SRCINFO,
+forming a small graph (lib-b <- lib-a <- app-1, app-2; app-2 also needs
+lib-split-core, one package of the split pkgbase lib-split; plus independent
+themes), serves a stand-in AUR RPC ($AUR_RPC_URL) that maps package names to
+their pkgbase, and puts stub `makepkg` and `pacman` commands first on PATH:
+
+- `makepkg --packagelist` prints the package files, `makepkg` sleeps
+  --build-sec seconds and writes them (logging the build order),
+- `pacman -Slq` lists a few "repository" packages.
+
+Privileged commands go to a recording stand-in for the sudo runner, and the
+local package database is an empty directory, so nothing counts as installed.
+It then times `utils.aur.install_packages()` with one job (serial), with
+--jobs (default: CPU count), once more with every package already built
+(local cache hit), and once as a "new machine": local cache wiped, builds
+fetched from the shared artifact cache (a directory the earlier runs
+published to, served by a local plain-HTTP server). The stub makepkg signs
+what it builds with a throw-away GnuPG key, and the shared run trusts only
+that key ($AUR_ARTIFACT_CACHE_KEYRING), as plain http requires. It checks
+that every dependency was built before its users and that only the wanted
+package of the split pkgbase is installed.
+
+Usage
+-----
+    cd 00_Archive && python3 benchmarks/bench_aur_builds.py [--themes 6] [--build-sec 0.5] [--jobs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_TMP = Path(tempfile.mkdtemp(prefix="aur-bench-"))
+os.environ["DOTFILES_STATE_DIR"] = str(_TMP / "state")
+os.environ["DOTFILES_CACHE_DIR"] = str(_TMP / "cache")
+os.environ["PACMAN_LOCAL_DB"] = str(_TMP / "localdb")
+os.environ["GNUPGHOME"] = str(_TMP / "gnupg")
+
+from utils import artifact_cache, aur  # noqa: E402
+
+MAKEPKG = r"""#!/bin/sh
+ver=$(sed -n 's/^\tpkgver = //p' .SRCINFO)-$(sed -n 's/^\tpkgrel = //p' .SRCINFO)
+names=$(sed -n 's/^pkgname = //p' .SRCINFO)
+if [ "$1" = "--packagelist" ]; then
+    for n in $names; do echo "$PKGDEST/$n-$ver-x86_64.pkg.tar.zst"; done
+    exit 0
+fi
+echo "start $(basename "$PWD") $(date +%s.%N)" >> "$BENCH_ORDER"
+sleep "$BENCH_BUILD_SEC"
+for n in $names; do
+    echo built > "$PKGDEST/$n-$ver-x86_64.pkg.tar.zst"
+    gpg --batch --yes --quiet --detach-sign -o "$PKGDEST/$n-$ver-x86_64.pkg.tar.zst.sig" "$PKGDEST/$n-$ver-x86_64.pkg.tar.zst"
+done
+echo "done $(basename "$PWD") $(date +%s.%N)" >> "$BENCH_ORDER"
+"""
+
+PACMAN = """#!/bin/sh
+[ "$1" = "-Slq" ] && printf 'glibc\\ngtk3\\nqt5-base\\n'
+"""
+
+
+def _make_repo(root: Path, base: str, depends: List[str], pkgnames: List[str]) -> None:
+    repo = root / base
+    repo.mkdir(parents=True)
+    lines = [f"pkgbase = {base}", "\tpkgver = 1.0", "\tpkgrel = 1"]
+    lines += [f"\tdepends = {dep}" for dep in depends]
+    for pkgname in pkgnames:
+        lines += ["", f"pkgname = {pkgname}"]
+    lines.append("")
+    (repo / ".SRCINFO").write_text("\n".join(lines), encoding="utf-8")
+    git = ["git", "-C", str(repo), "-c", "user.name=bench", "-c", "user.email=bench@localhost"]
+    subprocess.run(["git", "init", "-q", str(repo)], check=True)
+    subprocess.run([*git, "add", "."], check=True)
+    subprocess.run([*git, "commit", "-qm", "init"], check=True)
+
+
+def _make_signing_key(keyring: Path) -> None:
+    """A passphrase-less key in $GNUPGHOME (the "builder") and its public key in `keyring`."""
+    Path(os.environ["GNUPGHOME"]).mkdir(mode=0o700)
+    subprocess.run(["gpg", "--batch", "--quiet", "--passphrase", "", "--quick-gen-key",
+                    "bench@localhost", "ed25519", "sign", "never"], check=True, capture_output=True)
+    with open(keyring, "wb") as fh:
+        subprocess.run(["gpg", "--batch", "--export"], check=True, stdout=fh)
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _rpc_handler(base_of: Dict[str, str]):
+    """AUR RPC `info` stand-in: answers Name/PackageBase/Version for the fake AUR's package names."""
+
+    class Handler(_QuietHandler):
+        def do_GET(self) -> None:
+            names = parse_qs(urlparse(self.path).query).get("arg[]", [])
+            results = [{"Name": n, "PackageBase": base_of[n], "Version": "1.0-1"} for n in names if n in base_of]
+            body = json.dumps({"type": "multiinfo", "results": results}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+class _Runner:
+    """Stand-in for the sudo runner: records commands, always succeeds."""
+
+    def __init__(self) -> None:
+        self.commands: List[List[str]] = []
+
+    def __call__(self, cmd, check=False, capture_output=False, **kwargs):
+        self.commands.append(list(cmd))
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--themes", type=int, default=6, help="independent leaf packages")
+    parser.add_argument("--build-sec", type=float, default=0.5)
+    parser.add_argument("--jobs", type=int, default=None, help="parallel builds (default: CPU count)")
+    args = parser.parse_args()
+
+    server = rpc_server = None
+    try:
+        remote = _TMP / "aur"
+        graph: Dict[str, List[str]] = {
+            "lib-b": ["glibc"],
+            "lib-a": ["lib-b", "gtk3>=3.24"],
+            "app-1": ["lib-a"],
+            "app-2": ["lib-a", "lib-split-core", "qt5-base"],
+            "lib-split": ["glibc"],
+        }
+        graph.update({f"theme-{i}": ["gtk3"] for i in range(args.themes)})
+        pkgnames = {base: [base] for base in graph}
+        pkgnames["lib-split"] = ["lib-split-core", "lib-split-extra"]
+        base_of = {pkgname: base for base, names in pkgnames.items() for pkgname in names}
+        for base, depends in graph.items():
+            _make_repo(remote, base, depends, pkgnames[base])
+        (_TMP / "localdb").mkdir()
+        stubs = _TMP / "bin"
+        stubs.mkdir()
+        for name, body in (("makepkg", MAKEPKG), ("pacman", PACMAN)):
+            (stubs / name).write_text(body, encoding="utf-8")
+            (stubs / name).chmod(0o755)
+        os.environ["PATH"] = f"{stubs}{os.pathsep}{os.environ['PATH']}"
+        os.environ["BENCH_BUILD_SEC"] = str(args.build_sec)
+        order_log = _TMP / "order.log"
+        os.environ["BENCH_ORDER"] = str(order_log)
+
+        _make_signing_key(_TMP / "trusted.gpg")
+        os.environ["AUR_ARTIFACT_CACHE_KEYRING"] = str(_TMP / "trusted.gpg")
+
+        shared = _TMP / "shared"
+        shared.mkdir()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=str(shared)))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        rpc_server = ThreadingHTTPServer(("127.0.0.1", 0), _rpc_handler(base_of))
+        threading.Thread(target=rpc_server.serve_forever, daemon=True).start()
+        os.environ["AUR_RPC_URL"] = f"http://127.0.0.1:{rpc_server.server_address[1]}/rpc/v5/info"
+
+        targets = ["app-1", "app-2"] + [f"theme-{i}" for i in range(args.themes)]
+        template = str(remote / "{name}")
+        results = {}
+        runs = (("serial", 1), ("parallel", args.jobs), ("cached", args.jobs), ("shared", args.jobs))
+        for label, jobs in runs:
+            if label != "cached":
+                shutil.rmtree(aur.cache_dir() / "pkg", ignore_errors=True)
+                shutil.rmtree(artifact_cache.local_dir(), ignore_errors=True)
+            if label == "shared":
+                # New machine: nothing local, signed builds come from the HTTP server
+                os.environ["AUR_ARTIFACT_CACHE"] = f"http://127.0.0.1:{server.server_address[1]}"
+            else:
+                if label != "cached":
+                    shutil.rmtree(shared, ignore_errors=True)
+                    shared.mkdir()
+                os.environ["AUR_ARTIFACT_CACHE"] = str(shared)
+            order_log.write_text("", encoding="utf-8")
+            runner = _Runner()
+            started = time.perf_counter()
+            ok = aur.install_packages(targets, runner, jobs=jobs, url_template=template)
+            results[label] = time.perf_counter() - started
+            assert ok, f"{label} run failed"
+
+            events = [line.split() for line in order_log.read_text(encoding="utf-8").splitlines()]
+            finished = {base: float(t) for kind, base, t in events if kind == "done"}
+            for kind, base, t in events:
+                if kind == "start":
+                    for dep in graph[base]:
+                        dep = base_of.get(dep, dep)
+                        assert dep not in graph or finished[dep] <= float(t), f"{base} built before {dep}"
+            installs = sum(1 for c in runner.commands if c[:2] == ["pacman", "-U"])
+            installed = " ".join(" ".join(c) for c in runner.commands if c[:2] == ["pacman", "-U"])
+            assert "lib-split-core-" in installed and "lib-split-extra-" not in installed, "wrong split packages"
+            repo_installs = sum(1 for c in runner.commands if c[:2] == ["pacman", "-S"])
+            if label == "shared":
+                assert not finished, "shared run should not build anything"
+            print(f"{label:<9} {results[label]:6.2f}s  {len(finished):2d} build(s), "
+                  f"{installs} pacman -U call(s), {repo_installs} pacman -S call(s) for repo deps")
+        print(f"speedup parallel vs serial: {results['serial'] / results['parallel']:.1f}x "
+              f"({args.jobs or os.cpu_count()} job(s), {args.build_sec}s per build)")
+        return 0
+    finally:
+        for srv in (server, rpc_server):
+            if srv is not None:
+                srv.shutdown()
+        shutil.rmtree(_TMP, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark: AUR metadata cache against a local stand-in for the AUR RPC.
+Version: 1.0.0
+
+What the script does
+--------------------
+Serves `/rpc/v5/info?arg[]=...` from a local HTTP server that knows --packages
+fake AUR packages and counts requests, builds a fixture local pacman database
+in which every package is installed (a few with an older version), and puts
+a stub `yay` first on PATH that records whether it was started. It then runs
+`utils.yay.install_packages()` with yay as the builder:
+
+1) cold cache   -> one batched RPC request (per 100 names); yay started only
+                   for the outdated packages,
+2) warm cache   -> no request,
+3) TTL expired  -> one batched request again,
+4) all current  -> (outdated packages "upgraded" in the fixture) yay not started.
+
+Cache and state go to throw-away directories.
+
+Usage
+-----
+    cd 00_Archive && python3 benchmarks/bench_aur_rpc.py [--packages 40] [--outdated 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_TMP = Path(tempfile.mkdtemp(prefix="aur-rpc-bench-"))
+os.environ["DOTFILES_STATE_DIR"] = str(_TMP / "state")
+os.environ["DOTFILES_CACHE_DIR"] = str(_TMP / "cache")
+os.environ["PACMAN_LOCAL_DB"] = str(_TMP / "localdb")
+os.environ["AUR_BUILDER"] = "yay"
+
+from utils import yay  # noqa: E402
+
+YAY = """#!/bin/sh
+echo "$@" >> "$BENCH_YAY_LOG"
+"""
+
+
+class _RpcHandler(BaseHTTPRequestHandler):
+    packages: Dict[str, str] = {}
+    requests: List[int] = []
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        names = parse_qs(url.query).get("arg[]", [])
+        self.requests.append(len(names))
+        results = [{"Name": n, "PackageBase": n, "Version": self.packages[n], "Depends": ["glibc"],
+                    "LastModified": 1700000000} for n in names if n in self.packages]
+        body = json.dumps({"version": 5, "type": "multiinfo", "resultcount": len(results),
+                           "results": results}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _install_fixture(db: Path, name: str, version: str) -> None:
+    entry = db / f"{name}-{version}"
+    entry.mkdir(parents=True)
+    (entry / "desc").write_text(f"%NAME%\n{name}\n\n%VERSION%\n{version}\n\n%REASON%\n0\n", encoding="utf-8")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--packages", type=int, default=40)
+    parser.add_argument("--outdated", type=int, default=3)
+    args = parser.parse_args()
+
+    server = None
+    try:
+        names = [f"aur-pkg-{i}" for i in range(args.packages)]
+        _RpcHandler.packages = {n: "1.2.0-1" for n in names}
+        for i, name in enumerate(names):
+            _install_fixture(_TMP / "localdb", name, "1.1.9-3" if i < args.outdated else "1.2.0-1")
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _RpcHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        os.environ["AUR_RPC_URL"] = f"http://127.0.0.1:{server.server_address[1]}/rpc/v5/info"
+
+        stubs = _TMP / "bin"
+        stubs.mkdir()
+        (stubs / "yay").write_text(YAY, encoding="utf-8")
+        (stubs / "yay").chmod(0o755)
+        os.environ["PATH"] = f"{stubs}{os.pathsep}{os.environ['PATH']}"
+        yay_log = _TMP / "yay.log"
+        os.environ["BENCH_YAY_LOG"] = str(yay_log)
+
+        for label in ("cold", "warm", "expired", "current"):
+            if label == "expired":
+                os.environ["AUR_RPC_TTL_HOURS"] = "0"
+            if label == "current":
+                os.environ["AUR_RPC_TTL_HOURS"] = "6"
+                for name in names[:args.outdated]:
+                    shutil.rmtree(_TMP / "localdb" / f"{name}-1.1.9-3")
+                    _install_fixture(_TMP / "localdb", name, "1.2.0-1")
+            yay_log.write_text("", encoding="utf-8")
+            before = len(_RpcHandler.requests)
+            started = time.perf_counter()
+            assert yay.install_packages(names)
+            elapsed = (time.perf_counter() - started) * 1000
+            calls = yay_log.read_text(encoding="utf-8").splitlines()
+            upgraded = calls[0].split()[3:] if calls else []
+            requests = _RpcHandler.requests[before:]
+            print(f"{label:<8} {elapsed:7.1f} ms  {len(requests)} RPC request(s) for {sum(requests)} name(s); "
+                  f"yay started {len(calls)}x for {len(upgraded)} outdated package(s)")
+            assert sorted(upgraded) == ([] if label == "current" else sorted(names[:args.outdated]))
+            assert (len(requests) == 0) == (label in ("warm", "current"))
+        return 0
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(_TMP, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
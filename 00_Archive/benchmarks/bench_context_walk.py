@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark: context.py file collection on a synthetic tree (default 100k files).
+Version: 1.0.0
+
+What the script does
+--------------------
+Builds a throw-away tree in a temp directory: source folders with a mix of
+whitelisted and other extensions, plus blacklisted (`__pycache__`, `theme`) and
+git-ignored (`build/`) folders full of files. Then it times:
+
+1) legacy      the previous walker (os.walk + per-file path split and folder scan),
+2) compiled    `context.collect_files()` with compiled rules, early pruning and .gitignore,
+3) cached      the same walker with a warm `.context-cache` directory index,
+4) git         `context.collect_git_files()` (only with --git; indexing 100k files takes a while).
+
+The legacy walker does not know about .gitignore, so its result is compared
+against the compiled walker run with `use_gitignore=False`.
+
+Usage
+-----
+    cd 00_Archive && python3 benchmarks/bench_context_walk.py [--files 100000] [--git]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import context  # noqa: E402
+
+EXTENSIONS = [".py", ".sh", ".md", ".txt", ".json", ".qml", ".png", ".desktop"]
+FILES_PER_DIR = 50
+
+
+def _legacy_collect(root: str) -> List[str]:
+    """The walker as it was before the compiled rules (kept verbatim for comparison)."""
+    def is_included_file(filepath):
+        filename = os.path.basename(filepath)
+        folder_parts = filepath.split(os.sep)
+        if filename in context.BLACKLIST_FILES:
+            return False
+        for part in folder_parts:
+            if part in context.BLACKLIST_FOLDERS:
+                return False
+        _, ext = os.path.splitext(filename)
+        return ext in context.WHITELIST_EXTENSIONS
+
+    included_files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in context.BLACKLIST_FOLDERS]
+        for filename in filenames:
+            filepath = os.path.join(dirpath, filename)
+            if is_included_file(filepath):
+                included_files.append(filepath)
+    return sorted(included_files)
+
+
+def _build_tree(root: Path, total_files: int) -> None:
+    """Spread `total_files` files over pkgNNN/modNN/{src,__pycache__,theme,build} folders."""
+    (root / ".gitignore").write_text("build/\n*.log\n", encoding="utf-8")
+    dirs = max(1, total_files // FILES_PER_DIR)
+    kinds = ["src", "src", "__pycache__", "theme", "build"]  # 40% of the files are never included
+    for d in range(dirs):
+        folder = root / f"pkg{d // 100:03d}" / f"mod{d % 100:02d}" / kinds[d % len(kinds)]
+        folder.mkdir(parents=True, exist_ok=True)
+        for i in range(FILES_PER_DIR):
+            (folder / f"file{i:02d}{EXTENSIONS[i % len(EXTENSIONS)]}").touch()
+
+
+def _time(label: str, fn: Callable[[], List[str]]) -> Tuple[float, List[str]]:
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {elapsed * 1000:9.1f} ms   {len(result):7d} files")
+    return elapsed, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--git", action="store_true", help="Also time git ls-files (runs git init/add)")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="ctx-bench-"))
+    try:
+        print(f"Building {args.files} files under {tmp} ...")
+        _build_tree(tmp, args.files)
+        root = str(tmp)
+
+        legacy_sec, legacy = _time("legacy", lambda: _legacy_collect(root))
+        _, no_ignore = _time("compiled*", lambda: context.collect_files(root, rules=context.compile_rules(False)))
+        compiled_sec, compiled = _time("compiled", lambda: context.collect_files(root))
+        cache = {"dirs": {}}
+        context.collect_files(root, cache=cache)
+        cached_sec, cached = _time("cached", lambda: context.collect_files(root, cache=cache))
+        if args.git:
+            subprocess.run(["git", "-C", root, "init", "-q"], check=True)
+            subprocess.run(["git", "-C", root, "add", "-A"], check=True)
+            _time("git", lambda: context.collect_git_files(root) or [])
+
+        print("(* compiled rules without .gitignore, same semantics as legacy)")
+        assert legacy == no_ignore, "compiled walker disagrees with the legacy walker"
+        assert compiled == cached, "cached walk disagrees with a fresh walk"
+        print(f"speedup vs legacy: compiled {legacy_sec / compiled_sec:.1f}x, cached {legacy_sec / cached_sec:.1f}x")
+        return 0
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the built-in mirror prober against local stand-in mirrors.
+Version: 1.0.0
+
+What the script does
+--------------------
+Starts N local HTTP servers, each acting as a mirror with its own artificial
+latency (delay before the first byte) and bandwidth limit, plus one server
+for a mirror status JSON that lists them. A few mirrors are "broken" and
+answer 404. Then it:
+
+1) ranks them with `utils.mirrors.rank_with_probe()` (concurrent, capped at
+   --connections), and checks that the order matches the expected one
+   (lowest ttfb + SCORE_BYTES / bandwidth first, broken mirrors left out),
+2) times the same probes one after another, for comparison,
+3) runs a second round to show the history blending (samples = 2).
+
+State (the probe history) goes to a throw-away DOTFILES_STATE_DIR.
+
+Usage
+-----
+    cd 00_Archive && python3 benchmarks/bench_mirror_probe.py [--mirrors 12] [--connections 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["DOTFILES_STATE_DIR"] = tempfile.mkdtemp(prefix="mirror-bench-state-")
+
+from utils import mirrors  # noqa: E402
+
+PAYLOAD = os.urandom(mirrors.PROBE_BYTES + 1)
+CHUNK = 16 * 1024
+
+
+def _mirror_handler(latency: float, bandwidth: float, broken: bool):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 (http.server API)
+            time.sleep(latency)
+            if broken or not self.path.endswith(mirrors.PROBE_PATH):
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(PAYLOAD)))
+            self.end_headers()
+            for offset in range(0, len(PAYLOAD), CHUNK):
+                self.wfile.write(PAYLOAD[offset:offset + CHUNK])
+                time.sleep(CHUNK / bandwidth)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    return Handler
+
+
+def _status_handler(body: bytes):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    return Handler
+
+
+def _serve(handler) -> Tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mirrors", type=int, default=12)
+    parser.add_argument("--broken", type=int, default=2)
+    parser.add_argument("--connections", type=int, default=mirrors.MAX_CONNECTIONS)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    servers = []
+    specs: Dict[str, Tuple[float, float, bool]] = {}
+    try:
+        for index in range(args.mirrors):
+            latency = rng.uniform(0.02, 0.25)
+            bandwidth = rng.uniform(1, 8) * 1024 * 1024
+            broken = index < args.broken
+            server, url = _serve(_mirror_handler(latency, bandwidth, broken))
+            servers.append(server)
+            specs[url] = (latency, bandwidth, broken)
+
+        now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        # The stand-ins speak plain HTTP but are listed as "https" to pass the candidate filter.
+        status = {"urls": [
+            {"url": url, "protocol": "https", "active": True, "country": "Testland", "country_code": "TL",
+             "completion_pct": 1.0, "last_sync": now, "score": 1.0}
+            for url in specs
+        ]}
+        status_server, status_url = _serve(_status_handler(json.dumps(status).encode()))
+        servers.append(status_server)
+        expected = sorted((u for u, s in specs.items() if not s[2]),
+                          key=lambda u: specs[u][0] + mirrors.SCORE_BYTES / specs[u][1])
+
+        started = time.perf_counter()
+        ranked = mirrors.rank_with_probe(["Testland"], keep=len(specs), status_url=status_url,
+                                         max_connections=args.connections)
+        concurrent_sec = time.perf_counter() - started
+        assert ranked is not None, "no mirror answered"
+        order = [url[: -len(mirrors.SERVER_SUFFIX)] for url in ranked[0]]
+
+        semaphore = threading.Semaphore(1)
+        started = time.perf_counter()
+        for url in specs:
+            mirrors.probe_mirror(url, semaphore)
+        serial_sec = time.perf_counter() - started
+
+        ranked_again = mirrors.rank_with_probe(["Testland"], keep=len(specs), candidates=list(specs),
+                                               max_connections=args.connections)
+
+        print(f"{'rank':<5} {'expected':<8} {'latency':>8} {'MiB/s':>6} {'ttfb ms':>8} {'KiB/s':>8} samples")
+        for rank, (server_url, measured) in enumerate(ranked_again[1].items(), 1):
+            base = server_url[: -len(mirrors.SERVER_SUFFIX)]
+            latency, bandwidth, _ = specs[base]
+            print(f"{rank:<5} {expected.index(base) + 1:<8} {latency * 1000:7.0f}  {bandwidth / 2**20:6.1f} "
+                  f"{measured['ttfb_ms']:8.1f} {measured['kib_s']:8.0f} {measured['samples']:>7}")
+        print(f"probe {len(specs)} mirrors: concurrent {concurrent_sec:.2f}s "
+              f"({args.connections} connections), serial {serial_sec:.2f}s")
+        assert len(order) == len(expected), "broken mirrors should be left out"
+        displaced = sum(1 for a, b in zip(order[:3], expected[:3]) if a != b)
+        print(f"top 3 matches expected order: {displaced == 0}")
+        return 0
+    finally:
+        for server in servers:
+            server.shutdown()
+        shutil.rmtree(os.environ["DOTFILES_STATE_DIR"], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
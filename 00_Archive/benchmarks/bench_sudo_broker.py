@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-command latency of the privileged broker vs `sudo -n`.
+Version: 1.0.0
+
+What the script does
+--------------------
+Starts a real sudo session (asks for your password once), then runs the same
+trivial command N times through:
+
+1) the persistent broker used by `utils.sudo_session` (one socket round-trip), and
+2) the previous path: one `sudo -n <cmd>` fork/exec per command,
+
+and prints mean / p50 / p95 latency in milliseconds for both.
+
+Usage
+-----
+    cd 00_Archive && python3 benchmarks/bench_sudo_broker.py [-n 200] [--cmd test -e /etc]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.sudo_session import start_sudo_session  # noqa: E402
+
+
+def _measure(fn: Callable[[], object], iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _summary(label: str, samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return (f"{label:<10} mean {statistics.mean(samples):7.2f} ms   "
+            f"p50 {statistics.median(samples):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("--cmd", nargs="+", default=["true"], help="Command to run as root")
+    args = parser.parse_args()
+
+    run, close = start_sudo_session()
+    try:
+        # Silence the per-command "$ sudo -n ..." action lines while measuring.
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(args.cmd, check=False, capture_output=True)  # warm-up
+            broker = _measure(lambda: run(args.cmd, check=False, capture_output=True), args.iterations)
+            direct = _measure(
+                lambda: subprocess.run(["sudo", "-n", *args.cmd], check=False, capture_output=True, text=True),
+                args.iterations,
+            )
+    finally:
+        close()
+
+    print(f"\nPer-command latency for {' '.join(args.cmd)!r} over {args.iterations} runs:")
+    print(_summary("broker", broker))
+    print(_summary("sudo -n", direct))
+    print(f"speed-up   {statistics.mean(direct) / statistics.mean(broker):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
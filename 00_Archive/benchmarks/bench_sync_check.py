@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: conditional sync-database check against a local fake repo.
+Version: 1.0.0
+
+What the script does
+--------------------
+Serves a throw-away directory laid out like an Arch mirror
+(`<repo>/os/<arch>/<repo>.db`) over a local HTTP server, writes a
+pacman.conf + mirrorlist pointing at it, and walks `utils.sync_db` through:
+
+1) no record yet            -> upgrade needed (validators are captured),
+2) record, nothing changed  -> skip (304 Not Modified), timed over -n rounds,
+3) one database touched     -> upgrade needed, naming the changed repo,
+4) mirror switched          -> upgrade needed.
+
+No pacman is started; the upgrade itself is replaced by recording the state.
+State goes to a throw-away DOTFILES_STATE_DIR.
+
+Usage
+-----
+    cd 00_Archive && python3 benchmarks/bench_sync_check.py [-n 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["DOTFILES_STATE_DIR"] = tempfile.mkdtemp(prefix="sync-bench-state-")
+
+from utils import state_store, sync_db  # noqa: E402
+
+REPOS = ["core", "extra", "multilib"]
+ARCH = "x86_64"
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _serve(root: Path) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=str(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _write_conf(tmp: Path, port: int, prefix: str = "") -> Path:
+    mirrorlist = tmp / "mirrorlist"
+    mirrorlist.write_text(f"Server = http://127.0.0.1:{port}/{prefix}$repo/os/$arch\n", encoding="utf-8")
+    conf = tmp / "pacman.conf"
+    sections = "".join(f"\n[{repo}]\nInclude = {mirrorlist}\n" for repo in REPOS)
+    conf.write_text(f"[options]\nArchitecture = {ARCH}\n{sections}", encoding="utf-8")
+    return conf
+
+
+def _check(conf: Path):
+    servers = sync_db.repo_servers(conf)
+    return servers, sync_db.check_databases(servers, state_store.get_value(sync_db.STATE_KEY, None))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="sync-bench-"))
+    server = None
+    try:
+        repo_root = tmp / "mirror"
+        for prefix in ("", "alt/"):
+            for repo in REPOS:
+                db = repo_root / prefix / repo / "os" / ARCH / f"{repo}.db"
+                db.parent.mkdir(parents=True, exist_ok=True)
+                db.write_bytes(os.urandom(4096))
+                os.utime(db, (time.time() - 3600, time.time() - 3600))
+        server = _serve(repo_root)
+        conf = _write_conf(tmp, server.server_address[1])
+
+        servers, (unchanged, validators, reason) = _check(conf)
+        print(f"1) no record:       unchanged={unchanged}  ({reason})")
+        assert not unchanged and len(validators) == len(REPOS)
+        state_store.set_value(sync_db.STATE_KEY, {"at": time.time(), "databases": validators})
+
+        samples = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            _, (unchanged, _, reason) = _check(conf)
+            samples.append((time.perf_counter() - started) * 1000)
+            assert unchanged, reason
+        print(f"2) nothing changed: unchanged=True   ({reason}); "
+              f"check p50 {statistics.median(samples):.1f} ms over {args.rounds} rounds")
+
+        touched = repo_root / "extra" / "os" / ARCH / "extra.db"
+        touched.write_bytes(os.urandom(4096))
+        _, (unchanged, _, reason) = _check(conf)
+        print(f"3) extra.db newer:  unchanged={unchanged}  ({reason})")
+        assert not unchanged and "extra.db" in reason
+
+        conf = _write_conf(tmp, server.server_address[1], prefix="alt/")
+        _, (unchanged, _, reason) = _check(conf)
+        print(f"4) mirror switched: unchanged={unchanged}  ({reason})")
+        assert not unchanged
+        return 0
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.rmtree(os.environ["DOTFILES_STATE_DIR"], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
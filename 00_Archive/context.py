@@ -1,7 +1,17 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
+import json
+import time
+import codecs
+import shutil
+import fnmatch
+import hashlib
 import argparse
+import subprocess
+import ast
+from concurrent.futures import ProcessPoolExecutor
 
 # -------------------------------
 # Configuration
@@ -11,52 +21,244 @@ import argparse
 WHITELIST_EXTENSIONS = [".py", ".sh", ".qml", ".desktop"]
 
 # These folders will be excluded completely
-BLACKLIST_FOLDERS = ["__pycache__", ".git", ".venv", ".prompts", "theme"] 
+BLACKLIST_FOLDERS = ["__pycache__", ".git", ".venv", ".prompts", "theme", ".context-cache"]
 
 # These specific files will be excluded
 BLACKLIST_FILES = ["context.py", "README.md", "alpine.min.js", "context.md"]
 
+# File name globs that will be excluded (on top of BLACKLIST_FILES)
+BLACKLIST_GLOBS = ["*.min.js", "*.generated.*"]
+
 # Folder where template prompts are stored
 TEMPLATE_FOLDER = ".prompts"
 
-# Output file name
+# Output file name ("-" writes to stdout)
 OUTPUT_FILE = "context.md"
 
+# Files are copied into the output in chunks of this many bytes
+COPY_BUFFER_SIZE = 64 * 1024
+
+# Files larger than this are truncated in the output (0 = no limit)
+MAX_FILE_BYTES = 256 * 1024
+
+# Sidecar cache: index.json (directory listings, file mtime/size/hash) + rendered sections
+CACHE_DIR = ".context-cache"
+CACHE_VERSION = 2
+
+# --outline: Python files are rendered as stubs (docstring summaries, constants, signatures)
+OUTLINE_MAX_STRING = 80       # longer string constants are elided
+OUTLINE_MAX_VALUE = 200       # longer constant values are cut
+OUTLINE_POOL_MIN_FILES = 16   # below this, parsing in-process beats starting a process pool
+# Per-file opt-outs: these globs (relative paths) and files containing OUTLINE_OPT_OUT stay in full
+OUTLINE_FULL_FILES = ["main.py"]
+OUTLINE_OPT_OUT = "# context: full"
+
+# A file is treated as binary if its first bytes contain NUL or mostly non-text bytes
+BINARY_SNIFF_BYTES = 8192
+BINARY_NONTEXT_RATIO = 0.30
+
+# Packing (--budget): rough bytes per token, so no tokenizer is needed
+BYTES_PER_TOKEN = 4
+
+# Files matching earlier entries are packed first (path prefixes, relative to the root)
+PRIORITY_PATHS = ["main.py", "utils/", "modules/000_core/", "modules/"]
+
+# Per-section overhead used by the size estimate ("--- path ---" framing, truncation marker)
+SECTION_OVERHEAD_BYTES = 12
+TRUNCATION_MARKER_BYTES = 64
+
 
 # -------------------------------
 # Helper Functions
 # -------------------------------
 
-def is_included_file(filepath):
-    """Check if file should be included based on whitelist and blacklists."""
-    filename = os.path.basename(filepath)
-    folder_parts = filepath.split(os.sep)
+def compile_rules(use_gitignore=True):
+    """Compile the include/exclude configuration once into fast lookup structures."""
+    globs = "|".join(fnmatch.translate(g) for g in BLACKLIST_GLOBS)
+    return {
+        "extensions": frozenset(WHITELIST_EXTENSIONS),
+        "folders": frozenset(BLACKLIST_FOLDERS),
+        "files": frozenset(BLACKLIST_FILES),
+        "globs": re.compile(globs) if globs else None,
+        "gitignore": use_gitignore,
+    }
+
 
-    # Skip blacklisted files
-    if filename in BLACKLIST_FILES:
+def file_allowed(name, rules):
+    """Name-only checks: blacklisted names/globs, then the extension whitelist."""
+    if name in rules["files"]:
+        return False
+    if rules["globs"] is not None and rules["globs"].match(name):
         return False
+    return os.path.splitext(name)[1] in rules["extensions"]
 
-    # Skip blacklisted folders
-    for part in folder_parts:
-        if part in BLACKLIST_FOLDERS:
-            return False
 
-    # Only include whitelisted extensions
-    _, ext = os.path.splitext(filename)
-    return ext in WHITELIST_EXTENSIONS
+def is_included_file(filepath, rules=None):
+    """Check if file should be included based on whitelist and blacklists."""
+    rules = rules or compile_rules(use_gitignore=False)
+    if not rules["folders"].isdisjoint(os.path.dirname(filepath).split(os.sep)):
+        return False
+    return file_allowed(os.path.basename(filepath), rules)
+
+
+# -------------------------------
+# .gitignore support
+# -------------------------------
 
+def gitignore_pattern_to_regex(pattern):
+    """Translate one .gitignore glob (without '!' and trailing '/') to a regex."""
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                out.append("[" + pattern[i + 1:j].replace("!", "^", 1) + "]")
+                i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    prefix = "" if anchored else "(?:.*/)?"
+    return re.compile(prefix + "".join(out) + r"\Z")
 
-def collect_files(root="."):
-    """Walk through directory and collect included files."""
+
+def parse_gitignore(path):
+    """Return [(regex, negate, dir_only)] for a .gitignore file ([] if unreadable)."""
+    patterns = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as fh:
+            lines = fh.read().splitlines()
+    except OSError:
+        return patterns
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate or line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if line:
+            patterns.append((gitignore_pattern_to_regex(line), negate, dir_only))
+    return patterns
+
+
+def gitignored(path, is_dir, frames):
+    """Apply the .gitignore frames (outermost first); the last matching rule wins.
+
+    A frame is (length of its directory prefix in `path`, parsed patterns).
+    """
+    ignored = False
+    for prefix_len, patterns in frames:
+        rel = path[prefix_len:]  # paths are always built by joining onto the frame's directory
+        if os.sep != "/":
+            rel = rel.replace(os.sep, "/")
+        for regex, negate, dir_only in patterns:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                ignored = not negate
+    return ignored
+
+
+# -------------------------------
+# File sources
+# -------------------------------
+
+def list_directory(dirpath, rules, frames):
+    """List one directory: (kept subdirectory names, included file names)."""
+    subdirs, files = [], []
+    with os.scandir(dirpath) as it:
+        for e in it:
+            if e.is_dir():
+                # Prune whole directories before descending into them (symlinked ones are not followed)
+                if e.is_symlink() or e.name in rules["folders"]:
+                    continue
+                if not (frames and gitignored(e.path, True, frames)):
+                    subdirs.append(e.name)
+            elif file_allowed(e.name, rules) and not (frames and gitignored(e.path, False, frames)):
+                files.append(e.name)
+    return subdirs, files
+
+
+def collect_files(root=".", cache=None, rules=None):
+    """Walk through directory and collect included files.
+
+    Blacklisted and git-ignored directories are pruned before descending. With a
+    cache, directories whose mtime (and .gitignore) are unchanged reuse their
+    recorded listing instead of being listed and filtered again.
+    """
+    rules = rules or compile_rules()
+    old_dirs = cache["dirs"] if cache is not None else {}
+    new_dirs = {}
     included_files = []
-    for dirpath, dirnames, filenames in os.walk(root):
-        # Exclude blacklisted folders during walk
-        dirnames[:] = [d for d in dirnames if d not in BLACKLIST_FOLDERS]
-
-        for filename in filenames:
-            filepath = os.path.join(dirpath, filename)
-            if is_included_file(filepath):
-                included_files.append(filepath)
+    stack = [(root, (), False)]  # (dir, .gitignore frames from this and outer dirs, force re-list)
+    while stack:
+        dirpath, frames, force = stack.pop()
+        try:
+            mtime = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            continue
+
+        ignore_file = os.path.join(dirpath, ".gitignore")
+        try:
+            ignore_mtime = os.stat(ignore_file).st_mtime_ns if rules["gitignore"] else None
+        except OSError:
+            ignore_mtime = None
+        if ignore_mtime is not None:
+            patterns = parse_gitignore(ignore_file)
+            if patterns:
+                frames = frames + ((len(os.path.join(dirpath, "")), patterns),)
+
+        entry = old_dirs.get(dirpath)
+        if force or not entry or entry["mtime_ns"] != mtime or entry.get("gitignore") != ignore_mtime:
+            # A changed .gitignore also invalidates every listing below it
+            force = force or bool(entry) and entry.get("gitignore") != ignore_mtime
+            subdirs, files = list_directory(dirpath, rules, frames)
+            entry = {"mtime_ns": mtime, "gitignore": ignore_mtime, "dirs": subdirs, "files": files}
+        new_dirs[dirpath] = entry
+        included_files.extend(os.path.join(dirpath, name) for name in entry["files"])
+        stack.extend((os.path.join(dirpath, name), frames, force) for name in entry["dirs"])
+    if cache is not None:
+        cache["dirs"] = new_dirs
+    return sorted(included_files)
+
+
+def collect_git_files(root=".", rules=None):
+    """Use git's index (tracked + untracked, not ignored) as the file source; None if unavailable."""
+    rules = rules or compile_rules()
+    base = ["git", "-C", root, "ls-files", "-z"]
+    try:
+        listed = subprocess.run(base + ["--cached", "--others", "--exclude-standard"],
+                                check=True, capture_output=True).stdout
+        deleted = subprocess.run(base + ["--deleted"], check=True, capture_output=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    gone = set(deleted.decode("utf-8", "surrogateescape").split("\0"))
+    included_files = []
+    for rel in set(listed.decode("utf-8", "surrogateescape").split("\0")):
+        if not rel or rel in gone:
+            continue
+        parts = rel.split("/")
+        if rules["folders"].isdisjoint(parts[:-1]) and file_allowed(parts[-1], rules):
+            included_files.append(os.path.join(root, *parts))
     return sorted(included_files)
 
 
@@ -81,34 +283,531 @@ def load_template(template_name):
         return f.read().strip() + "\n\n"
 
 
-def build_context_file(template_name=None, dry_run=False):
-    files = collect_files()
+def copy_file_contents(filepath, out, max_bytes=MAX_FILE_BYTES):
+    """Stream a file into `out` in fixed-size chunks, truncating after max_bytes."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    size = os.path.getsize(filepath)
+    limit = size if not max_bytes else min(size, max_bytes)
+    copied = 0
+    with open(filepath, "rb") as fh:
+        while copied < limit:
+            chunk = fh.read(min(COPY_BUFFER_SIZE, limit - copied))
+            if not chunk:
+                break
+            copied += len(chunk)
+            out.write(decoder.decode(chunk))
+    out.write(decoder.decode(b"", final=True))
+    if copied < size:
+        out.write(f"\n[... truncated: showing first {copied} of {size} bytes ...]")
+    return copied < size
+
+
+def write_body(filepath, out, max_bytes=MAX_FILE_BYTES, outlines=None):
+    """Write a file's outline if there is one, else its (capped) contents."""
+    if outlines and filepath in outlines:
+        out.write(outlines[filepath])
+        return False
+    return copy_file_contents(filepath, out, max_bytes)
+
+
+def write_file_section(filepath, out, max_bytes=MAX_FILE_BYTES, note=None, outlines=None):
+    """Write one '--- path ---' section; returns True if the file was truncated."""
+    out.write(f"\n--- {os.path.relpath(filepath)} ---\n")
+    if note:
+        out.write(note + "\n")
+    truncated = write_body(filepath, out, max_bytes, outlines)
+    out.write("\n")
+    return truncated
+
+
+# -------------------------------
+# Outline mode
+# -------------------------------
+
+class _ElideStrings(ast.NodeTransformer):
+    """Replace long string constants with a short '<N chars>' placeholder."""
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, str) and len(node.value) > OUTLINE_MAX_STRING:
+            return ast.copy_location(ast.Constant(f"<{len(node.value)} chars>"), node)
+        return node
+
+    def visit_JoinedStr(self, node):
+        text = ast.unparse(node)
+        if len(text) > OUTLINE_MAX_STRING:
+            return ast.copy_location(ast.Constant(f"<f-string, {len(text)} chars>"), node)
+        return node
+
+
+def _doc_summary(node, indent):
+    doc = ast.get_docstring(node)
+    if not doc or not doc.strip():
+        return []
+    first = doc.strip().splitlines()[0].strip().replace('"' * 3, "'" * 3)
+    return [f'{indent}"""{first}"""']
+
+
+def _signature(node, indent):
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    lines = [f"{indent}@{ast.unparse(d)}" for d in node.decorator_list]
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    lines.append(f"{indent}{prefix} {node.name}({ast.unparse(node.args)}){returns}: ...")
+    return lines + _doc_summary(node, indent + "    ")
+
+
+def _constant(node, indent):
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+    names = [t.id for t in targets if isinstance(t, ast.Name)]
+    if not names or not all(n.isupper() or (n.startswith("__") and n.endswith("__")) for n in names):
+        return []
+    value = ast.unparse(_ElideStrings().visit(node.value)) if node.value is not None else "..."
+    if len(value) > OUTLINE_MAX_VALUE:
+        value = value[:OUTLINE_MAX_VALUE] + " ..."
+    annotation = f": {ast.unparse(node.annotation)}" if isinstance(node, ast.AnnAssign) else ""
+    return [f"{indent}{' = '.join(names)}{annotation} = {value}"]
+
+
+def _outline_body(body, indent):
+    lines = []
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            lines.extend(_signature(node, indent))
+        elif isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(b) for b in node.bases + node.keywords)
+            lines.extend(f"{indent}@{ast.unparse(d)}" for d in node.decorator_list)
+            lines.append(f"{indent}class {node.name}({bases}):" if bases else f"{indent}class {node.name}:")
+            inner = _doc_summary(node, indent + "    ") + _outline_body(node.body, indent + "    ")
+            lines.extend(inner or [f"{indent}    ..."])
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            lines.extend(_constant(node, indent))
+    return lines
+
+
+def outline_python(filepath):
+    """Outline one .py file; None if it opts out or cannot be parsed (then it is copied in full)."""
+    try:
+        with open(filepath, "r", encoding="utf-8", errors="ignore") as fh:
+            source = fh.read()
+        if OUTLINE_OPT_OUT in source:
+            return None
+        tree = ast.parse(source)
+    except (OSError, SyntaxError, ValueError):
+        return None
+    lines = ["[outline: docstring summaries, constants and signatures only]"]
+    lines += _doc_summary(tree, "") + _outline_body(tree.body, "")
+    return "\n".join(lines)
+
+
+def build_outlines(files):
+    """Outline every eligible .py file in `files`, on a process pool for larger sets."""
+    todo = [f for f in files if f.endswith(".py") and not any(
+        fnmatch.fnmatch(os.path.relpath(f).replace(os.sep, "/"), g) for g in OUTLINE_FULL_FILES)]
+    if len(todo) >= OUTLINE_POOL_MIN_FILES:
+        with ProcessPoolExecutor() as pool:
+            results = list(pool.map(outline_python, todo, chunksize=8))
+    else:
+        results = [outline_python(f) for f in todo]
+    return {f: text for f, text in zip(todo, results) if text is not None}
+
+
+# -------------------------------
+# Binary files and duplicates
+# -------------------------------
+
+_TEXT_BYTES = bytes(range(32, 127)) + b"\n\r\t\f\b\x1b"
+
+
+def is_binary(filepath):
+    """Sniff the first BINARY_SNIFF_BYTES: NUL bytes or too many non-text bytes mean binary."""
+    with open(filepath, "rb") as fh:
+        head = fh.read(BINARY_SNIFF_BYTES)
+    if not head:
+        return False
+    if b"\0" in head:
+        return True
+    nontext = head.translate(None, _TEXT_BYTES)
+    # Bytes >= 0x80 are fine when they form valid UTF-8
+    try:
+        head.decode("utf-8")
+        nontext = nontext.translate(None, bytes(range(128, 256)))
+    except UnicodeDecodeError as exc:
+        if exc.start >= len(head) - 3:  # only a multi-byte character cut at the sniff boundary
+            nontext = nontext.translate(None, bytes(range(128, 256)))
+    return len(nontext) / len(head) > BINARY_NONTEXT_RATIO
+
+
+def classify_files(files, cache=None, max_bytes=MAX_FILE_BYTES):
+    """Decide how each file is rendered, in output order.
+
+    Returns (kinds, saved_bytes) where kinds maps a path to ("text", [copies]),
+    ("dup", first_path) or ("binary", size). Only files whose size collides with
+    another file's are hashed; unchanged files reuse hashes from the cache.
+    """
+    entries = cache["files"] if cache is not None else {}
+
+    def fresh(f, st):
+        e = entries.get(f)
+        return e if e and e["mtime_ns"] == st.st_mtime_ns and e["size"] == st.st_size else None
+
+    kinds, saved, by_size, stats_of = {}, 0, {}, {}
+    for f in files:
+        st = os.stat(f)
+        stats_of[f] = st
+        entry = fresh(f, st)
+        binary = entry["binary"] if entry and "binary" in entry else is_binary(f)
+        if binary:
+            kinds[f] = ("binary", st.st_size)
+            saved += min(st.st_size, max_bytes) if max_bytes else st.st_size
+        else:
+            by_size.setdefault(st.st_size, []).append(f)
+
+    first_by_hash = {}
+    for f in files:
+        if f in kinds:
+            continue
+        st = stats_of[f]
+        if len(by_size[st.st_size]) < 2 or st.st_size == 0:
+            kinds[f] = ("text", [])
+            continue
+        entry = fresh(f, st)
+        digest = entry["sha256"] if entry else hash_file(f)
+        first = first_by_hash.setdefault(digest, f)
+        if first == f:
+            kinds[f] = ("text", [])
+        else:
+            kinds[first][1].append(f)
+            kinds[f] = ("dup", first)
+            saved += min(st.st_size, max_bytes) if max_bytes else st.st_size
+    return kinds, saved
+
+
+# -------------------------------
+# Incremental cache
+# -------------------------------
+
+def rules_signature(max_bytes, use_gitignore=True, outline=False):
+    """Hash of everything that changes which files are picked or how they are rendered."""
+    rules = [CACHE_VERSION, WHITELIST_EXTENSIONS, BLACKLIST_FOLDERS, BLACKLIST_FILES, BLACKLIST_GLOBS,
+             use_gitignore, max_bytes,
+             outline and [OUTLINE_MAX_STRING, OUTLINE_MAX_VALUE, OUTLINE_FULL_FILES, OUTLINE_OPT_OUT]]
+    return hashlib.sha256(json.dumps(rules).encode("utf-8")).hexdigest()
+
+
+def load_cache(max_bytes, use_gitignore=True, outline=False):
+    """Load the cache index, or start an empty one if missing or built with other rules."""
+    empty = {"rules": rules_signature(max_bytes, use_gitignore, outline), "dirs": {}, "files": {}}
+    try:
+        with open(os.path.join(CACHE_DIR, "index.json"), "r", encoding="utf-8") as fh:
+            cache = json.load(fh)
+    except (OSError, ValueError):
+        return empty
+    if cache.get("rules") != empty["rules"]:
+        return empty
+    return cache
+
+
+def save_cache(cache):
+    """Write the index atomically and drop section files no longer referenced."""
+    sections_dir = os.path.join(CACHE_DIR, "sections")
+    os.makedirs(sections_dir, exist_ok=True)
+    tmp = os.path.join(CACHE_DIR, "index.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(cache, fh)
+    os.replace(tmp, os.path.join(CACHE_DIR, "index.json"))
+
+    live = {entry["section"] for entry in cache["files"].values()}
+    for name in os.listdir(sections_dir):
+        if name not in live:
+            os.remove(os.path.join(sections_dir, name))
+
+
+def hash_file(filepath):
+    """sha256 of a file, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as fh:
+        for chunk in iter(lambda: fh.read(COPY_BUFFER_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def needs_render(filepath, cache):
+    """True unless the cache holds a body for this exact mtime and size."""
+    entry = cache["files"].get(filepath) if cache is not None else None
+    if not entry:
+        return True
+    st = os.stat(filepath)
+    return entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size or \
+        not os.path.exists(os.path.join(CACHE_DIR, "sections", entry["section"]))
+
+
+def cached_section(filepath, cache, max_bytes, stats, outlines=None):
+    """Return the path of an up-to-date rendered file body for `filepath`.
+
+    Unchanged mtime+size reuses the section without opening the file; a changed
+    mtime with the same content hash reuses it after one read; otherwise the
+    section is rendered again.
+    """
+    st = os.stat(filepath)
+    entry = cache["files"].get(filepath)
+    sections_dir = os.path.join(CACHE_DIR, "sections")
+
+    def section_path(e):
+        return os.path.join(sections_dir, e["section"])
+
+    if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size \
+            and os.path.exists(section_path(entry)):
+        stats["reused"] += 1
+        stats["saved_sec"] += entry["render_sec"]
+        return section_path(entry)
+
+    started = time.perf_counter()
+    digest = hash_file(filepath)
+    stats["reread"] += 1
+    if entry and entry["sha256"] == digest and os.path.exists(section_path(entry)):
+        entry["mtime_ns"], entry["size"] = st.st_mtime_ns, st.st_size
+        return section_path(entry)
+
+    os.makedirs(sections_dir, exist_ok=True)
+    name = hashlib.sha256(f"{filepath}\0{digest}".encode("utf-8")).hexdigest()
+    path = os.path.join(sections_dir, name)
+    with open(path + ".tmp", "w", encoding="utf-8") as fh:
+        truncated = write_body(filepath, fh, max_bytes, outlines)
+    os.replace(path + ".tmp", path)
+    cache["files"][filepath] = {
+        "mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest, "binary": False,
+        "section": name, "truncated": truncated,
+        "render_sec": time.perf_counter() - started,
+    }
+    return path
+
+
+def copy_section(filepath, section_path, out, note=None):
+    """Write a section whose body comes from the cache, copied in fixed-size chunks."""
+    out.write(f"\n--- {os.path.relpath(filepath)} ---\n")
+    if note:
+        out.write(note + "\n")
+    with open(section_path, "r", encoding="utf-8") as fh:
+        shutil.copyfileobj(fh, out, COPY_BUFFER_SIZE)
+    out.write("\n")
+
+
+# -------------------------------
+# Output
+# -------------------------------
+
+def open_output(output):
+    """Return (stream, should_close) for a file path or "-" (stdout)."""
+    if output == "-":
+        return sys.stdout, False
+    return open(output, "w", encoding="utf-8"), True
+
+
+def write_contents(out, files, cache, max_bytes, stats, kinds=None, outlines=None):
+    """Stream the sections of `files` into `out`; returns how many were truncated.
+
+    `kinds` (from classify_files) replaces binary files and repeated copies of a
+    file with one-line placeholders.
+    """
+    truncated = 0
+    for f in files:
+        kind = kinds.get(f, ("text", [])) if kinds else ("text", [])
+        if kind[0] == "binary":
+            out.write(f"\n--- {os.path.relpath(f)} ---\n[binary file omitted: {kind[1]} bytes]\n")
+            continue
+        if kind[0] == "dup":
+            out.write(f"\n--- {os.path.relpath(f)} ---\n[identical to {os.path.relpath(kind[1])}; not repeated]\n")
+            continue
+        note = None
+        if kind[1]:
+            note = "[identical copies: " + ", ".join(os.path.relpath(c) for c in kind[1]) + "]"
+        if cache is None:
+            truncated += write_file_section(f, out, max_bytes, note, outlines)
+        else:
+            copy_section(f, cached_section(f, cache, max_bytes, stats, outlines), out, note)
+            truncated += cache["files"][f]["truncated"]
+    return truncated
+
+
+# -------------------------------
+# Budgeted packing
+# -------------------------------
+
+def estimate_size(filepath, max_bytes, unit):
+    """Cheap size estimate of a file's section from stat alone (no reading, no tokenizer)."""
+    size = os.path.getsize(filepath)
+    if max_bytes and size > max_bytes:
+        size = max_bytes + TRUNCATION_MARKER_BYTES
+    size += len(os.path.relpath(filepath)) * 2 + SECTION_OVERHEAD_BYTES  # header line + tree line
+    return size if unit == "bytes" else -(-size // BYTES_PER_TOKEN)
+
+
+def rank_files(files, rank):
+    """Order files best-first: by PRIORITY_PATHS, then by recency or size."""
+    def priority(f):
+        rel = os.path.relpath(f).replace(os.sep, "/")
+        for i, prefix in enumerate(PRIORITY_PATHS):
+            if rel == prefix or rel.startswith(prefix):
+                return i
+        return len(PRIORITY_PATHS)
+
+    if rank == "recency":
+        return sorted(files, key=lambda f: -os.path.getmtime(f))
+    if rank == "size":
+        return sorted(files, key=os.path.getsize)
+    return sorted(files, key=lambda f: (priority(f), f))
+
+
+def pack_files(files, budget, unit, max_shards, max_bytes, rank, reserve):
+    """First-fit the ranked files into at most `max_shards` shards of `budget` each.
+
+    Returns (shards, omitted): shards is a list of sorted file lists, omitted the
+    files that did not fit anywhere.
+    """
+    room = budget - reserve
+    shards, used, omitted = [], [], []
+    for f in rank_files(files, rank):
+        size = estimate_size(f, max_bytes, unit)
+        for i in range(len(shards)):
+            if used[i] + size <= room:
+                shards[i].append(f)
+                used[i] += size
+                break
+        else:
+            if size <= room and len(shards) < max_shards:
+                shards.append([f])
+                used.append(size)
+            else:
+                omitted.append(f)
+    return [sorted(shard) for shard in shards], sorted(omitted)
+
+
+def shard_name(output, number):
+    """context.md -> context-01.md"""
+    base, ext = os.path.splitext(output)
+    return f"{base}-{number:02d}{ext}"
+
+
+def index_name(output):
+    """context.md -> context-index.md"""
+    base, ext = os.path.splitext(output)
+    return f"{base}-index{ext}"
+
+
+def build_shard_index(output, shards, omitted):
+    """Text index of which file went into which shard."""
+    lines = ["<Shard Index>"]
+    for i, shard in enumerate(shards, 1):
+        lines.append(f"{os.path.basename(shard_name(output, i))}:")
+        lines.extend(f"  {os.path.relpath(f)}" for f in shard)
+    if omitted:
+        lines.append("Not included (over budget):")
+        lines.extend(f"  {os.path.relpath(f)}" for f in omitted)
+    return "\n".join(lines) + "\n"
+
+
+def index_reserve(files, unit):
+    """Upper bound of the shard index size, reserved in every shard's budget."""
+    size = sum(len(os.path.relpath(f)) + 3 for f in files) + 256
+    return size if unit == "bytes" else -(-size // BYTES_PER_TOKEN)
+
+
+# -------------------------------
+# Build
+# -------------------------------
+
+def build_context_file(template_name=None, dry_run=False, output=OUTPUT_FILE, max_bytes=MAX_FILE_BYTES,
+                       use_cache=True, show_stats=False, budget=None, unit="tokens", max_shards=1,
+                       rank="priority", use_git=False, use_gitignore=True, dedupe=True, outline=False):
+    started = time.perf_counter()
+    cache = load_cache(max_bytes, use_gitignore, outline) if use_cache and not dry_run else None
+    stats = {"reused": 0, "reread": 0, "saved_sec": 0.0}
+    rules = compile_rules(use_gitignore)
+    files = collect_git_files(rules=rules) if use_git else None
+    if files is None:
+        if use_git:
+            print("git ls-files is not available here; walking the tree instead", file=sys.stderr)
+        files = collect_files(cache=cache, rules=rules)
     if dry_run:
         print("Dry run: included files\n")
         for f in files:
             print(f)
         return
 
-    # Build sections
+    # Status goes to stderr when the context itself is streamed to stdout
+    log = sys.stderr if output == "-" else sys.stdout
     template_content = load_template(template_name)
-    file_tree = build_file_tree(files)
-    file_contents = []
 
-    for f in files:
-        relpath = os.path.relpath(f)
-        with open(f, "r", encoding="utf-8", errors="ignore") as fh:
-            content = fh.read()
-        file_contents.append(f"\n--- {relpath} ---\n{content}\n")
+    if budget:
+        if output == "-":
+            print("--budget writes numbered shard files; it cannot be combined with --output -")
+            sys.exit(1)
+        reserve = index_reserve(files, unit) + len(template_content)
+        shards, omitted = pack_files(files, budget, unit, max_shards, max_bytes, rank, reserve)
+        index = build_shard_index(output, shards, omitted)
+        outputs = [(shard_name(output, i), shard, f"<Shard {i} of {len(shards)}>\n{index}\n")
+                   for i, shard in enumerate(shards, 1)]
+        index_path = index_name(output)
+        with open(index_path, "w", encoding="utf-8") as fh:
+            fh.write(index)
+    else:
+        outputs = [(output, files, "")]
+        omitted = []
 
-    # Write context file
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as out:
-        out.write(template_content)
-        out.write("<File Tree>\n")
-        out.write(file_tree)
-        out.write("\n\n<Contents of included files>\n")
-        out.writelines(file_contents)
+    # Classify in output order, so the first copy written is the one that keeps its content
+    written = [f for _, shard_files, _ in outputs for f in shard_files]
+    kinds, saved_bytes = classify_files(written, cache, max_bytes)
+    if not dedupe:
+        kinds = {f: k if k[0] == "binary" else ("text", []) for f, k in kinds.items()}
+        saved_bytes = sum(min(k[1], max_bytes) if max_bytes else k[1] for k in kinds.values() if k[0] == "binary")
 
-    print(f"Context file created: {OUTPUT_FILE}")
+    # Outline only the Python files whose cached body is missing or stale
+    outlines = None
+    if outline:
+        outline_started = time.perf_counter()
+        outlines = build_outlines([f for f in written if kinds[f][0] == "text" and needs_render(f, cache)])
+        stats["outline_sec"] = time.perf_counter() - outline_started
+        stats["outline_from"] = sum(min(os.path.getsize(f), max_bytes) if max_bytes else os.path.getsize(f)
+                                    for f in outlines)
+        stats["outline_to"] = sum(len(text.encode("utf-8")) for text in outlines.values())
+
+    truncated = 0
+    for path, shard_files, preamble in outputs:
+        # Header and tree first, then one file at a time (never the whole repo in memory)
+        out, should_close = open_output(path)
+        try:
+            out.write(template_content)
+            out.write(preamble)
+            out.write("<File Tree>\n")
+            out.write(build_file_tree(shard_files))
+            out.write("\n\n<Contents of included files>\n")
+            truncated += write_contents(out, shard_files, cache, max_bytes, stats, kinds, outlines)
+            out.flush()
+        finally:
+            if should_close:
+                out.close()
+
+    if cache is not None:
+        cache["files"] = {f: cache["files"][f] for f in files if f in cache["files"]}
+        save_cache(cache)
+
+    if truncated:
+        print(f"Truncated {truncated} file(s) larger than {max_bytes} bytes", file=log)
+    binaries = sum(1 for k in kinds.values() if k[0] == "binary")
+    dups = sum(1 for k in kinds.values() if k[0] == "dup")
+    if binaries or dups:
+        print(f"Skipped {binaries} binary file(s) and {dups} duplicate(s); saved {saved_bytes} bytes", file=log)
+    if outlines:
+        print(f"Outlined {len(outlines)} Python file(s): {stats['outline_from']} -> {stats['outline_to']} bytes "
+              f"in {stats['outline_sec']:.3f}s", file=log)
+    if budget:
+        print(f"Packed {len(files) - len(omitted)} of {len(files)} file(s) into {len(outputs)} shard(s) "
+              f"of {budget} {unit}; index: {index_path}", file=log)
+    elif output != "-":
+        print(f"Context file created: {output}", file=log)
+    if show_stats:
+        print(f"Files: {len(files)} total, {stats['reused']} reused from cache, {stats['reread']} re-read", file=log)
+        print(f"Time: {time.perf_counter() - started:.3f}s (cache saved ~{stats['saved_sec']:.3f}s of reading)",
+              file=log)
 
 
 # -------------------------------
@@ -119,9 +818,41 @@ def main():
     parser = argparse.ArgumentParser(description="Build context file for ChatGPT")
     parser.add_argument("--template", help="Template filename from templates folder", default=None)
     parser.add_argument("--dry-run", action="store_true", help="List included files without writing output")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Output file, or - for stdout")
+    parser.add_argument("--max-file-bytes", type=int, default=MAX_FILE_BYTES,
+                        help="Truncate files larger than this many bytes (0 = no limit)")
+    parser.add_argument("--no-cache", action="store_true", help=f"Ignore and do not update {CACHE_DIR}/")
+    parser.add_argument("--stats", action="store_true", help="Print cache reuse and timing statistics")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="Pack files into numbered shards of at most this size (see --unit)")
+    parser.add_argument("--unit", choices=["tokens", "bytes"], default="tokens",
+                        help=f"Budget unit; tokens are estimated as bytes / {BYTES_PER_TOKEN}")
+    parser.add_argument("--max-shards", type=int, default=1, help="Maximum number of shard files")
+    parser.add_argument("--git", action="store_true",
+                        help="Take the file list from git's index (git ls-files) instead of walking")
+    parser.add_argument("--no-gitignore", action="store_true", help="Do not honor .gitignore files while walking")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="Write identical files in full instead of referencing the first copy")
+    parser.add_argument("--outline", action="store_true",
+                        help="Render .py files as docstring summaries, constants and signatures only")
+    parser.add_argument("--rank", choices=["priority", "recency", "size"], default="priority",
+                        help="Which files win when not everything fits")
     args = parser.parse_args()
 
-    build_context_file(template_name=args.template, dry_run=args.dry_run)
+    try:
+        build_context_file(template_name=args.template, dry_run=args.dry_run,
+                           output=args.output, max_bytes=args.max_file_bytes,
+                           use_cache=not args.no_cache, show_stats=args.stats, budget=args.budget,
+                           unit=args.unit, max_shards=args.max_shards, rank=args.rank,
+                           use_git=args.git, use_gitignore=not args.no_gitignore,
+                           dedupe=not args.keep_duplicates, outline=args.outline)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. `--output - | head`): stop quietly. Point stdout
+        # at devnull so the interpreter's final flush does not raise again.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -11,37 +11,110 @@ under the ./modules directory. It:
 
 1) Starts a sudo keep-alive session (without keeping your password in memory).
 2) Discovers and validates modules by their numeric order (e.g., 00_core, 10_foo).
-3) Executes each module's `install(run)` function in ascending order.
+3) Executes each module's `install(run)` function, running modules whose
+   declared requirements are met in parallel (`--jobs N`, 1 = strictly in order).
 4) Cleanly tears down the sudo session.
 
+`--list` prints the module manifests without starting sudo or importing any
+module code; `--only`/`--tag` restrict a run to a subset of modules.
+
 Behavior & Safety
 -----------------
 - Idempotent by design: individual modules are expected to use safe flags
   (e.g., pacman/yay `--needed`) and/or create backups before overwriting.
+- Modules whose inputs did not change since their last successful run are
+  skipped (see utils.module_loader); `--force` re-runs everything.
 - Robust error handling: execution prints clear shell-like actions and
   returns a success/failure code (printed), without unhandled crashes.
 """
 
 from __future__ import annotations
 
+import argparse
+from typing import List, Optional
+
 from utils.sudo_session import start_sudo_session
-from utils.module_loader import run_all
+from utils.module_loader import (
+    discover_modules,
+    print_import_report,
+    print_module_list,
+    run_all,
+    select_modules,
+)
+
 
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the provisioning modules under ./modules")
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=None,
+        help="Maximum modules to run in parallel (default: MODULES_MAX_WORKERS or 4; 1 = serial)",
+    )
+    parser.add_argument(
+        "--only", action="append", metavar="MODULE", default=None,
+        help="Run only this module folder (repeatable), e.g. --only 040_fonts",
+    )
+    parser.add_argument(
+        "--tag", action="append", metavar="TAG", default=None,
+        help="Run only modules carrying this tag (repeatable)",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Re-run modules even when their fingerprint matches the last successful run",
+    )
+    parser.add_argument(
+        "--no-package-plan", action="store_true",
+        help="Let every module run its own pacman transactions instead of one merged plan",
+    )
+    parser.add_argument(
+        "--no-prefetch", action="store_true",
+        help="Do not download later modules' packages in the background",
+    )
+    parser.add_argument(
+        "--list", action="store_true",
+        help="List modules from their manifests and exit (no sudo, no module imports)",
+    )
+    parser.add_argument(
+        "--import-report", action="store_true",
+        help="Print discovery and per-module import times at the end",
+    )
+    parser.add_argument(
+        "--import-budget-ms", type=float, default=None,
+        help="Warn when discovery + module imports exceed this many milliseconds",
+    )
+    return parser.parse_args(argv)
 
-def main() -> bool:
+
+def main(argv: Optional[List[str]] = None) -> bool:
     """
     Orchestrate the provisioning run.
 
     Returns:
         True if all modules ran successfully, False otherwise.
     """
+    args = _parse_args(argv)
+
+    if args.list:
+        selected = select_modules(discover_modules(), only=args.only, tags=args.tag)
+        if selected is None:
+            return False
+        print_module_list(selected)
+        if args.import_report or args.import_budget_ms is not None:
+            return print_import_report(args.import_budget_ms)
+        return True
+
     # Start the sudo session (asks for your password once, then keeps it alive).
     run, close = start_sudo_session()
 
     try:
         # Run all discovered modules. The loader handles duplicate order detection
         # and will abort early in that case.
-        success = run_all(run)
+        success = run_all(
+            run, max_workers=args.jobs, only=args.only, tags=args.tag, force=args.force,
+            plan_packages=not args.no_package_plan,
+            prefetch_packages=not args.no_prefetch,
+        )
+        if args.import_report or args.import_budget_ms is not None:
+            print_import_report(args.import_budget_ms)
         print(f"\n✅ Overall result: {'SUCCESS' if success else 'FAILURE'}")
         return success
     except Exception as exc:
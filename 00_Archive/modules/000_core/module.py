@@ -3,12 +3,30 @@
 from __future__ import annotations
 from pathlib import Path
 from typing import Callable
+import os
 import shutil
 import subprocess
-import textwrap
 
+from utils import aur, mirrors, sync_db
 from utils.pacman import install_packages
 
+REQUIRES = []  # root of the dependency graph
+PROVIDES = ["pacman-conf", "mirrors", "yay"]
+TAGS = ["base"]
+
+# Installed before everything else (see utils.package_plan).
+KEYRING_PACKAGES = ["archlinux-keyring"]
+BASE_PACKAGES = [
+    "git", "curl", "wget", "rsync",
+    "vim", "nano",
+    "base-devel",
+    "pacman-contrib",
+    "reflector",
+    "openssh",
+]
+PACKAGES = KEYRING_PACKAGES + BASE_PACKAGES
+
+MIRROR_COUNTRIES = ["United Kingdom", "Netherlands", "Germany", "France"]
 UK_EU_COUNTRIES = ["United Kingdom", "Ireland", "Netherlands", "Germany", "France", "Belgium", "Denmark"]
 
 def _print(msg: str) -> None:
@@ -53,56 +71,64 @@ def _tweak_pacman_conf(run: Callable) -> bool:
         print(f"ERROR: tweaking pacman.conf: {exc}")
         return False
 
+def _mirror_ttl_hours() -> float:
+    try:
+        return float(os.environ.get("MIRRORS_TTL_HOURS", mirrors.DEFAULT_TTL_HOURS))
+    except ValueError:
+        return mirrors.DEFAULT_TTL_HOURS
+
+def _mirror_ranker() -> str:
+    return "reflector" if os.environ.get("MIRRORS_RANKER", "probe") == "reflector" else "probe"
+
 def _refresh_mirrors(run: Callable) -> bool:
     """
-    Generate a mirrorlist optimized for UK/EU with sane timeouts.
-    - Only HTTPS mirrors
-    - Only mirrors synced within the last 12 hours
-    - Keep the 15 fastest
-    - Increase download-timeout so slow handshakes don't get dropped too aggressively
+    Keep a mirrorlist optimized for UK/EU with sane timeouts (see utils.mirrors).
+    - Only HTTPS mirrors synced within the last 12 hours, the 15 fastest
+    - The ranking is cached and reused for MIRRORS_TTL_HOURS (default 168)
+    - MIRRORS_REFRESH=1 forces a new ranking
+    - Mirrors are ranked by the built-in prober; MIRRORS_RANKER=reflector uses reflector instead
     """
     try:
-        countries = ",".join(["United Kingdom", "Netherlands", "Germany", "France"])
-        cmd = [
-            "reflector",
-            "--country", countries,
-            "--protocol", "https",
-            "--age", "12",                 # seen as 'last synced within N hours'
-            "--fastest", "15",             # keep N fastest mirrors
-            "--download-timeout", "20",     # avoid premature timeouts
-            "--save", "/etc/pacman.d/mirrorlist",
-        ]
-        print("$ " + " ".join(cmd))
-        res = run(cmd, check=False)  # stream output
-        if res.returncode != 0:
-            print("WARN: reflector failed; keeping existing mirrorlist.")
-        return True
+        force = os.environ.get("MIRRORS_REFRESH", "0") not in ("0", "false", "False", "no", "No", "")
+        return mirrors.ensure_mirrorlist(run, MIRROR_COUNTRIES, ttl_hours=_mirror_ttl_hours(), force=force,
+                                         ranker=_mirror_ranker())
     except Exception as exc:
-        print(f"ERROR: reflector: {exc}")
+        print(f"ERROR: refreshing mirrors: {exc}")
         return False
 
-def _ensure_yay() -> bool:
+def _ensure_yay(run: Callable) -> bool:
     if shutil.which("yay"):
         _print("$ yay --version  # already installed")
         _cmd_as_user(["bash", "-lc", "yay --version || true"])
         return True
-    _print("ℹ️  'yay' not found; bootstrapping yay-bin from AUR (user scope).")
+    _print("ℹ️  'yay' not found; bootstrapping yay-bin from the AUR cache (user scope).")
     try:
-        res = _cmd_as_user(["bash", "-lc", textwrap.dedent(r"""
-            set -e
-            work="/tmp/_aur_yay.$$"
-            mkdir -p "$work"
-            cd "$work"
-            git clone --depth=1 https://aur.archlinux.org/yay-bin.git
-            cd yay-bin
-            makepkg -si --noconfirm
-            rm -rf "$work"
-        """)])
-        return res.returncode == 0
+        # Checkout and built package persist in ~/.cache/dotfiles/aur (see utils.aur)
+        return aur.bootstrap("yay-bin", run)
     except Exception as exc:
         print(f"ERROR: bootstrapping yay: {exc}")
         return False
 
+def _force_upgrade() -> bool:
+    return os.environ.get("SYSTEM_UPGRADE_FORCE", "0") not in ("0", "false", "False", "no", "No", "")
+
+def probe(run: Callable) -> bool:
+    """
+    Drift check for the loader: re-run once the mirror ranking is stale or the
+    mirrorlist was changed, or whenever the upgrade step would run (a sync
+    database changed upstream since the last upgrade, the last upgrade failed,
+    or SYSTEM_UPGRADE_FORCE is set), so the fingerprint skip never suppresses
+    `pacman -Syu`.
+    """
+    if _force_upgrade():
+        _print("ℹ️  [00_core] system upgrade forced (SYSTEM_UPGRADE_FORCE)")
+        return False
+    unchanged, reason = sync_db.databases_unchanged()
+    if not unchanged:
+        _print(f"ℹ️  [00_core] system upgrade due: {reason}")
+        return False
+    return mirrors.is_current(MIRROR_COUNTRIES, ttl_hours=_mirror_ttl_hours(), ranker=_mirror_ranker())
+
 def install(run: Callable) -> bool:
     try:
         _print("▶ [00_core] Starting core bootstrap...")
@@ -111,32 +137,23 @@ def install(run: Callable) -> bool:
             return False
 
         # Keyring first
-        if not install_packages(["archlinux-keyring"], run):
+        if not install_packages(KEYRING_PACKAGES, run):
             return False
 
         # Base tooling
-        base_pkgs = [
-            "git", "curl", "wget", "rsync",
-            "vim", "nano",
-            "base-devel",
-            "pacman-contrib",
-            "reflector",
-            "openssh",
-        ]
-        if not install_packages(base_pkgs, run):
+        if not install_packages(BASE_PACKAGES, run):
             return False
 
         _tweak_pacman_conf(run)
         _refresh_mirrors(run)
 
-        _print("$ pacman -Syu --noconfirm")
-        res_sync = run(["pacman", "-Syu", "--noconfirm"], check=False)  # streamed
-        if res_sync.returncode != 0:
+        # Skipped when no sync database changed upstream since the last upgrade
+        if not sync_db.conditional_upgrade(run, force=_force_upgrade()):
             print("WARN: pacman -Syu returned non-zero; continuing.")
 
         _enable_timesyncd(run)
 
-        if not _ensure_yay():
+        if not _ensure_yay(run):
             print("WARN: Could not ensure yay; AUR installs may fail in later modules.")
 
         _print("✔ [00_core] Core bootstrap complete.")
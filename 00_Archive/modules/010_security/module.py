@@ -19,6 +19,10 @@ NOTE:
 from __future__ import annotations
 from typing import Callable
 
+REQUIRES = ["000_core"]
+TAGS = ["base"]
+PACKAGES = ["polkit"]
+
 
 def install(run: Callable) -> bool:
     """
@@ -29,7 +33,7 @@ def install(run: Callable) -> bool:
 
         # Install polkit (idempotent, safe for desktop apps needing privilege escalation)
         from utils.pacman import install_packages
-        if not install_packages(["polkit"], run):
+        if not install_packages(PACKAGES, run):
             return False
 
         print("✔ [020_security] Security baseline complete.")
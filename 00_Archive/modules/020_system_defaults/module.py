@@ -14,6 +14,13 @@ Re-run safe (idempotent). Uses the provided sudo runner (`run`) from start_sudo_
 from __future__ import annotations
 from typing import Callable
 
+from utils import triggers
+from utils.files import deploy_file, file_matches
+
+REQUIRES = ["000_core"]
+TAGS = ["base"]
+PACKAGES = ["logrotate"]
+
 JOURNALD_DROPIN = "/etc/systemd/journald.conf.d/10-defaults.conf"
 JOURNALD_CONTENT = """# Installed by 020_system-defaults (drop-in)
 [Journal]
@@ -48,23 +55,9 @@ fs.inotify.max_queued_events=32768
 # That toggle (if needed) should live in the module that sets up zram.
 """
 
-def _write_file(path: str, content: str, run: Callable) -> bool:
-    """Create parent directory and write file via tee (works with sudo -n)."""
-    parent = path.rsplit("/", 1)[0]
-    print(f"$ mkdir -p {parent}")
-    r = run(["mkdir", "-p", parent], check=False, capture_output=True)
-    if r.returncode != 0:
-        if r.stdout: print(r.stdout.rstrip())
-        if r.stderr: print(r.stderr.rstrip())
-        return False
-
-    print(f"$ tee {path}  # write drop-in")
-    r = run(["tee", path], check=False, capture_output=True, input_text=content)
-    if r.returncode != 0:
-        if r.stdout: print(r.stdout.rstrip())
-        if r.stderr: print(r.stderr.rstrip())
-        return False
-    return True
+def probe(run: Callable) -> bool:
+    """Drift check for the loader: both drop-ins still hold our content."""
+    return file_matches(JOURNALD_DROPIN, JOURNALD_CONTENT) and file_matches(SYSCTL_FILE, SYSCTL_CONTENT)
 
 def _install_packages(pkgs: list[str], run: Callable) -> bool:
     try:
@@ -79,17 +72,19 @@ def install(run: Callable) -> bool:
         print("▶ [020_system-defaults] Applying system defaults...")
 
         # 1) journald drop-in
-        if not _write_file(JOURNALD_DROPIN, JOURNALD_CONTENT, run):
+        ok, journald_changed = deploy_file(JOURNALD_DROPIN, JOURNALD_CONTENT, run)
+        if not ok:
             print("❌ Failed writing journald drop-in.")
             return False
 
         # 2) sysctl defaults
-        if not _write_file(SYSCTL_FILE, SYSCTL_CONTENT, run):
+        ok, sysctl_changed = deploy_file(SYSCTL_FILE, SYSCTL_CONTENT, run)
+        if not ok:
             print("❌ Failed writing sysctl defaults.")
             return False
 
         # 3) logrotate (for apps that still write plaintext logs)
-        if not _install_packages(["logrotate"], run):
+        if not _install_packages(PACKAGES, run):
             print("❌ Failed installing logrotate.")
             return False
 
@@ -99,20 +94,9 @@ def install(run: Callable) -> bool:
         if r.stdout: print(r.stdout.rstrip())
         if r.stderr: print(r.stderr.rstrip())
 
-        # Apply changes
-        print("$ systemctl restart systemd-journald")
-        r = run(["systemctl", "restart", "systemd-journald"], check=False, capture_output=True)
-        if r.returncode != 0:
-            if r.stdout: print(r.stdout.rstrip())
-            if r.stderr: print(r.stderr.rstrip())
-            return False
-
-        print("$ sysctl --system  # load /etc/sysctl.d/*")
-        r = run(["sysctl", "--system"], check=False, capture_output=True)
-        if r.stdout: print(r.stdout.rstrip())
-        if r.stderr: print(r.stderr.rstrip())
-        if r.returncode != 0:
-            return False
+        # Apply changes: restart journald / reload sysctl once, at the end of the run, if changed
+        triggers.notify("journald", journald_changed)
+        triggers.notify("sysctl", sysctl_changed)
 
         print("✔ [020_system-defaults] Complete.")
         return True
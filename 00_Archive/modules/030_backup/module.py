@@ -33,8 +33,20 @@ from __future__ import annotations
 from typing import Callable, Optional
 import shlex
 
+from utils.files import deploy_file
 from utils.pacman import install_packages as pacman_install
 
+REQUIRES = ["000_core"]
+TAGS = ["base", "storage"]
+HARDWARE = ["btrfs-root"]
+PACKAGES = [
+    "btrfs-progs",
+    "snapper",
+    "snap-pac",
+    "grub-btrfs",
+    "inotify-tools",
+]
+
 # ------------------------------- helpers ------------------------------------
 
 def _run_ok(run: Callable, cmd: list[str], *, input_text: Optional[str] = None) -> bool:
@@ -65,13 +77,8 @@ def _is_enabled(run: Callable, unit: str) -> bool:
 
 
 def _write_root_file(run: Callable, path: str, content: str, mode: str = "0644") -> bool:
-    # Use `install` to atomically create/update with permissions.
-    cmd = [
-        "bash",
-        "-lc",
-        f"install -D -m {shlex.quote(mode)} /dev/stdin {shlex.quote(path)}",
-    ]
-    return _run_ok(run, cmd, input_text=content)
+    ok, _ = deploy_file(path, content, run, mode=mode)
+    return ok
 
 
 def _append_root_file(run: Callable, path: str, content: str) -> bool:
@@ -174,14 +181,7 @@ def install(run: Callable) -> bool:
             return False
 
         # 1) Packages
-        pkgs = [
-            "btrfs-progs",
-            "snapper",
-            "snap-pac",
-            "grub-btrfs",
-            "inotify-tools",
-        ]
-        if not pacman_install(pkgs, run):
+        if not pacman_install(PACKAGES, run):
             return False
 
         # 2) Snapper root config & limits
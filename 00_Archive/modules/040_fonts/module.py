@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 040_fonts — System-wide Nerd Font defaults (Option A)
-Version: 1.0.1 (fix: ensure fc-cache available on minimal installs)
+Version: 1.1.0 (font cache refreshed once per run, only after config changes)
 
 What this module does
 ---------------------
@@ -10,7 +10,8 @@ What this module does
 - Installs Nerd Fonts Symbols for robust glyph/icon fallback.
 - Sets **JetBrainsMono Nerd Font** as the **system default for `monospace`** via Fontconfig.
 - Enables Nerd Symbols fallback (so apps automatically get Nerd icons when base fonts lack glyphs).
-- Refreshes font cache and prints a quick verification.
+- Refreshes the font cache (once, at the end of the run, when the config changed)
+  and prints a quick verification.
 
 Notes
 -----
@@ -22,11 +23,22 @@ Notes
 from __future__ import annotations
 
 from pathlib import Path
-from tempfile import NamedTemporaryFile
 from typing import Callable
 
+from utils import triggers
+from utils.files import deploy_file
 from utils.pacman import install_packages
 
+REQUIRES = ["000_core"]
+TAGS = ["desktop"]
+PACKAGES = [
+    "fontconfig",                 # provides fc-cache
+    "ttf-jetbrains-mono-nerd",    # base monospace font
+    "ttf-nerd-fonts-symbols",     # symbols-only fallback for icons
+    # Optional: better emoji fallback (uncomment if desired)
+    # "noto-fonts-emoji",
+]
+
 
 FONTCONF_DIR = Path("/etc/fonts")
 FONTCONF_LOCAL = FONTCONF_DIR / "local.conf"
@@ -99,27 +111,10 @@ def _ensure_dirs(run: Callable) -> bool:
 
 
 def _write_local_conf(xml: str, run: Callable) -> bool:
-    """Write XML to /etc/fonts/local.conf atomically using sudo runner."""
-    try:
-        with NamedTemporaryFile("w", delete=False, encoding="utf-8") as tmp:
-            tmp.write(xml)
-            tmp_path = Path(tmp.name)
-        _print_action(f"install -m 0644 {tmp_path} {FONTCONF_LOCAL}")
-        res = run(["install", "-m", "0644", str(tmp_path), str(FONTCONF_LOCAL)], check=False, capture_output=True)
-        try:
-            tmp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
-        if res.returncode != 0:
-            if res.stdout:
-                print(res.stdout.rstrip())
-            if res.stderr:
-                print(res.stderr.rstrip())
-            return False
-        return True
-    except Exception as exc:
-        print(f"ERROR: failed to write {FONTCONF_LOCAL}: {exc}")
-        return False
+    """Write XML to /etc/fonts/local.conf (atomically, only when it changed)."""
+    ok, changed = deploy_file(FONTCONF_LOCAL, xml, run)
+    triggers.notify("fc-cache", changed)
+    return ok
 
 
 def _enable_nerd_symbols(run: Callable) -> bool:
@@ -128,6 +123,9 @@ def _enable_nerd_symbols(run: Callable) -> bool:
         if not NERD_SYMBOLS_AVAIL.exists():
             print(f"⚠️  Nerd Symbols fontconfig file not found: {NERD_SYMBOLS_AVAIL}")
             return True  # Non-fatal; the main default still works.
+        if NERD_SYMBOLS_LINK.is_symlink() and NERD_SYMBOLS_LINK.resolve() == NERD_SYMBOLS_AVAIL.resolve():
+            _print_action(f"# {NERD_SYMBOLS_LINK} already links to {NERD_SYMBOLS_AVAIL}")
+            return True
         _print_action(f"ln -sf {NERD_SYMBOLS_AVAIL} {NERD_SYMBOLS_LINK}")
         res = run(["ln", "-sf", str(NERD_SYMBOLS_AVAIL), str(NERD_SYMBOLS_LINK)], check=False, capture_output=True)
         if res.returncode != 0:
@@ -136,37 +134,13 @@ def _enable_nerd_symbols(run: Callable) -> bool:
             if res.stderr:
                 print(res.stderr.rstrip())
             return False
+        triggers.notify("fc-cache")
         return True
     except Exception as exc:
         print(f"ERROR: failed to enable Nerd Symbols fallback: {exc}")
         return False
 
 
-def _refresh_cache(run: Callable) -> bool:
-    """
-    Refresh the font cache. If fc-cache is missing (very minimal base),
-    ensure fontconfig is installed or skip with a warning.
-    """
-    try:
-        # Quick presence check (in case someone removed fontconfig after install)
-        res_chk = run(["bash", "-lc", "command -v fc-cache || true"], check=False, capture_output=True)
-        if "fc-cache" not in (res_chk.stdout or ""):
-            print("⚠️  'fc-cache' not found. Is 'fontconfig' installed?")
-            return False
-
-        _print_action("fc-cache -f -v")
-        res = run(["fc-cache", "-f", "-v"], check=False, capture_output=True)
-        # fc-cache can be chatty; print on success/failure.
-        if res.stdout:
-            print(res.stdout.rstrip())
-        if res.stderr:
-            print(res.stderr.rstrip())
-        return res.returncode == 0
-    except Exception as exc:
-        print(f"ERROR: failed to refresh font cache: {exc}")
-        return False
-
-
 def _verify(run: Callable) -> None:
     try:
         _print_action("fc-match monospace")
@@ -179,19 +153,23 @@ def _verify(run: Callable) -> None:
         pass
 
 
+def probe(run: Callable) -> bool:
+    """Drift check for the loader: local.conf is ours and fc-match still picks the Nerd Font."""
+    try:
+        if FONTCONF_LOCAL.read_text(encoding="utf-8") != XML_OPTION_A:
+            return False
+    except OSError:
+        return False
+    res = run(["fc-match", "monospace"], check=False, capture_output=True)
+    return res.returncode == 0 and "JetBrainsMono" in (res.stdout or "")
+
+
 def install(run: Callable) -> bool:
     try:
         print("▶ [040_fonts] Installing and configuring system fonts (Nerd Font as monospace)…")
 
         # 1) Install required fonts + **fontconfig** so fc-cache exists on minimal installs
-        packages = [
-            "fontconfig",                 # provides fc-cache
-            "ttf-jetbrains-mono-nerd",    # base monospace font
-            "ttf-nerd-fonts-symbols",     # symbols-only fallback for icons
-            # Optional: better emoji fallback (uncomment if desired)
-            # "noto-fonts-emoji",
-        ]
-        if not install_packages(packages, run):
+        if not install_packages(PACKAGES, run):
             print("ERROR: Failed to install required font packages")
             return False
 
@@ -210,10 +188,8 @@ def install(run: Callable) -> bool:
         if not _enable_nerd_symbols(run):
             return False
 
-        # 5) Refresh cache and verify
-        if not _refresh_cache(run):
-            # Still attempt verification; but warn so user can `sudo pacman -S fontconfig`
-            print("⚠️  Could not refresh font cache (fc-cache missing?). You can run: sudo pacman -S fontconfig && fc-cache -f -v")
+        # 5) Verify (fc-match reads the config directly). The font cache is refreshed once at the
+        #    end of the run if the config changed; package installs refresh it through pacman's hook.
         _verify(run)
 
         print("✔ [040_fonts] Font configuration complete. JetBrainsMono Nerd Font is the system monospace default.")
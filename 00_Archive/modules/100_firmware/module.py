@@ -8,6 +8,13 @@ at the end so users can take immediate action.
 
 from typing import Callable
 
+from utils import triggers
+from utils.pacman import install_packages
+
+REQUIRES = ["000_core"]
+TAGS = ["hardware"]
+HARDWARE = ["intel-cpu"]
+
 # List of core firmware/microcode/utilities
 PACKAGES = [
     "linux-firmware",
@@ -19,13 +26,9 @@ PACKAGES = [
 
 
 def _install_packages(run: Callable) -> bool:
-    cmd = ["pacman", "-S", "--needed", "--noconfirm", *PACKAGES]
-    print("$", " ".join(cmd))
-    res = run(cmd, check=False, capture_output=True)
-    if res.returncode != 0:
+    # Shared helper: serializes with other modules' pacman transactions.
+    if not install_packages(PACKAGES, run):
         print("❌ Failed to install firmware packages")
-        if res.stderr:
-            print(res.stderr)
         return False
     return True
 
@@ -45,12 +48,11 @@ def _check_fw_updates(run: Callable) -> None:
         print(res.stderr.rstrip())
 
 
-def _regenerate_grub_if_present(run: Callable) -> None:
-    # Only if grub-mkconfig is present
-    res = run(["bash", "-lc", "command -v grub-mkconfig"], check=False, capture_output=True)
-    if res.returncode == 0:
-        print("$ sudo -n grub-mkconfig -o /boot/grub/grub.cfg")
-        run(["grub-mkconfig", "-o", "/boot/grub/grub.cfg"], check=False)
+def _grub_lacks_microcode(run: Callable) -> bool:
+    # grub.cfg may be root-only (password hashes); grep exits 1 = not referenced, 2 = no grub.cfg
+    print(f"$ grep -q intel-ucode.img {triggers.GRUB_CFG}")
+    res = run(["grep", "-q", "intel-ucode.img", triggers.GRUB_CFG], check=False, capture_output=True)
+    return res.returncode == 1
 
 
 def _nvme_device_present() -> bool:
@@ -73,8 +75,8 @@ def install(run: Callable) -> bool:
     # Print updates so user can act immediately
     _check_fw_updates(run)
 
-    # If grub is present, regen config to pick up new microcode
-    _regenerate_grub_if_present(run)
+    # If grub does not load the microcode yet, regenerate its config at the end of the run
+    triggers.notify("grub", _grub_lacks_microcode(run))
 
     # Show nvme list if device exists
     if _nvme_device_present():
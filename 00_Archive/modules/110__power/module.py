@@ -13,46 +13,21 @@ Idempotent and safe to run on fresh systems before graphics drivers are present.
 """
 
 from __future__ import annotations
-from pathlib import Path
 from typing import Callable
+from utils.files import deploy_file
 from utils.pacman import install_packages
 
+REQUIRES = ["000_core"]
+TAGS = ["hardware", "laptop"]
+PACKAGES = ["tlp", "tlp-rdw", "thermald", "powertop"]
+
 TLP_DROPIN = "/etc/tlp.d/10-laptop-baseline.conf"
 
 
 def _write_file(run: Callable, path: str, content: str) -> bool:
-    """Create parent dir, back up existing file, then write content via tee."""
-    try:
-        parent = Path(path).parent
-        # mkdir -p
-        res = run(["mkdir", "-p", str(parent)], check=False, capture_output=True)
-        if res.returncode != 0:
-            if res.stdout: print(res.stdout.rstrip())
-            if res.stderr: print(res.stderr.rstrip())
-            return False
-
-        # backup if present
-        res = run(
-            ["bash", "-lc", f"if [ -f '{path}' ]; then cp -a '{path}' '{path}.bak.$(date +%Y%m%d-%H%M%S)'; fi"],
-            check=False,
-            capture_output=True,
-        )
-        if res.returncode != 0:
-            if res.stdout: print(res.stdout.rstrip())
-            if res.stderr: print(res.stderr.rstrip())
-            return False
-
-        # write
-        res = run(["tee", path], check=False, capture_output=True, input_text=content)
-        if res.returncode != 0:
-            if res.stdout: print(res.stdout.rstrip())
-            if res.stderr: print(res.stderr.rstrip())
-            return False
-
-        return True
-    except Exception as exc:
-        print(f"ERROR: writing {path} failed: {exc}")
-        return False
+    """Write content when it changed, keeping the previous file as a timestamped backup."""
+    ok, _ = deploy_file(path, content, run, backup=True)
+    return ok
 
 
 def install(run: Callable) -> bool:
@@ -60,7 +35,7 @@ def install(run: Callable) -> bool:
         print("▶ [110_power] Installing baseline power/thermal tools...")
 
         # Packages: tlp, thermald, powertop (diagnostics only)
-        if not install_packages(["tlp", "tlp-rdw", "thermald", "powertop"], run):
+        if not install_packages(PACKAGES, run):
             return False
 
         # Avoid conflicts: mask power-profiles-daemon if it exists
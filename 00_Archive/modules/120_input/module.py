@@ -30,6 +30,16 @@ from typing import Callable
 from utils.pacman import install_packages
 from utils.symlinker import symlink_tree_files
 
+REQUIRES = ["000_core"]
+TAGS = ["hardware", "desktop"]
+PACKAGES = [
+    "libinput",
+    "xf86-input-libinput",
+    "xorg-xinput",
+    "xorg-xev",
+    "evtest",
+]
+
 
 def _module_dir() -> Path:
     return Path(__file__).resolve().parent
@@ -89,14 +99,7 @@ def install(run: Callable) -> bool:
     """
     try:
         print("▶ [120_input] Installing input device stack (libinput for Xorg)...")
-        packages = [
-            "libinput",
-            "xf86-input-libinput",
-            "xorg-xinput",
-            "xorg-xev",
-            "evtest",
-        ]
-        if not install_packages(packages, run):
+        if not install_packages(PACKAGES, run):
             print("❌ [120_input] Package installation failed.")
             return False
 
@@ -29,11 +29,16 @@ Notes
 
 from __future__ import annotations
 
-from datetime import datetime
 from typing import Callable, Optional
 
+from utils import triggers
+from utils.files import deploy_file
 from utils.pacman import install_packages
 
+REQUIRES = ["000_core"]
+TAGS = ["hardware", "graphics"]
+HARDWARE = ["intel-gpu", "nvidia-gpu"]
+
 # ------------------------- toggles / constants -------------------------
 
 ENABLE_NVIDIA_PERSISTENCE: bool = False         # set True if you want the daemon enabled
@@ -82,11 +87,12 @@ PKGS_MULTILIB = [
 ]
 
 
-# ------------------------- small helpers -------------------------
+def packages() -> list[str]:
+    """Packages this module installs (read by utils.package_plan before the run)."""
+    return PKGS_INTEL + PKGS_NVIDIA + (PKGS_MULTILIB if INSTALL_MULTILIB_LIBS else [])
 
-def _ts() -> str:
-    return datetime.now().strftime("%Y%m%d-%H%M%S")
 
+# ------------------------- small helpers -------------------------
 
 def _print_action(text: str) -> None:
     print(f"$ {text}")
@@ -109,57 +115,13 @@ def _read_file(path: str, run: Callable) -> Optional[str]:
     return res.stdout or ""
 
 
-def _write_file_if_changed(path: str, content: str, run: Callable) -> bool:
-    """If existing content differs, back it up and write new content."""
-    try:
+def probe(run: Callable) -> bool:
+    """Drift check for the loader: udev rules and modprobe options are still in place."""
+    for path, content in ((UDEV_RULES_PATH, UDEV_RULES_CONTENT), (MODPROBE_CONF_PATH, MODPROBE_CONTENT)):
         existing = _read_file(path, run)
-        if existing is not None and existing.strip() == content.strip():
-            _print_info(f"{path} already up-to-date.")
-            return True
-
-        # Backup if exists
-        if existing is not None and existing != "":
-            backup = f"{path}.bak.{_ts()}"
-            _print_action(f"cp -a {path} {backup}")
-            res = run(["cp", "-a", path, backup], check=False, capture_output=True)
-            if res.returncode != 0:
-                if res.stderr: _print_error(res.stderr.rstrip())
-                return False
-
-        # Ensure parent dir exists
-        _print_action(f"mkdir -p $(dirname {path})")
-        res = run(["bash", "-lc", f"mkdir -p \"$(dirname '{path}')\""], check=False, capture_output=True)
-        if res.returncode != 0:
-            if res.stderr: _print_error(res.stderr.rstrip())
-            return False
-
-        # Write via tee (root)
-        _print_action(f"tee {path}  >/dev/null")
-        res = run(["tee", path], check=False, capture_output=True, input_text=content)
-        if res.returncode != 0:
-            if res.stderr: _print_error(res.stderr.rstrip())
+        if existing is None or existing.strip() != content.strip():
             return False
-
-        return True
-    except Exception as exc:
-        _print_error(f"Failed writing {path}: {exc}")
-        return False
-
-
-def _reload_udev(run: Callable) -> bool:
-    ok = True
-    _print_action("udevadm control --reload")
-    r1 = run(["udevadm", "control", "--reload"], check=False, capture_output=True)
-    ok &= (r1.returncode == 0)
-    if r1.returncode != 0 and r1.stderr:
-        _print_error(r1.stderr.rstrip())
-
-    _print_action("udevadm trigger")
-    r2 = run(["udevadm", "trigger"], check=False, capture_output=True)
-    ok &= (r2.returncode == 0)
-    if r2.returncode != 0 and r2.stderr:
-        _print_error(r2.stderr.rstrip())
-    return ok
+    return True
 
 
 def _enable_persistenced(run: Callable) -> bool:
@@ -182,21 +144,21 @@ def install(run: Callable) -> bool:
         print("▶ [130_gpu] Installing Intel + NVIDIA drivers and configuring power management...")
 
         # 1) Packages
-        pkgs = PKGS_INTEL + PKGS_NVIDIA + (PKGS_MULTILIB if INSTALL_MULTILIB_LIBS else [])
-        if not install_packages(pkgs, run):
+        if not install_packages(packages(), run):
             _print_error("Package installation failed.")
             return False
 
-        # 2) Config files
-        if not _write_file_if_changed(UDEV_RULES_PATH, UDEV_RULES_CONTENT, run):
+        # 2) Config files (previous versions kept as .bak.<timestamp>)
+        ok, udev_changed = deploy_file(UDEV_RULES_PATH, UDEV_RULES_CONTENT, run, backup=True)
+        if not ok:
             return False
-        if not _write_file_if_changed(MODPROBE_CONF_PATH, MODPROBE_CONTENT, run):
+        ok, _ = deploy_file(MODPROBE_CONF_PATH, MODPROBE_CONTENT, run, backup=True)
+        if not ok:
             return False
 
-        # 3) Apply udev changes
-        if not _reload_udev(run):
-            _print_error("Failed to reload/trigger udev.")
-            return False
+        # 3) Apply udev changes at the end of the run (the rules match PCI devices only);
+        #    the modprobe options take effect on the next module load/boot
+        triggers.notify("udev", udev_changed, scope="pci")
 
         # 4) Optional persistence daemon
         if ENABLE_NVIDIA_PERSISTENCE:
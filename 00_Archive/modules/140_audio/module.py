@@ -33,8 +33,37 @@ import os
 import subprocess
 from typing import Callable
 
+from utils.files import deploy_file
 from utils.pacman import install_packages
 
+REQUIRES = ["000_core"]
+TAGS = ["hardware", "desktop"]
+HARDWARE = ["intel-sof-audio"]
+
+# Core audio stack (explicit pieces to avoid meta surprises)
+CORE_PACKAGES = [
+    "pipewire",
+    "pipewire-alsa",
+    "pipewire-pulse",
+    "pipewire-jack",
+    "wireplumber",     # provides 'wpctl'
+    "alsa-utils",
+    "alsa-ucm-conf",
+    "sof-firmware",
+    # handy mixers/inspectors
+    "pavucontrol",
+]
+BLUETOOTH_PACKAGES = ["bluez", "bluez-utils"]
+
+
+def _bluetooth_enabled() -> bool:
+    return os.environ.get("AUDIO_ENABLE_BLUETOOTH", "1") not in ("0", "false", "False", "no", "No")
+
+
+def packages() -> list[str]:
+    """Packages this module installs (read by utils.package_plan before the run)."""
+    return CORE_PACKAGES + (BLUETOOTH_PACKAGES if _bluetooth_enabled() else [])
+
 
 # ------------------------------- helpers -------------------------------------
 
@@ -53,27 +82,9 @@ def _run_user(cmd: list[str], *, check: bool = False, capture_output: bool = Tru
 
 
 def _write_root_file(path: str, content: str, run: Callable) -> bool:
-    """
-    Create/update a root-owned file at `path` using the sudo-runner.
-    Uses: install -Dm0644 /dev/stdin <path>
-    """
-    try:
-        res = run(
-            ["install", "-Dm0644", "/dev/stdin", path],
-            check=False,
-            capture_output=True,
-            input_text=content,
-        )
-        if res.returncode != 0:
-            if res.stdout:
-                print(res.stdout.rstrip())
-            if res.stderr:
-                print(res.stderr.rstrip())
-            return False
-        return True
-    except Exception as exc:
-        print(f"ERROR: failed writing {path}: {exc}")
-        return False
+    """Create/update a root-owned file at `path` (rewritten only when the content changed)."""
+    ok, _ = deploy_file(path, content, run)
+    return ok
 
 
 def _enable_user_units(units: list[str]) -> bool:
@@ -157,25 +168,9 @@ def install(run: Callable) -> bool:
     try:
         _print("▶ [140_audio] Installing PipeWire/WirePlumber + Intel SOF firmware")
 
-        enable_bt = os.environ.get("AUDIO_ENABLE_BLUETOOTH", "1") not in ("0", "false", "False", "no", "No")
-
-        # Core audio stack (explicit pieces to avoid meta surprises)
-        core_pkgs = [
-            "pipewire",
-            "pipewire-alsa",
-            "pipewire-pulse",
-            "pipewire-jack",
-            "wireplumber",     # provides 'wpctl'
-            "alsa-utils",
-            "alsa-ucm-conf",
-            "sof-firmware",
-            # handy mixers/inspectors
-            "pavucontrol",
-        ]
-
-        bt_pkgs = ["bluez", "bluez-utils"] if enable_bt else []
-
-        if not install_packages(core_pkgs + bt_pkgs, run):
+        enable_bt = _bluetooth_enabled()
+
+        if not install_packages(packages(), run):
             return False
 
         # Optional PipeWire pulse shim tweak: switch to newly connected outputs (USB DAC/HDMI/BT)
@@ -13,8 +13,27 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Callable
 
+from utils.files import deploy_file
 from utils.pacman import install_packages
 
+REQUIRES = ["000_core"]
+TAGS = ["base", "network"]
+PACKAGES = [
+    "networkmanager",
+    "iwd",                       # NM will use iwd as backend (do NOT enable iwd.service)
+    "bluez", "bluez-utils",
+    "bolt",                      # Thunderbolt authorization (D-Bus activated)
+    "usbutils",                  # lsusb
+    "ethtool",
+    "nm-connection-editor",
+    "network-manager-applet",
+
+    # --- VPN support ---
+    "openvpn",
+    "networkmanager-openvpn",
+    "wireguard-tools",           # NM has native WG support; tools provide wg/wg-quick, keygen, etc.
+]
+
 NM_CONF_DIR = Path("/etc/NetworkManager/conf.d")
 NM_WIFI_BACKEND = NM_CONF_DIR / "wifi_backend.conf"
 NM_MAC_PRIVACY = NM_CONF_DIR / "wifi_rand_mac.conf"
@@ -25,24 +44,8 @@ def _print_action(text: str) -> None:
 
 
 def _write_file_via_tee(path: Path, content: str, run: Callable) -> bool:
-    try:
-        _print_action(f"mkdir -p {path.parent}")
-        res = run(["mkdir", "-p", str(path.parent)], check=False, capture_output=True)
-        if res.returncode != 0:
-            if res.stdout: print(res.stdout.rstrip())
-            if res.stderr: print(res.stderr.rstrip())
-            return False
-
-        _print_action(f"tee {path}  # write config")
-        res = run(["tee", str(path)], check=False, capture_output=True, input_text=content)
-        if res.returncode != 0:
-            if res.stdout: print(res.stdout.rstrip())
-            if res.stderr: print(res.stderr.rstrip())
-            return False
-        return True
-    except Exception as exc:
-        print(f"ERROR: failed to write {path}: {exc}")
-        return False
+    ok, _ = deploy_file(path, content, run)
+    return ok
 
 
 def _enable_service(name: str, run: Callable) -> bool:
@@ -74,22 +77,7 @@ def install(run: Callable) -> bool:
         print("▶ [150_network] Starting network stack setup...")
 
         # 1) Packages (idempotent)
-        base_pkgs = [
-            "networkmanager",
-            "iwd",                       # NM will use iwd as backend (do NOT enable iwd.service)
-            "bluez", "bluez-utils",
-            "bolt",                      # Thunderbolt authorization (D-Bus activated)
-            "usbutils",                  # lsusb
-            "ethtool",
-            "nm-connection-editor",
-            "network-manager-applet",
-
-            # --- VPN support ---
-            "openvpn",
-            "networkmanager-openvpn",
-            "wireguard-tools",           # NM has native WG support; tools provide wg/wg-quick, keygen, etc.
-        ]
-        if not install_packages(base_pkgs, run):
+        if not install_packages(PACKAGES, run):
             print("ERROR: Package installation failed.")
             return False
 
@@ -24,6 +24,17 @@ import pwd
 from typing import Callable, Iterable
 from utils.pacman import install_packages
 
+# nvidia-container-toolkit needs the NVIDIA userspace from 130_gpu.
+REQUIRES = ["000_core", "130_gpu"]
+TAGS = ["dev"]
+HARDWARE = ["nvidia-gpu"]
+
+HW_CLI_PACKAGES = ["usbutils", "pciutils"]
+PODMAN_PACKAGES = ["podman", "podman-compose"]
+GPU_CONTAINER_PACKAGES = ["nvidia-container-toolkit"]
+VIRT_PACKAGES = ["qemu-desktop", "libvirt", "virt-manager", "edk2-ovmf", "dnsmasq"]
+PACKAGES = HW_CLI_PACKAGES + PODMAN_PACKAGES + GPU_CONTAINER_PACKAGES + VIRT_PACKAGES
+
 
 def _print_action(txt: str) -> None:
     print(f"$ {txt}")
@@ -85,11 +96,11 @@ def install(run: Callable) -> bool:
     user = getpass.getuser()
 
     # 0) Ensure handy hardware CLIs (you were missing lsusb earlier)
-    if not install_packages(["usbutils", "pciutils"], run):
+    if not install_packages(HW_CLI_PACKAGES, run):
         return False
 
     # 1) Podman (rootless) & compose helper
-    if not install_packages(["podman", "podman-compose"], run):
+    if not install_packages(PODMAN_PACKAGES, run):
         return False
 
     if not _enable_podman_user_socket(run, user):
@@ -105,13 +116,13 @@ def install(run: Callable) -> bool:
         print("ℹ️  For Docker-API clients, use: DOCKER_HOST=unix://$XDG_RUNTIME_DIR/podman/podman.sock")
 
     # 2) GPU in containers: NVIDIA Container Toolkit (CDI)
-    if not install_packages(["nvidia-container-toolkit"], run):
+    if not install_packages(GPU_CONTAINER_PACKAGES, run):
         return False
     print("✔ NVIDIA Container Toolkit installed (CDI).")
     print("   Test: podman run --rm --gpus all nvidia/cuda:12.4.1-base-archlinux nvidia-smi")
 
     # 3) Virtualization: QEMU/KVM + libvirt + virt-manager + OVMF + NAT
-    if not install_packages(["qemu-desktop", "libvirt", "virt-manager", "edk2-ovmf", "dnsmasq"], run):
+    if not install_packages(VIRT_PACKAGES, run):
         return False
 
     if not _enable_units(run, ["libvirtd.service"]):
@@ -17,10 +17,26 @@ Idempotency & Safety
 """
 
 from __future__ import annotations
+from pathlib import Path
 from typing import Callable
 
+from utils.files import deploy_file
 from utils.pacman import install_packages
 
+REQUIRES = ["000_core", "130_gpu"]
+PROVIDES = ["xorg"]
+TAGS = ["desktop", "graphics"]
+HARDWARE = ["nvidia-gpu"]
+
+# Minimal Xorg base (no xf86-video-intel; use modesetting)
+PACKAGES = [
+    "xorg-server",
+    "xorg-xinit",
+    "xorg-xrandr",
+    "xorg-xauth",   # small but handy (X11 auth forwarding)
+    "xorg-xset",    # utility; harmless
+]
+
 # ---- toggles ---------------------------------------------------------------
 
 # Write /etc/X11/xorg.conf.d/10-nvidia-offload.conf (recommended)
@@ -54,17 +70,9 @@ EndSection
 # ---- helpers ---------------------------------------------------------------
 
 def _write_file(run: Callable, path: str, content: str, mode: str = "0644") -> bool:
-    """Atomically create/update a root-owned file via install -D."""
-    try:
-        print(f"$ install -D -m {mode} /dev/stdin {path}")
-        res = run(["install", "-D", "-m", mode, "/dev/stdin", path],
-                  check=False, capture_output=True, input_text=content)
-        if res.stdout: print(res.stdout.rstrip())
-        if res.stderr: print(res.stderr.rstrip())
-        return res.returncode == 0
-    except Exception as exc:
-        print(f"ERROR: writing {path}: {exc}")
-        return False
+    """Atomically create/update a root-owned file (rewritten only when it changed)."""
+    ok, _ = deploy_file(path, content, run, mode=mode)
+    return ok
 
 
 def _ensure_dir(run: Callable, path: str) -> bool:
@@ -76,6 +84,19 @@ def _ensure_dir(run: Callable, path: str) -> bool:
     return True
 
 
+def probe(run: Callable) -> bool:
+    """Drift check for the loader: the enabled config snippets still match."""
+    wanted = []
+    if WRITE_NVIDIA_KMS_MODPROBE:
+        wanted.append((NVIDIA_KMS_MODPROBE_PATH, NVIDIA_KMS_MODPROBE_CONTENT))
+    if WRITE_XORG_NVIDIA_SNIPPET:
+        wanted.append((XORG_SNIPPET_PATH, XORG_SNIPPET_CONTENT))
+    try:
+        return all(Path(path).read_text(encoding="utf-8") == content for path, content in wanted)
+    except OSError:
+        return False
+
+
 # ---- main ------------------------------------------------------------------
 
 def install(run: Callable) -> bool:
@@ -83,14 +104,7 @@ def install(run: Callable) -> bool:
         print("▶ [200_display-server] Installing minimal Xorg + NVIDIA KMS baseline…")
 
         # 1) Minimal Xorg base (no xf86-video-intel; use modesetting)
-        pkgs = [
-            "xorg-server",
-            "xorg-xinit",
-            "xorg-xrandr",
-            "xorg-xauth",   # small but handy (X11 auth forwarding)
-            "xorg-xset",    # utility; harmless
-        ]
-        if not install_packages(pkgs, run):
+        if not install_packages(PACKAGES, run):
             return False
 
         # 2) NVIDIA DRM KMS via modprobe (safe, reversible)
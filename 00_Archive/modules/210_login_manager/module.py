@@ -16,8 +16,13 @@ import shutil
 from pathlib import Path
 from typing import Callable
 
+from utils.files import deploy_file
 from utils.pacman import install_packages
 
+REQUIRES = ["xorg"]
+TAGS = ["desktop"]
+PACKAGES = ["sddm"]
+
 THEME_SRC = Path(__file__).parent / "theme"
 THEME_DST = Path("/usr/share/sddm/themes")
 CONF_DIR = Path("/etc/sddm.conf.d")
@@ -30,27 +35,6 @@ Current=arch-bootstrap
 def _print_action(msg: str) -> None:
     print(f"$ {msg}")
 
-def _run_ok(run: Callable, cmd: list[str], input_text: str | None = None) -> bool:
-    """
-    Run a command via the sudo runner. The sudo runner expects 'input_text'
-    and already sets text=True internally.
-    """
-    try:
-        result = run(cmd, check=False, capture_output=True, input_text=input_text)
-        if result.returncode != 0:
-            # Prefer stderr if available, otherwise a generic failure line.
-            print(result.stderr or f"Command failed: {' '.join(cmd)}")
-            return False
-        # Surface stdout/stderr for visibility on success too (they may contain useful info).
-        if result.stdout:
-            print(result.stdout.rstrip())
-        if result.stderr:
-            print(result.stderr.rstrip())
-        return True
-    except Exception as e:
-        print(f"ERROR running {' '.join(cmd)}: {e}")
-        return False
-
 def _backup_then_replace_theme(run: Callable) -> bool:
     if not THEME_SRC.exists() or not THEME_SRC.is_dir():
         print(f"ℹ️  Theme source not found: {THEME_SRC}")
@@ -73,16 +57,12 @@ def _backup_then_replace_theme(run: Callable) -> bool:
         return False
 
 def _write_conf(run: Callable) -> bool:
-    _print_action(f"install -Dm0644 /dev/stdin {CONF_FILE}")
-    return _run_ok(
-        run,
-        ["install", "-Dm0644", "/dev/stdin", str(CONF_FILE)],
-        input_text=SDDM_CONF_CONTENT,
-    )
+    ok, _ = deploy_file(CONF_FILE, SDDM_CONF_CONTENT, run)
+    return ok
 
 def install(run: Callable) -> bool:
     # 1) Install sddm
-    if not install_packages(["sddm"], run):
+    if not install_packages(PACKAGES, run):
         return False
 
     # 2) Enable service (safe to do while a session is running; it activates on next boot)
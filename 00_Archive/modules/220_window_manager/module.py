@@ -48,6 +48,38 @@ import subprocess
 
 from utils.pacman import install_packages
 
+REQUIRES = ["xorg"]
+TAGS = ["desktop"]
+PACKAGES = [
+    # Core WM stack
+    "i3-wm",
+    "i3status",
+
+    # Launcher
+    "rofi",
+
+    # Lock / idle helpers
+    "i3lock",
+    "xss-lock",
+    "xorg-xset",
+
+    # UX & compositor & utilities
+    "picom",
+    "dunst",
+    "feh",
+    "arandr",
+    "xclip",
+
+    # QoL
+    "playerctl",
+    "brightnessctl",
+    "flameshot",
+    "lxappearance",
+
+    # Polkit agent for GUI auth prompts
+    "polkit-gnome",
+]
+
 
 # ------------------------------- helpers -------------------------------------
 
@@ -90,37 +122,7 @@ def install(run: Callable) -> bool:
     try:
         _print("▶ [220_window_manager] Installing i3 (X11) stack + helpers…")
 
-        pkgs = [
-            # Core WM stack
-            "i3-wm",
-            "i3status",
-
-            # Launcher
-            "rofi",
-
-            # Lock / idle helpers
-            "i3lock",
-            "xss-lock",
-            "xorg-xset",
-
-            # UX & compositor & utilities
-            "picom",
-            "dunst",
-            "feh",
-            "arandr",
-            "xclip",
-
-            # QoL
-            "playerctl",
-            "brightnessctl",
-            "flameshot",
-            "lxappearance",
-
-            # Polkit agent for GUI auth prompts
-            "polkit-gnome",
-        ]
-
-        if not install_packages(pkgs, run):
+        if not install_packages(PACKAGES, run):
             _print("❌ [220_window_manager] Package installation failed.")
             return False
 
@@ -140,6 +140,18 @@ import subprocess
 
 from utils.pacman import install_packages
 
+# Polybar is wired into i3 and uses the Nerd Font from 040_fonts.
+REQUIRES = ["220_window_manager", "040_fonts"]
+TAGS = ["desktop"]
+
+# Core bar + sensors for temperature module
+PACKAGES = [
+    "polybar",
+    "lm_sensors",   # for `sensors` and improved temp visibility
+    # Optional helper for quick battery/AC debugging (not required by Polybar):
+    # "acpi",
+]
+
 
 def _print(msg: str) -> None:
     print(msg)
@@ -170,15 +182,7 @@ def install(run: Callable) -> bool:
     try:
         _print("▶ [230_panels-bars] Installing Polybar + sensors tooling…")
 
-        # Core bar + sensors for temperature module
-        pkgs = [
-            "polybar",
-            "lm_sensors",   # for `sensors` and improved temp visibility
-            # Optional helper for quick battery/AC debugging (not required by Polybar):
-            # "acpi",
-        ]
-
-        if not install_packages(pkgs, run):
+        if not install_packages(PACKAGES, run):
             _print("❌ [230_panels-bars] Package installation failed.")
             return False
 
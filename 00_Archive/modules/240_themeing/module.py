@@ -9,11 +9,28 @@ from __future__ import annotations
 from typing import Callable, Optional
 import shlex
 
+from utils.files import deploy_file
 from utils.pacman import install_packages as pacman_install
 try:
-    from utils.yay import install_packages as yay_install
+    from utils import aur_queue
 except Exception:
-    yay_install = None  # yay optional
+    aur_queue = None  # yay optional
+
+REQUIRES = ["000_core", "yay"]
+TAGS = ["desktop"]
+
+# Repository packages (read by utils.package_plan); AUR ones stay with yay.
+PACKAGES = [
+    "papirus-icon-theme",    # icons (repo)
+    # cursor moved to AUR
+    "qt5ct", "qt6ct", "kvantum",
+    "gtk-engine-murrine",
+]
+AUR_PACKAGES = [
+    "nordic-theme",            # GTK Nord
+    "bibata-cursor-theme",     # Bibata cursor (AUR)
+    "kvantum-theme-nordic",    # Kvantum Nord
+]
 
 GTK_THEME_NAME = "Nordic"                   # AUR: nordic-theme
 ICON_THEME_NAME = "Papirus-Dark"            # repo: papirus-icon-theme
@@ -31,7 +48,8 @@ def _run_ok(run: Callable, cmd: list[str], *, input_text: Optional[str] = None)
     return res.returncode == 0
 
 def _write_file(run: Callable, path: str, content: str) -> bool:
-    return _run_ok(run, ["install", "-Dm0644", "/dev/stdin", path], input_text=content)
+    ok, _ = deploy_file(path, content, run)
+    return ok
 
 def _path_exists(run: Callable, path: str) -> bool:
     return run(["test", "-e", path], check=False).returncode == 0
@@ -75,24 +93,17 @@ def _apply_kvantum_theme(run: Callable, theme_name: str) -> bool:
 # ---------- installs ----------
 
 def _install_repo_packages(run: Callable) -> bool:
-    pkgs = [
-        "papirus-icon-theme",    # icons (repo)
-        # cursor moved to AUR
-        "qt5ct", "qt6ct", "kvantum",
-        "gtk-engine-murrine",
-    ]
-    return pacman_install(pkgs, run)
-
-def _install_aur_packages() -> bool:
-    if yay_install is None:
+    return pacman_install(PACKAGES, run)
+
+def _install_aur_packages(run: Callable) -> bool:
+    if aur_queue is None:
         print("⚠️  'yay' not available; skipping AUR themes (Nordic, Bibata, Kvantum Nordic).")
         return True  # non-fatal; we’ll fall back where needed
-    pkgs = [
-        "nordic-theme",            # GTK Nord
-        "bibata-cursor-theme",     # Bibata cursor (AUR)
-        "kvantum-theme-nordic",    # Kvantum Nord
-    ]
-    return yay_install(pkgs)
+    ticket = aur_queue.enqueue(AUR_PACKAGES, run)
+    # The theme checks below need the packages now: flush (with whatever else is queued)
+    if not ticket.done():
+        aur_queue.barrier(run)
+    return ticket.result()
 
 def install(run: Callable) -> bool:
     try:
@@ -102,7 +113,7 @@ def install(run: Callable) -> bool:
             print("❌ Failed installing base theming packages from repos.")
             return False
 
-        if not _install_aur_packages():
+        if not _install_aur_packages(run):
             print("⚠️  AUR theming packages failed to install. Continuing with fallbacks.")
 
         kvantum_available = _path_exists(run, "/usr/share/Kvantum") or \
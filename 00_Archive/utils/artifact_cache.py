@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of built AUR packages, shareable across machines
+Version: 1.1.0
+
+What the module does
+--------------------
+Every machine used to rebuild the same AUR packages from source. This cache
+stores the package files of a build under a key derived from what went into
+it, so any later run, on this host or another one, can install them instead:
+
+    key = sha256(pkgbase, architecture, .SRCINFO bytes, PKGBUILD bytes)
+
+Layout (the same locally, in a shared directory and on an HTTP server):
+
+    <root>/<key>/manifest.json   {"name", "arch", "files": [{"name", "sha256", "size", "sig"}], "created"}
+    <root>/<key>/<package file>  e.g. yay-bin-12.3.5-1-x86_64.pkg.tar.zst
+    <root>/<key>/<package file>.sig   detached signature, when the build was signed
+
+Lookup order: the local store (<cache>/aur/artifacts), then the shared
+location configured in $AUR_ARTIFACT_CACHE:
+- a directory (e.g. an NFS mount): read and written,
+- an https:// URL of a plain file server: read only. Publish by exporting
+  a shared directory that other hosts write to and the server serves.
+
+Trust
+-----
+The manifest's sha256 comes from the same place as the files, so it only
+catches corruption, not a rogue builder, and the files end up in
+`pacman -U` as root. Therefore:
+- manifests may only name plain package files (`<name>.pkg.tar.<ext>`, no
+  directories), anything else rejects the entry,
+- with $AUR_ARTIFACT_CACHE_KEYRING set (a GnuPG keyring file holding the
+  builders' public keys), every shared file must come with a detached
+  signature (`makepkg --sign` on the builder) that `gpgv` verifies against
+  that keyring, and a plain http:// location becomes usable,
+- without it, http:// locations are refused (the transfer is not
+  authenticated); directories and https:// servers are trusted as is.
+
+The local store is evicted least-recently-used first (a hit touches the
+manifest) whenever it grows past $AUR_ARTIFACT_CACHE_MAX_MB (default 2048).
+
+Public API
+----------
+artifact_key(name: str, checkout: Path, arch=None) -> str
+fetch(key: str) -> (files: list[Path], source: "local" | "shared") | None
+store(key: str, name: str, files: list[Path]) -> bool
+evict(max_bytes=None) -> int
+report() -> None
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils import run_report
+
+DEFAULT_MAX_MB = 2048
+HTTP_TIMEOUT_SEC = 30.0
+MANIFEST = "manifest.json"
+
+# What a manifest may list: a bare package file name as makepkg writes it.
+_PACKAGE_FILE_RE = re.compile(r"^[A-Za-z0-9@_+][A-Za-z0-9@._+-]*\.pkg\.tar(\.[A-Za-z0-9]+)?$")
+
+_LOCK = threading.Lock()
+_STATS = {"local": 0, "shared": 0, "miss": 0, "stored": 0, "published": 0, "evicted_bytes": 0}
+_REFUSED: set = set()  # shared locations already reported as unusable
+
+
+def _print_action(text: str) -> None:
+    print(f"$ {text}")
+
+
+def _print_error(message: str) -> None:
+    """Print a clear error message to stderr so it stands out in logs."""
+    print(f"ERROR: {message}", file=sys.stderr)
+
+
+def local_dir() -> Path:
+    """Return the local artifact store (next to utils.aur's checkouts and PKGDEST)."""
+    override = os.environ.get("DOTFILES_CACHE_DIR")
+    if override:
+        return Path(override).expanduser() / "aur" / "artifacts"
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "dotfiles" / "aur" / "artifacts"
+
+
+def shared_location() -> Optional[str]:
+    """Return $AUR_ARTIFACT_CACHE (a directory or an http(s) URL), or None."""
+    return os.environ.get("AUR_ARTIFACT_CACHE") or None
+
+
+def _trusted_keyring() -> Optional[Path]:
+    """Return $AUR_ARTIFACT_CACHE_KEYRING (builders' public keys for gpgv), or None."""
+    keyring = os.environ.get("AUR_ARTIFACT_CACHE_KEYRING")
+    return Path(keyring).expanduser().resolve() if keyring else None
+
+
+def _shared_usable(shared: str) -> bool:
+    """Plain http is only accepted when signatures are checked."""
+    if not shared.startswith("http://") or _trusted_keyring() is not None:
+        return True
+    with _LOCK:
+        if shared in _REFUSED:
+            return False
+        _REFUSED.add(shared)
+    _print_error(f"Refusing artifact cache {shared}: plain http is not authenticated; "
+                 "use https:// or set $AUR_ARTIFACT_CACHE_KEYRING to require signed builds")
+    return False
+
+
+def _max_bytes() -> int:
+    try:
+        return int(float(os.environ.get("AUR_ARTIFACT_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+    except ValueError:
+        return DEFAULT_MAX_MB * 1024 * 1024
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_key(name: str, checkout: Path, arch: Optional[str] = None) -> str:
+    """Hash of everything that determines the build output of a checkout."""
+    digest = hashlib.sha256(f"{name}\0{arch or platform.machine()}\0".encode())
+    for filename in (".SRCINFO", "PKGBUILD"):
+        try:
+            digest.update(filename.encode() + b"\0" + (checkout / filename).read_bytes() + b"\0")
+        except OSError:
+            digest.update(f"{filename}:missing\0".encode())
+    return digest.hexdigest()[:40]
+
+
+def _read_manifest(entry: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((entry / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _valid_manifest(manifest: Any) -> bool:
+    """Every listed file is a bare package file name with a sha256 and a size."""
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("files"), list) or not manifest["files"]:
+        return False
+    return all(
+        isinstance(item, dict)
+        and isinstance(item.get("name"), str) and _PACKAGE_FILE_RE.match(item["name"])
+        and isinstance(item.get("sha256"), str) and isinstance(item.get("size"), int)
+        for item in manifest["files"]
+    )
+
+
+def _verify_signature(path: Path, keyring: Path) -> bool:
+    """Check `<path>.sig` against the trusted keyring with gpgv."""
+    cmd = ["gpgv", "--keyring", str(keyring), f"{path}.sig", str(path)]
+    _print_action(" ".join(cmd))
+    try:
+        res = subprocess.run(cmd, check=False, capture_output=True, text=True)
+    except OSError as exc:
+        _print_error(f"Could not run gpgv: {exc}")
+        return False
+    return res.returncode == 0
+
+
+def _complete(entry: Path, manifest: Dict[str, Any]) -> bool:
+    return all((entry / f["name"]).is_file() and (entry / f["name"]).stat().st_size == f["size"]
+               for f in manifest.get("files", []))
+
+
+def _fetch_local(key: str) -> Optional[List[Path]]:
+    entry = local_dir() / key
+    manifest = _read_manifest(entry)
+    if not _valid_manifest(manifest) or not _complete(entry, manifest):
+        return None
+    os.utime(entry / MANIFEST)  # LRU: last use
+    return [entry / f["name"] for f in manifest["files"]]
+
+
+def _get(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=HTTP_TIMEOUT_SEC) as resp:
+        return resp.read()
+
+
+def _fetch_shared(key: str, shared: str) -> Optional[List[Path]]:
+    """Copy an entry from the shared directory or HTTP server into the local store, verified."""
+    is_http = shared.startswith(("http://", "https://"))
+    try:
+        if is_http:
+            manifest = json.loads(_get(f"{shared.rstrip('/')}/{key}/{MANIFEST}").decode("utf-8"))
+        else:
+            manifest = _read_manifest(Path(shared) / key)
+    except urllib.error.HTTPError as exc:
+        if exc.code != 404:
+            _print_error(f"Artifact cache {shared}: {exc}")
+        return None
+    except (OSError, urllib.error.URLError, ValueError) as exc:
+        _print_error(f"Artifact cache {shared} unreachable: {exc}")
+        return None
+    if not manifest:
+        return None
+    if not _valid_manifest(manifest):
+        _print_error(f"Artifact cache {shared}: malformed manifest for {key} (bad file names?); ignoring it")
+        return None
+    keyring = _trusted_keyring()
+
+    def copy(name: str, target: Path) -> None:
+        if is_http:
+            _print_action(f"curl -o {target} {shared.rstrip('/')}/{key}/{name}")
+            target.write_bytes(_get(f"{shared.rstrip('/')}/{key}/{name}"))
+        else:
+            _print_action(f"cp {Path(shared) / key / name} {target}")
+            shutil.copyfile(Path(shared) / key / name, target)
+
+    staging = local_dir() / f".{key}.{os.getpid()}.{threading.get_ident()}"
+    staging.mkdir(parents=True, exist_ok=True)
+    try:
+        for item in manifest["files"]:
+            target = staging / item["name"]
+            copy(item["name"], target)
+            if _sha256(target) != item["sha256"]:
+                _print_error(f"Checksum mismatch for {item['name']} from {shared}; ignoring the cached build")
+                return None
+            if keyring is not None:
+                if not item.get("sig"):
+                    _print_error(f"{item['name']} from {shared} is not signed; ignoring the cached build")
+                    return None
+                copy(f"{item['name']}.sig", staging / f"{item['name']}.sig")
+                if not _verify_signature(target, keyring):
+                    _print_error(f"Bad signature on {item['name']} from {shared}; ignoring the cached build")
+                    return None
+        (staging / MANIFEST).write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+        entry = local_dir() / key
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(staging, entry)
+    except (OSError, urllib.error.URLError, ValueError) as exc:
+        _print_error(f"Could not fetch {key} from {shared}: {exc}")
+        return None
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return [local_dir() / key / f["name"] for f in manifest["files"]]
+
+
+def fetch(key: str) -> Optional[Tuple[List[Path], str]]:
+    """Return the cached package files for `key` and where they came from, or None on a miss."""
+    files = _fetch_local(key)
+    source = "local"
+    shared = shared_location()
+    if files is None and shared and _shared_usable(shared):
+        files = _fetch_shared(key, shared)
+        source = "shared"
+        if files is not None:
+            evict()
+    with _LOCK:
+        _STATS[source if files is not None else "miss"] += 1
+    return (files, source) if files is not None else None
+
+
+def _write_entry(root: Path, key: str, manifest: Dict[str, Any], files: List[Path]) -> None:
+    """Write an entry under `root` atomically (staging directory, then rename)."""
+    staging = root / f".{key}.{os.getpid()}.{threading.get_ident()}"
+    staging.mkdir(parents=True, exist_ok=True)
+    try:
+        for path in files:
+            try:
+                os.link(path, staging / path.name)  # same filesystem: no copy
+            except OSError:
+                shutil.copyfile(path, staging / path.name)
+        (staging / MANIFEST).write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+        if (root / key).exists():
+            return  # another build (or host) got there first; same key, same content
+        os.replace(staging, root / key)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def store(key: str, name: str, files: List[Path]) -> bool:
+    """
+    Add freshly built package files under `key` locally and, if configured, in the shared directory.
+    Detached signatures next to them (`<file>.sig`, from `makepkg --sign`) are stored alongside.
+    """
+    try:
+        manifest = {
+            "name": name, "arch": platform.machine(), "created": time.time(),
+            "files": [{"name": f.name, "sha256": _sha256(f), "size": f.stat().st_size,
+                       "sig": f.with_name(f"{f.name}.sig").is_file()} for f in files],
+        }
+    except OSError as exc:
+        _print_error(f"Could not read the built files of {name}: {exc}")
+        return False
+    files = files + [f.with_name(f"{f.name}.sig") for f in files if f.with_name(f"{f.name}.sig").is_file()]
+    try:
+        _write_entry(local_dir(), key, manifest, files)
+    except OSError as exc:
+        _print_error(f"Could not store {name} in the artifact cache: {exc}")
+        return False
+    with _LOCK:
+        _STATS["stored"] += 1
+    shared = shared_location()
+    if shared and not shared.startswith(("http://", "https://")):
+        try:
+            _write_entry(Path(shared), key, manifest, files)
+            with _LOCK:
+                _STATS["published"] += 1
+        except OSError as exc:
+            print(f"⚠️  Could not publish {name} to {shared}: {exc}")
+    evict()
+    return True
+
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    """Delete least-recently-used local entries until the store fits `max_bytes`; returns bytes freed."""
+    limit = _max_bytes() if max_bytes is None else max_bytes
+    root = local_dir()
+    if not root.is_dir():
+        return 0
+    entries = []
+    for entry in root.iterdir():
+        if entry.name.startswith(".") or not entry.is_dir():
+            continue
+        try:
+            last_used = (entry / MANIFEST).stat().st_mtime
+        except OSError:
+            last_used = 0.0  # incomplete entries go first
+        size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+        entries.append((last_used, size, entry))
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    with _LOCK:
+        for _, size, entry in sorted(entries):
+            if total <= limit:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            freed += size
+        _STATS["evicted_bytes"] += freed
+    return freed
+
+
+def report() -> None:
+    """Put the cache counters into the run summary (replacing earlier numbers)."""
+    with _LOCK:
+        stats = dict(_STATS)
+    if not any(stats.values()):
+        return
+    line = (f"{stats['local']} local hit(s), {stats['shared']} shared hit(s), {stats['miss']} miss(es); "
+            f"{stats['stored']} build(s) stored")
+    if stats["published"]:
+        line += f", {stats['published']} published"
+    if stats["evicted_bytes"]:
+        line += f"; {stats['evicted_bytes'] / 1e6:.1f} MB evicted"
+    run_report.set_line("AUR cache", "artifacts", line)
+
+
+if __name__ == "__main__":
+    # Demonstration: list the local store, most recently used first (no network).
+    root = local_dir()
+    rows = []
+    for item in root.glob("*/" + MANIFEST):
+        data = _read_manifest(item.parent) or {}
+        rows.append((item.stat().st_mtime, item.parent.name, data))
+    print(f"{root} (shared: {shared_location() or 'none'}, limit {_max_bytes() / 2**20:.0f} MiB)")
+    for used, key, data in sorted(rows, reverse=True):
+        size = sum(f.get("size", 0) for f in data.get("files", []))
+        print(f"  {key[:12]}  {data.get('name', '?'):<24} {size / 1e6:8.1f} MB  last used {time.ctime(used)}")
@@ -0,0 +1,585 @@
+#!/usr/bin/env python3
+"""
+AUR checkouts and builds kept in a persistent cache, built in parallel
+Version: 1.3.0
+
+What the module does
+--------------------
+Bootstrapping an AUR package by hand (the classic `git clone --depth=1` into
+/tmp, `makepkg -si`, delete the checkout) costs a full clone and build every
+time, e.g. for `yay-bin` on every fresh machine or container. This helper
+keeps both halves in a cache that survives between runs:
+
+    <cache>/aur/src/<name>/      git checkout (updated with fetch + reset)
+    <cache>/aur/pkg/             built *.pkg.tar.zst files (makepkg's PKGDEST)
+
+`bootstrap(name, run)`:
+1) clones the checkout once, later only fetches and fast-forwards it
+   (an offline fetch keeps the existing checkout),
+2) asks `makepkg --packagelist` which files this PKGBUILD version produces;
+   the file names carry epoch/pkgver/pkgrel/arch, so they are the cache key,
+3) builds with `makepkg -s` into the package cache only when a file is missing,
+4) installs the files with one `pacman -U --needed` through the sudo runner.
+
+Cold (clone + build) and warm (cached package) timings are printed, recorded
+in the state store and added to the run summary.
+
+Parallel builds
+---------------
+`install_packages(names, run)` is the AUR build engine behind
+`utils.yay.install_packages`:
+1) resolve: checkouts are synced level by level (concurrently) and each
+   .SRCINFO's depends/makedepends/checkdepends are sorted into installed,
+   repository and AUR dependencies, following AUR ones recursively; the
+   result is a graph of pkgbases. "Installed" is decided by `pacman -T`, so
+   version constraints and provides count (an installed but too old
+   package is not enough). A dependency that is not a repository package
+   name is looked up among the repositories' provides (`pacman -Sddp`,
+   e.g. java-runtime or a soname like libfoo.so=1-64) before the AUR.
+   AUR names are mapped to their pkgbase with the RPC (`utils.aur_rpc`,
+   batched and cached), since the AUR serves git repos only per pkgbase:
+   a split package (or a dependency only a split pkgname satisfies) is
+   cloned and built once, under its pkgbase,
+2) every missing repository dependency is installed up front, in one
+   `utils.pacman.install_packages` call, so builds never start pacman
+   themselves (parallel `makepkg -s` runs would fight over the database lock),
+3) pkgbases are built as soon as their AUR dependencies are available, up
+   to `jobs` (default: CPU count) `makepkg` processes at a time; cached
+   package files are reused, and each build logs to <cache>/aur/logs/,
+4) a package that another build in the graph needs is installed (--asdeps)
+   right after it is built; everything else is installed in one final
+   `pacman -U` transaction.
+
+Built packages are also kept in `utils.artifact_cache`, keyed by the hash of
+the pkgbase, architecture, .SRCINFO and PKGBUILD. Every build (bootstrap and
+engine) goes through `obtain()`, which looks there first, including a shared
+directory or HTTP server ($AUR_ARTIFACT_CACHE) that other machines publish
+to, and installs straight from a hit without running makepkg.
+
+AUR git repositories are addressed by AUR_GIT_URL (`{name}` is the pkgbase),
+overridable with $AUR_GIT_URL or `url_template=`, e.g. a directory of local
+git repos standing in for the AUR ($AUR_RPC_URL points the pkgbase lookup at
+a matching stand-in). A name the RPC does not know, or cannot be asked
+about, is assumed to be its own pkgbase; `bootstrap()` always assumes so.
+
+Location
+--------
+    $DOTFILES_CACHE_DIR/aur      (if set)
+    $XDG_CACHE_HOME/dotfiles/aur (otherwise)
+    ~/.cache/dotfiles/aur        (fallback)
+
+makepkg refuses to run as root, so checkouts and builds run as the current
+(normal) user, like `utils.yay`; only the install goes through `run`.
+
+Public API
+----------
+cache_dir() -> Path
+parse_srcinfo(text: str) -> dict
+srcinfo_depspecs(info: dict) -> list[str]
+srcinfo_version(info: dict) -> str
+sync_checkout(name: str, url: str | None = None) -> (Path | None, str)
+package_files(checkout: Path) -> list[Path]
+obtain(name: str, checkout: Path, log=None) -> (ok, files, build_sec, source)
+bootstrap(name: str, run: Callable) -> bool
+resolve(names: list[str], url_template=None) -> (plan dict, repo deps, errors)
+install_packages(names: list[str], run: Callable, jobs=None, url_template=None) -> bool
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from utils import artifact_cache, pacman, pacman_db, run_report, state_store
+from utils.pacman import PACKAGE_LOCK
+
+AUR_GIT_URL = "https://aur.archlinux.org/{name}.git"
+
+# .SRCINFO keys whose values must be present to build and install (arch-specific variants too)
+_DEP_KEYS = ("depends", "makedepends", "checkdepends")
+_VERSION_RE = re.compile(r"[<>=].*$")
+
+
+def _print_action(text: str) -> None:
+    print(f"$ {text}")
+
+
+def _print_error(message: str) -> None:
+    """Print a clear error message to stderr so it stands out in logs."""
+    print(f"ERROR: {message}", file=sys.stderr)
+
+
+def cache_dir() -> Path:
+    """Return the directory that holds AUR checkouts and built packages."""
+    override = os.environ.get("DOTFILES_CACHE_DIR")
+    if override:
+        return Path(override).expanduser() / "aur"
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "dotfiles" / "aur"
+
+
+def _pkgdest() -> Path:
+    return cache_dir() / "pkg"
+
+
+def parse_srcinfo(text: str) -> Dict[str, List[str]]:
+    """
+    Parse a .SRCINFO into {key: [values]} for the pkgbase block, plus "pkgname": [all names].
+
+    Per-package blocks (after `pkgname = ...`) only contribute their dependency
+    lists, merged into the base ones; callers only need the version, names and
+    dependencies.
+    """
+    info: Dict[str, List[str]] = {"pkgname": []}
+    in_base = True
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, _, value = (part.strip() for part in line.partition("="))
+        if key == "pkgname":
+            info["pkgname"].append(value)
+            in_base = False
+        elif key == "pkgbase" or in_base or key.startswith(_DEP_KEYS):
+            values = info.setdefault(key, [])
+            if value not in values:
+                values.append(value)
+    return info
+
+
+def srcinfo_depspecs(info: Dict[str, List[str]], arch: str = "x86_64") -> List[str]:
+    """Return the dependency specs (with version constraints) of everything needed to build and install."""
+    specs: List[str] = []
+    for key in _DEP_KEYS:
+        for spec in info.get(key, []) + info.get(f"{key}_{arch}", []):
+            if spec and spec not in specs:
+                specs.append(spec)
+    return specs
+
+
+def srcinfo_depends(info: Dict[str, List[str]], arch: str = "x86_64") -> List[str]:
+    """Return the names (version constraints dropped) of everything needed to build and install."""
+    names: List[str] = []
+    for spec in srcinfo_depspecs(info, arch):
+        name = _VERSION_RE.sub("", spec)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def srcinfo_version(info: Dict[str, List[str]]) -> str:
+    """Return "[epoch:]pkgver-pkgrel" from parsed .SRCINFO data."""
+    version = f"{info.get('pkgver', ['0'])[0]}-{info.get('pkgrel', ['1'])[0]}"
+    epoch = info.get("epoch", ["0"])[0]
+    return version if epoch in ("", "0") else f"{epoch}:{version}"
+
+
+def _git(args: List[str], cwd: Optional[Path] = None, quiet: bool = False) -> subprocess.CompletedProcess:
+    if not quiet:
+        _print_action("git " + " ".join(args))
+    return subprocess.run(["git", *args], cwd=cwd, check=False, capture_output=True, text=True)
+
+
+def git_url(name: str, url_template: Optional[str] = None) -> str:
+    """Return the git URL of an AUR pkgbase (template: argument, then $AUR_GIT_URL, then the AUR)."""
+    return (url_template or os.environ.get("AUR_GIT_URL") or AUR_GIT_URL).format(name=name)
+
+
+def sync_checkout(name: str, url: Optional[str] = None) -> Tuple[Optional[Path], str]:
+    """
+    Clone the package's git repo into the cache once; afterwards only fetch and reset it.
+
+    Returns:
+        (checkout path or None, "cloned" | "updated" | "unchanged" | "offline")
+    """
+    url = url or git_url(name)
+    checkout = cache_dir() / "src" / name
+    if not (checkout / ".git").is_dir():
+        checkout.parent.mkdir(parents=True, exist_ok=True)
+        res = _git(["clone", "--depth=1", url, str(checkout)])
+        if res.returncode != 0:
+            _print_error(f"git clone {url} failed: {res.stderr.strip()}")
+            return None, "offline"
+        return checkout, "cloned"
+
+    before = _git(["rev-parse", "HEAD"], cwd=checkout, quiet=True).stdout.strip()
+    res = _git(["fetch", "--depth=1", "origin"], cwd=checkout)
+    if res.returncode != 0:
+        print(f"⚠️  Could not update {checkout} ({res.stderr.strip()}); using the cached checkout.")
+        return checkout, "offline"
+    res = _git(["reset", "--hard", "FETCH_HEAD"], cwd=checkout)
+    if res.returncode != 0:
+        _print_error(f"git reset in {checkout} failed: {res.stderr.strip()}")
+        return None, "offline"
+    after = _git(["rev-parse", "HEAD"], cwd=checkout, quiet=True).stdout.strip()
+    return checkout, "unchanged" if before == after else "updated"
+
+
+def _makepkg_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PKGDEST"] = str(_pkgdest())
+    return env
+
+
+def package_files(checkout: Path) -> List[Path]:
+    """Return the package files this checkout builds into the cache (they may not exist yet)."""
+    _pkgdest().mkdir(parents=True, exist_ok=True)
+    res = subprocess.run(["makepkg", "--packagelist"], cwd=checkout, env=_makepkg_env(),
+                         check=False, capture_output=True, text=True)
+    if res.returncode != 0:
+        _print_error(f"makepkg --packagelist failed in {checkout}: {res.stderr.strip()}")
+        return []
+    return [Path(line.strip()) for line in res.stdout.splitlines() if line.strip()]
+
+
+def _build(checkout: Path, log: Optional[Path] = None) -> bool:
+    """Run makepkg in `checkout`; streams output, or writes it to `log` (parallel builds)."""
+    if log is None:
+        cmd = ["makepkg", "-s", "--noconfirm", "--needed", "-f"]
+        _print_action(f"(cd {checkout} && PKGDEST={_pkgdest()} {' '.join(cmd)})")
+        # Stream output (no capture) so makepkg progress stays visible.
+        res = subprocess.run(cmd, cwd=checkout, env=_makepkg_env(), check=False, text=True)
+        return res.returncode == 0
+    # Dependencies are installed beforehand; makepkg must not start pacman itself
+    cmd = ["makepkg", "--noconfirm", "-f"]
+    _print_action(f"(cd {checkout} && PKGDEST={_pkgdest()} {' '.join(cmd)} > {log} 2>&1)")
+    log.parent.mkdir(parents=True, exist_ok=True)
+    with open(log, "w", encoding="utf-8") as fh:
+        res = subprocess.run(cmd, cwd=checkout, env=_makepkg_env(), check=False, text=True,
+                             stdout=fh, stderr=subprocess.STDOUT)
+    return res.returncode == 0
+
+
+def obtain(name: str, checkout: Path, log: Optional[Path] = None) -> Tuple[bool, List[Path], float, str]:
+    """
+    Return the package files for a checkout, from the artifact cache when possible, else by building.
+
+    Returns:
+        (ok, files, seconds spent in makepkg, source) with source one of
+        "local"/"shared" (artifact cache hit), "pkgdest" (already built here) or "built".
+    """
+    key = artifact_cache.artifact_key(name, checkout)
+    hit = artifact_cache.fetch(key)
+    if hit is not None:
+        files, source = hit
+        _print_action(f"# {name}: {source} artifact cache hit ({key[:12]}); skipping makepkg")
+        return True, files, 0.0, source
+    files = package_files(checkout)
+    if not files:
+        return False, [], 0.0, "failed"
+    if all(f.exists() for f in files):
+        artifact_cache.store(key, name, files)
+        return True, files, 0.0, "pkgdest"
+    began = time.monotonic()
+    if not _build(checkout, log) or not all(f.exists() for f in files):
+        return False, files, time.monotonic() - began, "failed"
+    elapsed = time.monotonic() - began
+    artifact_cache.store(key, name, files)
+    return True, files, elapsed, "built"
+
+
+def _package_name(path: Path) -> str:
+    """'foo-bar-1.0-1-x86_64.pkg.tar.zst' -> 'foo-bar'."""
+    return path.name.split(".pkg.tar", 1)[0].rsplit("-", 3)[0]
+
+
+def install_files(files: List[Path], run: Callable, as_deps: bool = False) -> bool:
+    """Install built package files in one `pacman -U --needed` transaction."""
+    cmd = ["pacman", "-U", "--needed", "--noconfirm", *(["--asdeps"] if as_deps else []), *[str(f) for f in files]]
+    _print_action(" ".join(cmd))
+    with PACKAGE_LOCK:
+        res = run(cmd, check=False)
+    return res.returncode == 0
+
+
+def bootstrap(name: str, run: Callable, url: Optional[str] = None) -> bool:
+    """
+    Install an AUR package from the persistent cache, building it only when its version is not cached.
+
+    Returns:
+        True if the package was installed, False otherwise.
+    """
+    started = time.monotonic()
+    checkout, checkout_state = sync_checkout(name, url)
+    if checkout is None:
+        return False
+    version = srcinfo_version(parse_srcinfo((checkout / ".SRCINFO").read_text(encoding="utf-8")))
+    ok, files, _, source = obtain(name, checkout)
+    if not ok:
+        _print_error(f"makepkg failed for {name} {version}")
+        return False
+    cached = source != "built"
+    if source == "pkgdest":
+        _print_action(f"# {name} {version} already built in {_pkgdest()}; skipping makepkg")
+    if not install_files(files, run):
+        _print_error(f"pacman -U failed for {name} {version}")
+        return False
+
+    elapsed = time.monotonic() - started
+    key = f"aur.bootstrap.{name}"
+    timings = state_store.get_value(key, None) or {}
+    path = "warm" if cached else "cold"
+    timings[f"{path}_sec"] = round(elapsed, 2)
+    timings["version"] = version
+    state_store.set_value(key, timings)
+
+    line = f"{name} {version}: {path} path ({checkout_state} checkout"
+    line += {"local": ", cached build)", "shared": ", shared cached build)",
+             "pkgdest": ", cached package)"}.get(source, ", built)")
+    line += f" in {elapsed:.1f}s"
+    if cached and "cold_sec" in timings:
+        line += f" (cold build took {timings['cold_sec']:.1f}s)"
+    print(f"⏱  {line}")
+    run_report.add("AUR bootstrap", line)
+    artifact_cache.report()
+    return True
+
+
+# -------------------------------
+# Parallel build engine
+# -------------------------------
+
+def repo_package_names() -> Set[str]:
+    """Names of all packages in the sync databases (`pacman -Slq`); empty if pacman is unavailable."""
+    try:
+        res = subprocess.run(["pacman", "-Slq"], check=False, capture_output=True, text=True)
+    except OSError:
+        return set()
+    return set(res.stdout.split()) if res.returncode == 0 else set()
+
+
+def _satisfied(name: str) -> bool:
+    return pacman_db.provider_of(name) is not None
+
+
+def _unsatisfied(specs: List[str]) -> List[str]:
+    """
+    Return the dependency specs the installed packages do not satisfy, versions
+    and provides included (`pacman -T`); by name only if pacman cannot tell.
+    """
+    if not specs:
+        return []
+    try:
+        res = subprocess.run(["pacman", "-T", *specs], check=False, capture_output=True, text=True)
+    except OSError:
+        res = None
+    if res is None or res.returncode not in (0, 127):  # 127: some are missing
+        return [spec for spec in specs if not _satisfied(_VERSION_RE.sub("", spec))]
+    return [line.strip() for line in res.stdout.splitlines() if line.strip()]
+
+
+def _repo_provider(spec: str) -> Optional[str]:
+    """Return the repository package pacman would pick for `spec` (a name, provide or soname), or None."""
+    cmd = ["pacman", "-Sddp", "--noconfirm", "--print-format", "%n", spec]
+    try:
+        res = subprocess.run(cmd, check=False, capture_output=True, text=True)
+    except OSError:
+        return None
+    names = res.stdout.split()
+    return names[-1] if res.returncode == 0 and names else None
+
+
+def _pkgbases(names: List[str]) -> Dict[str, str]:
+    """Map AUR package names to their pkgbase (RPC `PackageBase`); unknown names map to themselves."""
+    if not names:
+        return {}
+    from utils import aur_rpc  # imported here: aur_rpc imports this module
+
+    known = aur_rpc.info(names)
+    return {name: known.get(name, {}).get("PackageBase") or name for name in names}
+
+
+def resolve(
+    names: List[str],
+    url_template: Optional[str] = None,
+    jobs: int = 8,
+) -> Tuple[Dict[str, Dict[str, Any]], List[str], List[str]]:
+    """
+    Follow AUR dependencies from `names` and sort every dependency by where it comes from.
+
+    Returns:
+        (plan, repo_deps, errors) where plan is
+        {pkgbase: {"checkout": Path, "info": dict, "needs": set of pkgbases, "target": bool}},
+        repo_deps are repository packages to install first (not installed yet)
+        and errors lists names that are neither installed, in a repository nor in the AUR
+        (no checkout of their pkgbase, or its .SRCINFO does not build them).
+        A versioned dependency on a repository package stays a spec (e.g.
+        "foo>=1.2") in repo_deps, so pacman enforces the constraint.
+    """
+    repo = repo_package_names()
+    plan: Dict[str, Dict[str, Any]] = {}
+    repo_deps: List[str] = []
+    errors: List[str] = []
+    provided_by: Dict[str, str] = {}
+    targets = set(names)
+    pending = [n for n in names if n not in repo]
+    repo_deps.extend(n for n in names if n in repo)
+    deps_of: Dict[str, List[str]] = {}
+    unresolved: List[str] = []  # dependency specs found on the current level
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending:
+            wanted = [n for n in dict.fromkeys(pending) if n not in provided_by]
+            pending = []
+            base_of = _pkgbases(wanted)
+            level = [base for base in dict.fromkeys(base_of.values()) if base not in plan]
+            checkouts = dict(zip(level, pool.map(lambda b: sync_checkout(b, git_url(b, url_template))[0], level)))
+            for base in level:
+                checkout = checkouts[base]
+                srcinfo = checkout / ".SRCINFO" if checkout else None
+                if srcinfo is None or not srcinfo.is_file():
+                    continue  # the AUR serves an empty repository for unknown names
+                info = parse_srcinfo(srcinfo.read_text(encoding="utf-8"))
+                plan[base] = {"checkout": checkout, "info": info, "needs": set(),
+                              "target": any(pkgname in targets for pkgname in info["pkgname"])}
+                for pkgname in info["pkgname"]:
+                    provided_by[pkgname] = base
+                deps_of[base] = srcinfo_depends(info)
+                unresolved.extend(spec for spec in srcinfo_depspecs(info) if spec not in unresolved)
+            errors.extend(n for n in wanted if n not in provided_by)
+
+            # Not installed (in the wanted version): a repository has it under that name or as a provide, or the AUR.
+            missing = [spec for spec in _unsatisfied(unresolved) if _VERSION_RE.sub("", spec) not in provided_by]
+            unresolved = []
+            lookups = [spec for spec in missing if _VERSION_RE.sub("", spec) not in repo]
+            providers = dict(zip(lookups, pool.map(_repo_provider, lookups)))
+            for spec in missing:
+                dep = _VERSION_RE.sub("", spec)
+                source = spec if dep in repo else providers[spec]
+                if source is None:
+                    pending.append(dep)
+                elif source not in repo_deps:
+                    repo_deps.append(source)
+
+    for base, deps in deps_of.items():
+        plan[base]["needs"] = {provided_by[d] for d in deps if d in provided_by} - {base}
+    return plan, pacman_db.missing_packages(repo_deps), errors
+
+
+def _cycle(plan: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Return the pkgbases caught in a dependency cycle (empty when the graph is a DAG)."""
+    remaining = {base: set(entry["needs"]) for base, entry in plan.items()}
+    while True:
+        free = [base for base, needs in remaining.items() if not needs]
+        if not free:
+            return sorted(remaining)
+        for base in free:
+            del remaining[base]
+        for needs in remaining.values():
+            needs.difference_update(free)
+        if not remaining:
+            return []
+
+
+def install_packages(
+    names: List[str],
+    run: Callable,
+    jobs: Optional[int] = None,
+    url_template: Optional[str] = None,
+) -> bool:
+    """
+    Build AUR packages (and their AUR dependencies) in parallel and install them.
+
+    Returns:
+        True if every requested package was installed, False otherwise.
+    """
+    started = time.monotonic()
+    jobs = jobs or os.cpu_count() or 2
+    plan, repo_deps, errors = resolve(names, url_template)
+    if errors:
+        _print_error(f"Not found in the repositories or the AUR: {', '.join(errors)}")
+        return False
+    cycle = _cycle(plan)
+    if cycle:
+        _print_error(f"AUR dependency cycle between: {', '.join(cycle)}")
+        return False
+    if repo_deps and not pacman.install_packages(repo_deps, run):
+        return False
+    if not plan:
+        return True
+
+    needed_by_others = {dep for entry in plan.values() for dep in entry["needs"]}
+    wanted_names = set(names) | {dep for entry in plan.values() for dep in srcinfo_depends(entry["info"])}
+    available: Set[str] = set()
+    failed: Set[str] = set()
+    final_files: List[Path] = []
+    stats = {"built": 0, "cached": 0, "build_sec": 0.0}
+    logs = cache_dir() / "logs"
+
+    def build(base: str) -> Tuple[bool, List[Path], float]:
+        ok, files, elapsed, _ = obtain(base, plan[base]["checkout"], logs / f"{base}.log")
+        return ok, files, elapsed
+
+    print(f"ℹ️  Building {len(plan)} AUR package base(s), up to {jobs} at a time.")
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="makepkg") as pool:
+        running: Dict[Future, str] = {}
+        queued = set()
+
+        def submit_ready() -> None:
+            for base, entry in plan.items():
+                if base in queued or not entry["needs"] <= available:
+                    continue
+                if entry["needs"] & failed:
+                    continue
+                queued.add(base)
+                running[pool.submit(build, base)] = base
+
+        submit_ready()
+        while running:
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                base = running.pop(future)
+                try:
+                    ok, files, elapsed = future.result()
+                except Exception as exc:  # e.g. OSError hashing or storing the build in the artifact cache
+                    failed.add(base)
+                    _print_error(f"Could not build or cache {base}: {exc}")
+                    continue
+                if not ok:
+                    failed.add(base)
+                    _print_error(f"makepkg failed for {base}; see {logs / (base + '.log')}")
+                    continue
+                stats["built" if elapsed else "cached"] += 1
+                stats["build_sec"] += elapsed
+                # Split packages: only the requested pkgnames and what other builds depend on
+                wanted = [f for f in files if _package_name(f) in wanted_names] or files
+                if base in needed_by_others:
+                    # Another build needs it installed before it can start
+                    if not install_files(wanted, run, as_deps=not plan[base]["target"]):
+                        failed.add(base)
+                        continue
+                else:
+                    final_files.extend(wanted)
+                available.add(base)
+            submit_ready()
+
+    skipped = set(plan) - available - failed
+    ok = not failed and not skipped
+    if final_files and not install_files(final_files, run):
+        ok = False
+    elapsed = time.monotonic() - started
+    run_report.add("AUR builds", f"{len(available)} of {len(plan)} package base(s) ready in {elapsed:.1f}s "
+                                 f"({stats['built']} built, {stats['cached']} from cache, up to {jobs} in parallel; "
+                                 f"{stats['build_sec']:.1f}s of makepkg time)")
+    if failed or skipped:
+        run_report.add("AUR builds", f"failed: {', '.join(sorted(failed))}"
+                                     + (f"; not built: {', '.join(sorted(skipped))}" if skipped else ""))
+    artifact_cache.report()
+    return ok
+
+
+if __name__ == "__main__":
+    # Demonstration: show what is cached (no network, no build, no root).
+    root = cache_dir()
+    print(f"AUR cache: {root}")
+    for src in sorted((root / "src").glob("*/.SRCINFO")):
+        info = parse_srcinfo(src.read_text(encoding="utf-8"))
+        print(f"  {src.parent.name:<20} {srcinfo_version(info)}")
+    for pkg in sorted((root / "pkg").glob("*.pkg.tar*")):
+        print(f"  {pkg.name}")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Deferred AUR install queue, flushed once per run
+Version: 1.1.1
+
+What the module does
+--------------------
+Every `utils.yay.install_packages()` call resolves its own dependency graph
+and ends in its own pacman transaction. Modules that do not need their AUR
+packages right away can queue them instead:
+
+    ticket = aur_queue.enqueue(["nordic-theme", "bibata-cursor-theme"], run)
+
+`enqueue()` returns a `concurrent.futures.Future` (the handle) that resolves
+to True/False once the packages are installed. Packages that are already
+installed and up to date (`utils.yay.pending_packages`) resolve the handle
+immediately.
+
+The loader calls `flush(run)` once after the last module ran: all queued
+packages, from every module, go through ONE `utils.yay.install_packages()`
+call, i.e. one resolution and one final install. A module that needs its
+packages before it continues calls `barrier(run)`, which flushes everything
+queued so far (its own packages and those of other modules) right away,
+then reads its handle.
+
+If the combined install fails, each handle is resolved by what actually got
+installed (read from the local package database), so only the modules whose
+packages are missing see a failure. `flush()` returns those modules; the
+loader marks them (and the run) failed. A module that called `barrier()`
+reads its own handle and decides itself whether that is fatal, so its
+failures are only listed by `rerun_owners()`: the loader records them so the
+fingerprint does not skip the module next time, without failing the run.
+
+Modules are identified through `owned_by(name)`, which the loader wraps
+around each install().
+
+Public API
+----------
+enqueue(packages: list[str], run: Callable) -> Future[bool]
+barrier(run: Callable) -> bool
+flush(run: Callable) -> list[str]     (names of modules whose packages failed)
+rerun_owners() -> list[str]           (modules whose packages failed at their own barrier)
+owned_by(name: str) -> context manager
+report() -> None
+"""
+
+from __future__ import annotations
+
+import contextlib
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils import pacman_db, run_report, yay
+from utils.pacman import note_avoided
+
+# Serializes flushes: a barrier in one module and the loader's final flush never overlap.
+_FLUSH_LOCK = threading.Lock()
+_QUEUE_LOCK = threading.Lock()
+_QUEUE: List[Tuple[List[str], Optional[str], Future]] = []
+_OWNER = threading.local()
+_FAILED_OWNERS: set = set()
+# Owners whose own tickets failed at their barrier: they handled the result themselves.
+_RERUN_OWNERS: set = set()
+_STATS: Dict[str, float] = {"requests": 0, "packages": 0, "flushes": 0, "flush_sec": 0.0}
+
+
+def _print_action(text: str) -> None:
+    print(f"$ {text}")
+
+
+@contextlib.contextmanager
+def owned_by(name: str) -> Iterator[None]:
+    """Attribute packages queued by the current thread to module `name`."""
+    previous = getattr(_OWNER, "name", None)
+    _OWNER.name = name
+    try:
+        yield
+    finally:
+        _OWNER.name = previous
+
+
+def enqueue(packages: List[str], run: Callable) -> Future:
+    """
+    Queue AUR packages for the next flush.
+
+    Returns:
+        A Future resolving to True once the packages are installed (False on failure).
+        Call `barrier(run)` before waiting on it inside a module.
+    """
+    ticket: Future = Future()
+    cleaned = [p.strip() for p in packages if isinstance(p, str) and p.strip()]
+    missing = yay.pending_packages(cleaned)
+    if not missing:
+        note_avoided()
+        _print_action(f"# AUR queue: {' '.join(cleaned) or '(nothing)'} installed and up to date")
+        ticket.set_result(True)
+        return ticket
+    owner = getattr(_OWNER, "name", None)
+    _print_action(f"# AUR queue: {' '.join(missing)} queued" + (f" by {owner}" if owner else ""))
+    with _QUEUE_LOCK:
+        _QUEUE.append((missing, owner, ticket))
+        _STATS["requests"] += 1
+    return ticket
+
+
+def _drain(run: Callable, consumer: Optional[str] = None) -> List[str]:
+    """
+    Install everything queued so far in one call; returns the owners of failed requests.
+    Failed requests of `consumer` (the module at its barrier) are only recorded for a re-run.
+    """
+    with _FLUSH_LOCK:
+        with _QUEUE_LOCK:
+            batch = list(_QUEUE)
+            _QUEUE.clear()
+        if not batch:
+            return []
+        merged = list(dict.fromkeys(p for pkgs, _, _ in batch for p in pkgs))
+        owners = sorted({owner for _, owner, _ in batch if owner})
+        print(f"▶ AUR queue: {len(merged)} package(s) from {len(batch)} request(s)"
+              + (f" ({', '.join(owners)})" if owners else ""))
+        started = time.monotonic()
+        ok = yay.install_packages(merged, run)
+        _STATS["flushes"] += 1
+        _STATS["packages"] += len(merged)
+        _STATS["flush_sec"] += time.monotonic() - started
+
+        failed: List[str] = []
+        still_missing = set() if ok else set(pacman_db.missing_packages(merged))
+        for pkgs, owner, ticket in batch:
+            done = not still_missing.intersection(pkgs)
+            ticket.set_result(done)
+            if done:
+                continue
+            failed.append(owner or "(unknown)")
+            if consumer is not None and owner == consumer:
+                _RERUN_OWNERS.add(owner)
+            else:
+                _FAILED_OWNERS.add(owner or "(unknown)")
+        if still_missing:
+            run_report.add("AUR queue", f"not installed: {', '.join(sorted(still_missing))}")
+        return sorted(set(failed))
+
+
+def barrier(run: Callable) -> bool:
+    """
+    Flush the queue now, for a module that needs its packages immediately.
+
+    Returns:
+        True if everything queued so far got installed. A module checks its
+        own handle (`ticket.result()`) to learn about its packages; their
+        failure does not fail the run, it only makes the module run again.
+    """
+    return not _drain(run, consumer=getattr(_OWNER, "name", None))
+
+
+def flush(run: Callable) -> List[str]:
+    """Flush the queue at the end of the run; returns every module whose packages failed this run."""
+    _drain(run)
+    return sorted(_FAILED_OWNERS)
+
+
+def rerun_owners() -> List[str]:
+    """Modules whose own packages failed at their barrier; they should run again next time."""
+    return sorted(_RERUN_OWNERS - _FAILED_OWNERS)
+
+
+def report() -> None:
+    """Add the queue's work to the run summary."""
+    if not _STATS["requests"]:
+        return
+    run_report.add("AUR queue", f"{int(_STATS['requests'])} request(s), {int(_STATS['packages'])} package(s) "
+                                f"in {int(_STATS['flushes'])} flush(es) ({_STATS['flush_sec']:.1f}s)")
+
+
+if __name__ == "__main__":
+    # Demonstration: queue a package and show the handle (no flush, no install).
+    handle = enqueue(["bat"], run=lambda cmd, **kwargs: None)
+    print(f"queued: {len(_QUEUE)} request(s); handle done: {handle.done()}")
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of AUR RPC package metadata, refreshed in batches
+Version: 1.0.0
+
+What the module does
+--------------------
+Deciding whether an installed AUR package is up to date only needs its
+current AUR version, which rarely changes. This helper keeps the AUR RPC
+`info` results (version, pkgbase, dependency lists, LastModified) on disk:
+
+    <cache>/aur/rpc-info.json   {"entries": {name: {..., "fetched_at": epoch}}}
+
+`info(names)`:
+1) answers every name whose entry is younger than the TTL from the file,
+2) fetches only the missing/expired names, many per request
+   (`GET <rpc>?arg[]=a&arg[]=b...`, up to MAX_NAMES_PER_REQUEST each),
+3) remembers names the AUR does not know too (negative entries), so they
+   are not asked for again until the TTL runs out,
+4) on a network error keeps serving expired entries rather than nothing.
+
+`outdated(names)` compares the installed versions (utils.pacman_db) with the
+cached AUR versions using pacman's version ordering (`vercmp()`), so
+`utils.yay.install_packages` can tell "installed and current" from "needs
+an upgrade" without starting yay.
+
+Configuration
+-------------
+- RPC endpoint: `rpc_url=`, else $AUR_RPC_URL, else RPC_URL (e.g. a local
+  HTTP server standing in for the AUR),
+- TTL: `ttl_hours=`, else $AUR_RPC_TTL_HOURS, else DEFAULT_TTL_HOURS,
+- the cache file lives in utils.aur.cache_dir().
+
+Public API
+----------
+vercmp(a: str, b: str) -> int
+info(names: list[str], ttl_hours=None, rpc_url=None) -> dict[str, dict]
+outdated(names: list[str], ttl_hours=None, rpc_url=None) -> (current, outdated, unknown)
+report() -> None
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils import aur, pacman_db, run_report
+
+RPC_URL = "https://aur.archlinux.org/rpc/v5/info"
+DEFAULT_TTL_HOURS = 6.0
+MAX_NAMES_PER_REQUEST = 100
+HTTP_TIMEOUT_SEC = 15.0
+
+# RPC fields kept per package (the rest of the answer is not needed)
+_FIELDS = ("Name", "PackageBase", "Version", "Depends", "MakeDepends", "CheckDepends",
+           "Provides", "LastModified", "OutOfDate")
+
+_LOCK = threading.Lock()
+_STATS = {"lookups": 0, "cached": 0, "fetched": 0, "requests": 0}
+
+
+def _print_action(text: str) -> None:
+    print(f"$ {text}")
+
+
+def _print_error(message: str) -> None:
+    """Print a clear error message to stderr so it stands out in logs."""
+    print(f"ERROR: {message}", file=sys.stderr)
+
+
+# -------------------------------
+# Version ordering (libalpm's vercmp)
+# -------------------------------
+
+def _rpmvercmp(a: str, b: str) -> int:
+    if a == b:
+        return 0
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start_i, start_j = i, j
+        while i < len(a) and not (a[i].isascii() and a[i].isalnum()):
+            i += 1
+        while j < len(b) and not (b[j].isascii() and b[j].isalnum()):
+            j += 1
+        if i >= len(a) or j >= len(b):
+            break
+        if i - start_i != j - start_j:
+            return -1 if i - start_i < j - start_j else 1
+        numeric = a[i].isdigit()
+        kind = str.isdigit if numeric else (lambda c: c.isascii() and c.isalpha())
+        seg_i, seg_j = i, j
+        while i < len(a) and kind(a[i]):
+            i += 1
+        while j < len(b) and kind(b[j]):
+            j += 1
+        left, right = a[seg_i:i], b[seg_j:j]
+        if not right:
+            return 1 if numeric else -1  # numbers are newer than letters
+        if numeric:
+            left, right = left.lstrip("0"), right.lstrip("0")
+            if len(left) != len(right):
+                return 1 if len(left) > len(right) else -1
+        if left != right:
+            return 1 if left > right else -1
+    if i >= len(a) and j >= len(b):
+        return 0
+    if (i >= len(a) and not b[j].isalpha()) or (i < len(a) and a[i].isalpha()):
+        return -1
+    return 1
+
+
+def _split_evr(version: str) -> Tuple[str, str, Optional[str]]:
+    epoch, _, rest = version.partition(":") if ":" in version else ("0", "", version)
+    if not epoch.isdigit():
+        epoch, rest = "0", version
+    ver, sep, rel = rest.rpartition("-")
+    return (epoch or "0", ver, rel) if sep else (epoch or "0", rest, None)
+
+
+def vercmp(a: str, b: str) -> int:
+    """Compare two pacman versions ([epoch:]pkgver[-pkgrel]); returns -1, 0 or 1 like `vercmp`."""
+    epoch_a, ver_a, rel_a = _split_evr(a)
+    epoch_b, ver_b, rel_b = _split_evr(b)
+    result = _rpmvercmp(epoch_a, epoch_b) or _rpmvercmp(ver_a, ver_b)
+    if result == 0 and rel_a is not None and rel_b is not None:
+        result = _rpmvercmp(rel_a, rel_b)
+    return result
+
+
+# -------------------------------
+# Metadata cache
+# -------------------------------
+
+def _cache_file() -> Path:
+    return aur.cache_dir() / "rpc-info.json"
+
+
+def _ttl_sec(ttl_hours: Optional[float]) -> float:
+    if ttl_hours is None:
+        try:
+            ttl_hours = float(os.environ.get("AUR_RPC_TTL_HOURS", DEFAULT_TTL_HOURS))
+        except ValueError:
+            ttl_hours = DEFAULT_TTL_HOURS
+    return ttl_hours * 3600
+
+
+def _load() -> Dict[str, Dict[str, Any]]:
+    try:
+        return json.loads(_cache_file().read_text(encoding="utf-8")).get("entries", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def _save(entries: Dict[str, Dict[str, Any]]) -> None:
+    path = _cache_file()
+    tmp = path.with_name(f".{path.name}.{os.getpid()}")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps({"entries": entries}, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as exc:
+        _print_error(f"Could not write {path}: {exc}")
+
+
+def _fetch(names: List[str], rpc_url: str) -> Dict[str, Dict[str, Any]]:
+    """One RPC info request for `names`; returns {name: kept fields}. Raises on network/protocol errors."""
+    query = urllib.parse.urlencode([("arg[]", name) for name in names])
+    _print_action(f"curl '{rpc_url}?{query}'" if len(names) <= 3 else f"curl '{rpc_url}?arg[]=...'  # {len(names)} names")
+    with urllib.request.urlopen(f"{rpc_url}?{query}", timeout=HTTP_TIMEOUT_SEC) as resp:
+        data = json.loads(resp.read().decode("utf-8"))
+    if data.get("type") == "error":
+        raise ValueError(data.get("error") or "RPC error")
+    return {r["Name"]: {k: r[k] for k in _FIELDS if k in r} for r in data.get("results", [])}
+
+
+def info(
+    names: List[str],
+    ttl_hours: Optional[float] = None,
+    rpc_url: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Return AUR metadata for `names`, from the cache when fresh, else in batched RPC requests.
+
+    Returns:
+        {name: {"Version", "PackageBase", "Depends", ...}} for names the AUR knows;
+        unknown names (and names that could not be fetched and were never cached) are left out.
+    """
+    rpc_url = rpc_url or os.environ.get("AUR_RPC_URL") or RPC_URL
+    ttl = _ttl_sec(ttl_hours)
+    now = time.time()
+    wanted = list(dict.fromkeys(n for n in names if n))
+    with _LOCK:
+        entries = _load()
+        stale = [n for n in wanted if now - entries.get(n, {}).get("fetched_at", 0) >= ttl]
+        _STATS["lookups"] += len(wanted)
+        _STATS["cached"] += len(wanted) - len(stale)
+        if stale:
+            fetched: Dict[str, Dict[str, Any]] = {}
+            try:
+                for i in range(0, len(stale), MAX_NAMES_PER_REQUEST):
+                    batch = stale[i:i + MAX_NAMES_PER_REQUEST]
+                    fetched.update(_fetch(batch, rpc_url))
+                    _STATS["requests"] += 1
+                for name in stale:  # names the AUR does not know are cached as such
+                    entries[name] = {**fetched.get(name, {"missing": True}), "fetched_at": now}
+                _STATS["fetched"] += len(stale)
+                _save(entries)
+            except (OSError, urllib.error.URLError, ValueError, KeyError) as exc:
+                _print_error(f"AUR RPC request to {rpc_url} failed ({exc}); using cached metadata")
+    return {n: entries[n] for n in wanted if n in entries and not entries[n].get("missing")}
+
+
+def outdated(
+    names: List[str],
+    ttl_hours: Optional[float] = None,
+    rpc_url: Optional[str] = None,
+) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Sort installed AUR packages by whether the AUR has a newer version.
+
+    Returns:
+        (current, outdated, unknown): unknown are names with no AUR metadata
+        (not in the AUR, or never fetched) or that are not installed.
+    """
+    installed = pacman_db.load_index()
+    meta = info(names, ttl_hours, rpc_url)
+    current: List[str] = []
+    newer: List[str] = []
+    unknown: List[str] = []
+    for name in names:
+        if name not in installed or name not in meta:
+            unknown.append(name)
+        elif vercmp(installed[name]["version"], meta[name].get("Version", "")) < 0:
+            newer.append(name)
+        else:
+            current.append(name)
+    return current, newer, unknown
+
+
+def report() -> None:
+    """Put the lookup counters into the run summary (replacing earlier numbers)."""
+    with _LOCK:
+        stats = dict(_STATS)
+    if stats["lookups"]:
+        run_report.set_line("AUR metadata", "rpc", f"{stats['lookups']} lookup(s): {stats['cached']} from cache, "
+                                                   f"{stats['fetched']} fetched in {stats['requests']} request(s)")
+
+
+if __name__ == "__main__":
+    # Demonstration: version ordering, then (with names as arguments) cached lookups.
+    for x, y in (("1.0-1", "1.0-2"), ("1:0.9", "2.0"), ("1.0a", "1.0"), ("1.0", "1.0.1"), ("2.0", "2.0")):
+        print(f"vercmp {x} {y} -> {vercmp(x, y)}")
+    if len(sys.argv) > 1:
+        for pkg, meta_entry in info(sys.argv[1:]).items():
+            print(f"{pkg:<24} {meta_entry.get('Version')}")
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Write-if-changed file deployment through the sudo runner
+Version: 1.0.1
+
+What the module does
+--------------------
+Modules used to write their config files with their own `tee`/`install`
+helpers, unconditionally: a `mkdir` + `tee` under sudo on every run, a new
+mtime every time (which also wakes up everything watching the file).
+`deploy_file()` is the one way to put a file in place:
+
+1) the desired content is hashed (sha256),
+2) the target is hashed with a single read as the current user, or, for
+   files only root can read, one `sha256sum` through the runner; a target
+   whose stat (mtime, size, inode) matches what this run saw or wrote
+   before is not read again. A target in a directory only root can enter
+   is stat'ed and hashed in one `stat` + `sha256sum` through the runner,
+3) content, mode and owner all equal  -> nothing is written,
+   only mode/owner differ             -> one `chmod` + `chown`,
+   content differs or file missing    -> one privileged `sh` that writes a
+   temp file next to the target (`install -D -m MODE -o OWNER -g GROUP`),
+   optionally backs up the old file and renames the temp file over it, so
+   readers never see a half-written file.
+
+It returns `(ok, changed)`, so callers can restart or reload a service only
+when the file really changed.
+
+Report
+------
+`report()` (called by the loader) adds the number of files written and of
+writes avoided to the run summary.
+
+Public API
+----------
+deploy_file(path, content, run, mode="0644", owner="root", group=None, backup=False) -> (ok, changed)
+file_matches(path, content) -> bool
+report() -> None
+"""
+
+from __future__ import annotations
+
+import grp
+import hashlib
+import os
+import pwd
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from utils import run_report
+
+# Writes the temp file, optionally backs up the target, renames the temp file into place.
+# Arguments: $1 mode, $2 owner, $3 group, $4 target, $5 backup (1/0)
+_WRITE_SCRIPT = r"""set -e
+tmp="$(dirname -- "$4")/.$(basename -- "$4").deploy.$$"
+trap 'rm -f -- "$tmp"' EXIT
+install -D -m "$1" -o "$2" -g "$3" /dev/stdin "$tmp"
+if [ "$5" = 1 ] && [ -e "$4" ]; then cp -a -- "$4" "$4.bak.$(date +%Y%m%d-%H%M%S)"; fi
+mv -f -- "$tmp" "$4"
+"""
+
+_LOCK = threading.Lock()
+# path -> (mtime_ns, size, inode, sha256) of what this run last read or wrote
+_SEEN: Dict[str, Tuple[int, int, int, str]] = {}
+_STATS = {"written": 0, "metadata": 0, "unchanged": 0}
+
+
+def _print_action(text: str) -> None:
+    print(f"$ {text}")
+
+
+def _print_error(message: str) -> None:
+    """Print a clear error message to stderr so it stands out in logs."""
+    print(f"ERROR: {message}", file=sys.stderr)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _stat_key(st: os.stat_result) -> Tuple[int, int, int]:
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _current_hash(path: str, st: os.stat_result, run: Optional[Callable]) -> Optional[str]:
+    """sha256 of the file at `path` (stat `st`), from the cache, a read, or `sha256sum` as root."""
+    with _LOCK:
+        seen = _SEEN.get(path)
+    if seen and seen[:3] == _stat_key(st):
+        return seen[3]
+    try:
+        with open(path, "rb") as fh:
+            digest = _digest(fh.read())
+    except PermissionError:
+        if run is None:
+            return None
+        res = run(["sha256sum", "--", path], check=False, capture_output=True)
+        if res.returncode != 0 or not res.stdout:
+            return None
+        digest = res.stdout.split()[0]
+    except OSError:
+        return None
+    with _LOCK:
+        _SEEN[path] = (*_stat_key(st), digest)
+    return digest
+
+
+def _privileged_state(path: str, run: Callable) -> Optional[Tuple[int, int, int, str]]:
+    """(mode, uid, gid, sha256) of a file this user cannot stat, through the runner; None if missing."""
+    res = run(["sh", "-c", 'stat -c "%a %u %g" -- "$1" && sha256sum -- "$1"', "sh", path],
+              check=False, capture_output=True)
+    fields = (res.stdout or "").split()
+    if res.returncode != 0 or len(fields) < 4:
+        return None
+    try:
+        return int(fields[0], 8), int(fields[1]), int(fields[2]), fields[3]
+    except ValueError:
+        return None
+
+
+def _ids(owner: str, group: str) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        uid = pwd.getpwnam(owner).pw_uid
+    except KeyError:
+        uid = None
+    try:
+        gid = grp.getgrnam(group).gr_gid
+    except KeyError:
+        gid = None
+    return uid, gid
+
+
+def file_matches(path: Union[str, Path], content: str) -> bool:
+    """True if the file at `path` holds exactly `content` (mode and owner are not checked)."""
+    path = str(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return _current_hash(path, st, None) == _digest(content.encode("utf-8"))
+
+
+def deploy_file(
+    path: Union[str, Path],
+    content: str,
+    run: Callable,
+    mode: str = "0644",
+    owner: str = "root",
+    group: Optional[str] = None,
+    backup: bool = False,
+) -> Tuple[bool, bool]:
+    """
+    Put `content` at `path` with `mode` and `owner:group`, writing only when something differs.
+
+    Arguments:
+        backup: keep the previous file as `<path>.bak.<timestamp>` when the content changes.
+
+    Returns:
+        (ok, changed): ok is False if a command failed; changed is True if
+        the content, mode or owner was updated.
+    """
+    path = str(path)
+    group = group or owner
+    data = content.encode("utf-8")
+    wanted = _digest(data)
+    # (mode, uid, gid, sha256) of the current file, None if it does not exist
+    current: Optional[Tuple[int, int, int, Optional[str]]]
+    try:
+        st = os.stat(path)
+        current = (st.st_mode & 0o7777, st.st_uid, st.st_gid, _current_hash(path, st, run))
+    except PermissionError:
+        current = _privileged_state(path, run)  # e.g. inside a root-only directory
+    except OSError:
+        current = None
+
+    if current is not None and current[3] == wanted:
+        uid, gid = _ids(owner, group)
+        mode_ok = current[0] == int(mode, 8)
+        owner_ok = uid in (None, current[1]) and gid in (None, current[2])
+        if mode_ok and owner_ok:
+            _print_action(f"# {path} unchanged; not rewritten")
+            with _LOCK:
+                _STATS["unchanged"] += 1
+            return True, False
+        _print_action(f"chmod {mode} {path} && chown {owner}:{group} {path}")
+        res = run(["sh", "-c", 'chmod "$1" "$3" && chown "$2" "$3"', "sh", mode, f"{owner}:{group}", path],
+                  check=False, capture_output=True)
+        if res.returncode != 0:
+            _print_error(f"Could not set mode/owner of {path}: {(res.stderr or '').strip()}")
+            return False, False
+        with _LOCK:
+            _STATS["metadata"] += 1
+        return True, True
+
+    _print_action(f"install -D -m {mode} -o {owner} -g {group} /dev/stdin {path}  # via temp file + rename"
+                  + ("; old file backed up" if backup and current is not None else ""))
+    res = run(["sh", "-c", _WRITE_SCRIPT, "sh", mode, owner, group, path, "1" if backup else "0"],
+              check=False, capture_output=True, input_text=content)
+    if res.returncode != 0:
+        _print_error(f"Could not write {path}: {(res.stderr or res.stdout or '').strip()}")
+        return False, False
+    try:
+        written = os.stat(path)
+        with _LOCK:
+            _SEEN[path] = (*_stat_key(written), wanted)
+    except OSError:
+        pass  # not visible to this user; the next call hashes it through the runner
+    with _LOCK:
+        _STATS["written"] += 1
+    return True, True
+
+
+def report() -> None:
+    """Add the files written and the writes avoided to the run summary."""
+    with _LOCK:
+        stats = dict(_STATS)
+    if not any(stats.values()):
+        return
+    line = f"{stats['written']} written, {stats['unchanged']} unchanged (writes avoided)"
+    if stats["metadata"]:
+        line += f", {stats['metadata']} mode/owner fix(es)"
+    run_report.add("Files", line)
+
+
+if __name__ == "__main__":
+    # Demonstration: deploy a file twice into a temp dir as the current user (no sudo).
+    import subprocess
+    import tempfile
+
+    def _run(cmd, check=False, capture_output=False, input_text=None, **kwargs):
+        return subprocess.run(cmd, check=check, capture_output=capture_output, text=True, input=input_text)
+
+    me = pwd.getpwuid(os.getuid()).pw_name
+    target = Path(tempfile.mkdtemp(prefix="deploy-demo-")) / "etc" / "demo.conf"
+    for attempt in range(2):
+        print(f"attempt {attempt + 1}: (ok, changed) =", deploy_file(target, "key=value\n", _run, owner=me))
+    report()
+    run_report.print_report()
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Mirror ranking (built-in prober) with a cache for /etc/pacman.d/mirrorlist
+Version: 1.1.1
+
+What the module does
+--------------------
+Ranking mirrors (reflector downloading a test file from dozens of them) takes
+minutes, yet the result hardly changes from one provisioning run to the next.
+This helper keeps the last ranking, with per-mirror measurements and a
+timestamp, in the persistent state store (utils.state_store, key
+"mirrors.ranking") and reuses it while it is fresh.
+
+A new ranking is only made when:
+- there is no cached ranking, or it was made with other ranking options,
+- the cached ranking is older than the TTL (default 168 hours),
+- downloads since the last ranking failed too often: successes and failures
+  both come from the background prefetcher (`note_downloads()`), so the rate
+  is taken over one consistent set of downloads (pacman.log records failed
+  downloads but not successful ones); at least MIN_FAILURE_SAMPLES downloads
+  are needed before the rate counts,
+- or a refresh is forced.
+
+Ranking
+-------
+`rank_with_probe()` replaces reflector:
+1) Candidates come from the Arch mirror status JSON (STATUS_URL): active
+   HTTPS mirrors in the wanted countries, fully synced within `age_hours`.
+   They are tried best-known first (history, then the status score), at most
+   MAX_CANDIDATES of them.
+2) Each candidate is probed concurrently on a thread pool capped at
+   MAX_CONNECTIONS open connections: GET of PROBE_PATH (core.db), timing the
+   first byte (TTFB) and the throughput of up to PROBE_BYTES after it.
+3) The new numbers are blended into per-mirror history kept on disk
+   (state key "mirrors.history") as an exponentially weighted moving average
+   (HISTORY_WEIGHT for the new sample), failures included. A mirror's score
+   is the expected time to fetch SCORE_BYTES, ttfb + SCORE_BYTES / rate,
+   inflated by its failure average; lower is better.
+4) The `keep` best mirrors that answered this time are written in score order.
+
+`rank_with_reflector()` is kept as the alternative ranker ("reflector").
+Everything the prober talks to is a plain URL, so it runs against local
+HTTP stand-ins (see benchmarks/bench_mirror_probe.py).
+
+The mirrorlist is only rewritten when its Server lines differ from the
+ranking (new ranking, or the file was edited by hand), so pacman's sync
+database timestamps and the file's mtime stay put otherwise.
+
+Public API
+----------
+rank_with_probe(countries, keep=15, age_hours=12, status_url=STATUS_URL, candidates=None) -> (servers, measurements) | None
+rank_with_reflector(run, countries, keep=15, age_hours=12, timeout_sec=20) -> (servers, measurements) | None
+needs_refresh(record, options, ttl_hours, max_failure_rate, force) -> (bool, reason)
+is_current(countries, ttl_hours=..., max_failure_rate=...) -> bool
+ensure_mirrorlist(run, countries, ttl_hours=..., max_failure_rate=..., force=False, ranker="probe") -> bool
+note_downloads(ok: int, failed: int) -> None
+read_servers(path) -> list[str]
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils import run_report, state_store
+
+MIRRORLIST = Path("/etc/pacman.d/mirrorlist")
+
+STATE_KEY = "mirrors.ranking"
+DOWNLOADS_KEY = "mirrors.downloads"
+HISTORY_KEY = "mirrors.history"
+
+STATUS_URL = "https://archlinux.org/mirrors/status/json/"
+SERVER_SUFFIX = "$repo/os/$arch"
+
+# Prober settings
+PROBE_PATH = "core/os/x86_64/core.db"
+PROBE_BYTES = 256 * 1024       # bytes read after the first one to measure throughput
+PROBE_TIMEOUT_SEC = 5.0
+MAX_CONNECTIONS = 8            # probes in flight at once
+MAX_CANDIDATES = 40
+HISTORY_WEIGHT = 0.5           # weight of the newest sample in the moving averages
+SCORE_BYTES = 4 * 1024 * 1024  # a typical package download
+FAILURE_PENALTY = 4.0          # a mirror that always fails scores 5x worse
+
+DEFAULT_TTL_HOURS = 168.0
+DEFAULT_MAX_FAILURE_RATE = 0.2
+MIN_FAILURE_SAMPLES = 5
+
+_SERVER_RE = re.compile(r"^\s*Server\s*=\s*(\S+)")
+
+
+def _print_action(text: str) -> None:
+    print(f"$ {text}")
+
+
+def _print_error(message: str) -> None:
+    """Print a clear error message to stderr so it stands out in logs."""
+    print(f"ERROR: {message}", file=sys.stderr)
+
+
+def read_servers(path: Path = MIRRORLIST) -> List[str]:
+    """Return the active `Server = ...` URLs of a mirrorlist, in order (empty if unreadable)."""
+    try:
+        text = Path(path).read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return []
+    return [m.group(1) for m in map(_SERVER_RE.match, text.splitlines()) if m]
+
+
+def render_mirrorlist(servers: List[str], ranked_by: str, ranked_at: float) -> str:
+    when = datetime.fromtimestamp(ranked_at).strftime("%Y-%m-%d %H:%M")
+    lines = [f"# Ranked by {ranked_by} on {when} (utils.mirrors)", ""]
+    lines += [f"Server = {url}" for url in servers]
+    return "\n".join(lines) + "\n"
+
+
+def rank_with_reflector(
+    run: Callable,
+    countries: List[str],
+    keep: int = 15,
+    age_hours: int = 12,
+    timeout_sec: int = 20,
+) -> Optional[Tuple[List[str], Dict[str, Dict[str, Any]]]]:
+    """
+    Rank HTTPS mirrors with reflector into a scratch file (not the live mirrorlist).
+
+    Returns:
+        (servers in rank order, {url: {"rank": int}}) or None if reflector failed.
+        reflector does not expose its per-mirror rates, so only the rank is measured.
+    """
+    # A private directory, not a file in /tmp: root may not write into another
+    # user's file in a sticky world-writable directory (fs.protected_regular).
+    workdir = tempfile.mkdtemp(prefix="mirrors.")
+    scratch = os.path.join(workdir, "mirrorlist")
+    try:
+        cmd = [
+            "reflector",
+            "--country", ",".join(countries),
+            "--protocol", "https",
+            "--age", str(age_hours),           # seen as 'last synced within N hours'
+            "--fastest", str(keep),            # keep N fastest mirrors
+            "--download-timeout", str(timeout_sec),  # avoid premature timeouts
+            "--save", scratch,
+        ]
+        _print_action(" ".join(cmd))
+        res = run(cmd, check=False)  # stream output
+        servers = read_servers(Path(scratch))
+        if res.returncode != 0 or not servers:
+            return None
+        return servers, {url: {"rank": index} for index, url in enumerate(servers, 1)}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _fetch_status(status_url: str, timeout: float = 15.0) -> List[Dict[str, Any]]:
+    with urllib.request.urlopen(status_url, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8")).get("urls", [])
+
+
+def _last_sync_age_hours(entry: Dict[str, Any]) -> float:
+    stamp = entry.get("last_sync")
+    if not stamp:
+        return float("inf")
+    try:
+        synced = datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+    except ValueError:
+        return float("inf")
+    return (datetime.now(timezone.utc) - synced).total_seconds() / 3600
+
+
+def probe_candidates(status: List[Dict[str, Any]], countries: List[str], age_hours: float) -> List[Dict[str, Any]]:
+    """Filter mirror status entries to active HTTPS mirrors in `countries`, fully synced recently."""
+    wanted = {c.lower() for c in countries}
+    return [
+        entry for entry in status
+        if entry.get("protocol") == "https" and entry.get("active", True)
+        and (not wanted or (entry.get("country") or "").lower() in wanted
+             or (entry.get("country_code") or "").lower() in wanted)
+        and (entry.get("completion_pct") or 0) >= 1.0
+        and _last_sync_age_hours(entry) <= age_hours
+    ]
+
+
+def probe_mirror(base_url: str, semaphore: threading.Semaphore, timeout: float = PROBE_TIMEOUT_SEC) -> Dict[str, Any]:
+    """
+    Time one GET of PROBE_PATH from a mirror.
+
+    Returns:
+        {"ok": True, "ttfb": sec, "rate": bytes/sec, "bytes": int} or {"ok": False, "error": str}.
+    """
+    url = base_url.rstrip("/") + "/" + PROBE_PATH
+    with semaphore:
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as resp:
+                first = resp.read(1)
+                first_at = time.perf_counter()
+                received = 0
+                while first and received < PROBE_BYTES:
+                    chunk = resp.read(min(64 * 1024, PROBE_BYTES - received))
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                finished = time.perf_counter()
+        except (OSError, urllib.error.URLError, ValueError) as exc:
+            return {"ok": False, "error": str(getattr(exc, "reason", exc))}
+    if not first:
+        return {"ok": False, "error": "empty response"}
+    elapsed = max(finished - first_at, 1e-6)
+    return {"ok": True, "ttfb": first_at - started, "rate": received / elapsed if received else 0.0,
+            "bytes": received + 1}
+
+
+def _blend(old: Optional[float], new: float) -> float:
+    return new if old is None else HISTORY_WEIGHT * new + (1 - HISTORY_WEIGHT) * old
+
+
+def update_history(history: Dict[str, Dict[str, Any]], results: Dict[str, Dict[str, Any]]) -> None:
+    """Fold this round's probe results into the per-mirror moving averages (in place)."""
+    now = time.time()
+    for url, result in results.items():
+        entry = history.setdefault(url, {"samples": 0})
+        entry["samples"] = entry.get("samples", 0) + 1
+        entry["probed_at"] = now
+        entry["fail"] = _blend(entry.get("fail"), 0.0 if result["ok"] else 1.0)
+        if result["ok"]:
+            entry["ttfb"] = _blend(entry.get("ttfb"), result["ttfb"])
+            if result["rate"]:
+                entry["rate"] = _blend(entry.get("rate"), result["rate"])
+
+
+def score(entry: Dict[str, Any]) -> float:
+    """Expected seconds to fetch SCORE_BYTES from a mirror (lower is better); inf if never reached."""
+    if entry.get("ttfb") is None or not entry.get("rate"):
+        return float("inf")
+    return (entry["ttfb"] + SCORE_BYTES / entry["rate"]) * (1 + FAILURE_PENALTY * entry.get("fail", 0.0))
+
+
+def rank_with_probe(
+    countries: List[str],
+    keep: int = 15,
+    age_hours: float = 12,
+    status_url: str = STATUS_URL,
+    candidates: Optional[List[str]] = None,
+    max_connections: int = MAX_CONNECTIONS,
+    timeout_sec: float = PROBE_TIMEOUT_SEC,
+) -> Optional[Tuple[List[str], Dict[str, Dict[str, Any]]]]:
+    """
+    Rank mirrors by probing them concurrently and blending in their history.
+
+    `candidates` (base URLs) skips the status JSON, e.g. for local stand-ins.
+
+    Returns:
+        (Server URLs in score order, {server url: measurements}) or None if no mirror answered.
+    """
+    history: Dict[str, Dict[str, Any]] = state_store.get_value(HISTORY_KEY, None) or {}
+    if candidates is None:
+        try:
+            entries = probe_candidates(_fetch_status(status_url), countries, age_hours)
+        except (OSError, urllib.error.URLError, ValueError) as exc:
+            _print_error(f"Could not fetch the mirror status from {status_url}: {exc}")
+            return None
+        entries.sort(key=lambda e: (score(history.get(e["url"], {})), e.get("score") or float("inf")))
+        candidates = [e["url"] for e in entries]
+    candidates = candidates[:MAX_CANDIDATES]
+    if not candidates:
+        _print_error("No mirror candidates to probe")
+        return None
+
+    _print_action(f"# probing {len(candidates)} mirror(s), {max_connections} at a time")
+    semaphore = threading.Semaphore(max_connections)
+    with ThreadPoolExecutor(max_workers=max_connections) as pool:
+        futures = {url: pool.submit(probe_mirror, url, semaphore, timeout_sec) for url in candidates}
+        results = {url: future.result() for url, future in futures.items()}
+    update_history(history, results)
+    state_store.set_value(HISTORY_KEY, history)
+
+    answered = [url for url in candidates if results[url]["ok"]]
+    answered.sort(key=lambda url: score(history[url]))
+    if not answered:
+        return None
+    measurements = {}
+    for url in answered[:keep]:
+        result, entry = results[url], history[url]
+        measurements[url.rstrip("/") + "/" + SERVER_SUFFIX] = {
+            "ttfb_ms": round(result["ttfb"] * 1000, 1),
+            "kib_s": round(result["rate"] / 1024, 1),
+            "score_sec": round(score(entry), 3),
+            "samples": entry["samples"],
+        }
+    failed = len(candidates) - len(answered)
+    print(f"  {len(answered)} mirror(s) answered, {failed} failed; keeping {len(measurements)}")
+    return list(measurements), measurements
+
+
+def note_downloads(ok: int, failed: int) -> None:
+    """Add download outcomes (e.g. from utils.prefetch) to the counters since the last ranking."""
+    if not ok and not failed:
+        return
+    counts = state_store.get_value(DOWNLOADS_KEY, None) or {"ok": 0, "failed": 0}
+    counts["ok"] = counts.get("ok", 0) + ok
+    counts["failed"] = counts.get("failed", 0) + failed
+    state_store.set_value(DOWNLOADS_KEY, counts)
+
+
+def failure_rate() -> Tuple[float, int]:
+    """Return (failure rate, downloads counted) since the last ranking (the counters reset on each ranking)."""
+    counts = state_store.get_value(DOWNLOADS_KEY, None) or {"ok": 0, "failed": 0}
+    failed = counts.get("failed", 0)
+    total = counts.get("ok", 0) + failed
+    return (failed / total if total else 0.0), total
+
+
+def needs_refresh(
+    record: Optional[Dict[str, Any]],
+    options: Dict[str, Any],
+    ttl_hours: float,
+    max_failure_rate: float,
+    force: bool = False,
+) -> Tuple[bool, str]:
+    """Decide whether the cached ranking `record` has to be replaced; returns (refresh, reason)."""
+    if force:
+        return True, "forced"
+    if not record or not record.get("servers"):
+        return True, "no cached ranking"
+    if record.get("options") != options:
+        return True, "ranking options changed"
+    age_hours = (time.time() - record.get("ranked_at", 0)) / 3600
+    if age_hours > ttl_hours:
+        return True, f"ranking is {age_hours:.1f}h old (TTL {ttl_hours:g}h)"
+    rate, samples = failure_rate()
+    if samples >= MIN_FAILURE_SAMPLES and rate > max_failure_rate:
+        return True, f"{rate:.0%} of {samples} downloads failed since the last ranking"
+    return False, f"cached ranking is {age_hours:.1f}h old (TTL {ttl_hours:g}h)"
+
+
+def ranking_options(countries: List[str], keep: int = 15, ranker: str = "probe") -> Dict[str, Any]:
+    """The options a cached ranking must have been made with to be reused."""
+    return {"ranker": ranker, "countries": list(countries), "keep": keep}
+
+
+def is_current(
+    countries: List[str],
+    ttl_hours: float = DEFAULT_TTL_HOURS,
+    max_failure_rate: float = DEFAULT_MAX_FAILURE_RATE,
+    keep: int = 15,
+    ranker: str = "probe",
+) -> bool:
+    """True if the cached ranking is still valid and the mirrorlist matches it (cheap; for probe())."""
+    record = state_store.get_value(STATE_KEY, None)
+    refresh, _ = needs_refresh(record, ranking_options(countries, keep, ranker), ttl_hours, max_failure_rate)
+    return not refresh and read_servers(MIRRORLIST) == record["servers"]
+
+
+def _write_mirrorlist(content: str, run: Callable) -> bool:
+    """Install `content` as the mirrorlist via the sudo runner (write temp, then install)."""
+    fd, tmp = tempfile.mkstemp(prefix="mirrorlist.", suffix=".new")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(content)
+        _print_action(f"install -m 0644 {tmp} {MIRRORLIST}")
+        res = run(["install", "-m", "0644", tmp, str(MIRRORLIST)], check=False, capture_output=True)
+        if res.returncode != 0:
+            _print_error(f"Could not write {MIRRORLIST}: {(res.stderr or '').strip()}")
+            return False
+        return True
+    finally:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def ensure_mirrorlist(
+    run: Callable,
+    countries: List[str],
+    ttl_hours: float = DEFAULT_TTL_HOURS,
+    max_failure_rate: float = DEFAULT_MAX_FAILURE_RATE,
+    force: bool = False,
+    keep: int = 15,
+    ranker: str = "probe",
+    status_url: str = STATUS_URL,
+) -> bool:
+    """
+    Make sure the mirrorlist holds a fresh enough ranking, re-ranking only when needed.
+
+    Returns:
+        True if the mirrorlist is in place (possibly still the old one after a
+        failed ranking, which is only a warning), False on a write failure.
+    """
+    options = ranking_options(countries, keep, ranker)
+    record = state_store.get_value(STATE_KEY, None)
+    refresh, reason = needs_refresh(record, options, ttl_hours, max_failure_rate, force)
+
+    if refresh:
+        _print_action(f"# ranking mirrors: {reason}")
+        started = time.monotonic()
+        if ranker == "reflector":
+            ranked = rank_with_reflector(run, countries, keep=keep)
+        else:
+            ranked = rank_with_probe(countries, keep=keep, status_url=status_url)
+        elapsed = time.monotonic() - started
+        if ranked is None:
+            print("WARN: mirror ranking failed; keeping existing mirrorlist.")
+            run_report.add("Mirrors", f"ranking failed after {elapsed:.1f}s ({reason}); mirrorlist kept")
+            return True
+        servers, measurements = ranked
+        record = {
+            "ranked_at": time.time(), "ranked_by": ranker, "options": options,
+            "servers": servers, "measurements": measurements, "rank_sec": round(elapsed, 3),
+        }
+        state_store.set_value(STATE_KEY, record)
+        state_store.set_value(DOWNLOADS_KEY, {"ok": 0, "failed": 0})
+        run_report.add("Mirrors", f"re-ranked {len(servers)} mirror(s) in {elapsed:.1f}s ({reason})")
+    else:
+        _print_action(f"# mirror ranking reused: {reason}")
+        run_report.add("Mirrors", f"ranking reused, ~{record.get('rank_sec', 0):.0f}s saved ({reason})")
+
+    if read_servers(MIRRORLIST) == record["servers"]:
+        _print_action(f"# {MIRRORLIST} already matches the ranking; not rewritten")
+        run_report.add("Mirrors", "mirrorlist unchanged; not rewritten")
+        return True
+    content = render_mirrorlist(record["servers"], record.get("ranked_by", ranker), record["ranked_at"])
+    if not _write_mirrorlist(content, run):
+        return False
+    run_report.add("Mirrors", f"mirrorlist rewritten ({len(record['servers'])} server(s))")
+    return True
+
+
+if __name__ == "__main__":
+    # Demonstration: show the cached ranking and what the next run would do (no network, no root).
+    cached = state_store.get_value(STATE_KEY, None)
+    if cached:
+        print(f"{len(cached['servers'])} mirror(s) ranked by {cached.get('ranked_by')} "
+              f"at {datetime.fromtimestamp(cached['ranked_at']):%Y-%m-%d %H:%M}")
+        decision = needs_refresh(cached, cached.get("options"), DEFAULT_TTL_HOURS, DEFAULT_MAX_FAILURE_RATE)
+        print("next run:", "re-rank" if decision[0] else "reuse", f"({decision[1]})")
+    else:
+        print("no cached mirror ranking yet")
+    print(f"{len(read_servers())} server(s) in {MIRRORLIST}")
+    known = state_store.get_value(HISTORY_KEY, None) or {}
+    for base in sorted(known, key=lambda u: score(known[u]))[:5]:
+        print(f"  {score(known[base]):7.2f}s  {base}")
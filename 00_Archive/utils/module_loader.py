@@ -3,30 +3,142 @@
 #!/usr/bin/env python3
 """
 Module Discovery and Runner
-Version: 2.0.0
+Version: 4.0.0
 
 What the module does
 --------------------
 - Discovers `module.py` files inside ./modules/* folders that start with a
   numeric order prefix (e.g., 00_core, 10_fonts).
+- Reads a cheap per-module manifest (order, name, tags, hardware, requirements)
+  WITHOUT executing the module, and caches all manifests in one index file.
 - Validates there are no duplicate order numbers (strictly enforced).
-- Imports each module safely, and sequentially calls its `install(run)` function.
+- Builds a dependency graph from the optional `REQUIRES` / `PROVIDES` lists.
+- Imports a module's code only when it is about to run, then calls its
+  `install(run)` function, executing modules whose requirements are
+  satisfied concurrently on a bounded worker pool.
+
+Module metadata (optional, must be literal values)
+--------------------------------------------------
+- REQUIRES = ["000_core", "yay"]
+    Folder names or capability names (see PROVIDES) that must complete first.
+    An empty list means "no prerequisites".
+- PROVIDES = ["yay"]
+    Capability names other modules may require instead of a folder name.
+- TAGS = ["desktop"]
+    Free-form labels used for selection (`--tag`) and listings.
+- HARDWARE = ["nvidia-gpu"]
+    Hardware the module is written for (informational, shown in listings).
+- def probe(run) -> bool
+    Optional cheap check that the live system still matches what install()
+    configured. Returning False (or raising) vetoes a fingerprint skip.
+
+A module WITHOUT a `REQUIRES` attribute depends on every module with a lower
+order number, so a tree without metadata runs exactly in numeric order.
+
+Manifest index
+--------------
+Manifests are extracted with `ast` (no code runs) and cached in
+`modules/.manifest-index.json`, keyed by each module.py's mtime and size, so
+listing or selecting modules never imports the other modules.
+`print_import_report()` shows how long discovery and each lazy import took.
+
+Fingerprint skipping
+--------------------
+After a successful install(), the loader records a fingerprint of the module
+source, the `utils/` helpers it imports (transitively), the environment
+toggles it reads (e.g. AUDIO_ENABLE_BLUETOOTH) and the other files in its
+folder in `utils.state_store`. On the next run a module whose fingerprint
+matches its last successful run is skipped, unless `force=True` is given or
+its `probe(run)` reports drift.
+
+Packages
+--------
+Modules may declare their repository packages (`PACKAGES = [...]` or
+`def packages()`). PACKAGES is read from the manifest (a literal list, or a
+`+` of module-level literal lists); only modules defining packages() are
+imported early to ask for theirs. Once the module providing "mirrors"
+(000_core: mirrorlist, pacman.conf, -Syu) has completed, the merged set is
+installed in as few transactions as possible (utils.package_plan), leaving
+out modules a failed dependency has cancelled. Whatever is still missing
+afterwards is downloaded in the background (utils.prefetch), so later
+installs find it cached. Without such a module in the run, both start
+before the first module.
+AUR packages that modules queued with utils.aur_queue are installed in one
+go after the last module; a module whose queued packages fail is recorded
+as failed (one that waited for them at a barrier is only re-run next time).
+
+Triggers
+--------
+Follow-up commands that modules notified through utils.triggers (udev
+reload, sysctl, journald restart, grub-mkconfig, fc-cache, daemon-reload)
+run after the AUR queue, each at most once and only if a notification
+reported a change.
 
 Behavior
 --------
 - Prints shell-like actions and status markers.
-- Robust error handling: continues discovery despite individual import issues,
-  aborts run if duplicate orders are detected, stops on the first install failure.
+- While modules run concurrently, their Python-level output (print) is
+  buffered per module and emitted as one block when the module finishes.
+  Subprocesses that stream straight to the terminal are not buffered.
+- Robust error handling: continues discovery despite individual parse issues,
+  aborts run if duplicate orders or unresolvable requirements are detected.
+- On an install failure, modules that depend on the failed one are cancelled,
+  while unrelated branches of the graph still run to completion.
 - Returns True if all ran successfully, False otherwise.
 """
 
 from __future__ import annotations
+import ast
+import hashlib
 import importlib.util
+import io
+import json
+import os
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Tuple, Any, Dict, Optional
+from typing import List, Tuple, Any, Dict, Iterable, Optional, Set
+
+from utils import aur_queue, files, mirrors, package_plan, prefetch, run_report, state_store, triggers
 
 MODULES_DIR = Path(__file__).resolve().parent.parent / "modules"
+UTILS_DIR = Path(__file__).resolve().parent
+MANIFEST_INDEX = MODULES_DIR / ".manifest-index.json"
+
+# Bump when the manifest layout changes so stale index entries are rebuilt.
+MANIFEST_VERSION = 3
+
+# Module-level names read into the manifest (attribute -> manifest key).
+MANIFEST_FIELDS = {
+    "REQUIRES": "requires",
+    "PROVIDES": "provides",
+    "TAGS": "tags",
+    "HARDWARE": "hardware",
+}
+
+# Capability after which the package plan and downloads can start (mirrors
+# refreshed, pacman.conf tuned, databases synced and the system upgraded).
+PREFETCH_AFTER = "mirrors"
+
+# Default size of the worker pool; override with MODULES_MAX_WORKERS or run_all(max_workers=...).
+DEFAULT_MAX_WORKERS = 4
+
+# Loaded module objects and import timings, filled lazily by `load_module()`.
+_LOADED: Dict[str, Any] = {}
+_LOAD_LOCK = threading.Lock()
+IMPORT_TIMES: Dict[str, Dict[str, Any]] = {}
+
+# Dependency graph and failed modules of the current run_all(), so the package
+# plan can leave out modules that a failure has already cancelled.
+_RUN_LOCK = threading.Lock()
+_RUN_GRAPH: Dict[str, Set[str]] = {}
+_RUN_FAILED: Set[str] = set()
+DISCOVERY_STATS: Dict[str, float] = {}
+
+# utils module name -> utils modules it imports (parsed once per process).
+_UTILS_IMPORTS: Dict[str, Set[str]] = {}
 
 
 def _print_action(text: str) -> None:
@@ -47,24 +159,183 @@ def _parse_order(folder_name: str) -> Optional[int]:
         return None
 
 
-def discover_modules() -> List[Tuple[int, str, Any]]:
+# ------------------------------ Manifests ------------------------------
+
+def _as_name_list(value: Any) -> List[str]:
+    """Normalize a literal REQUIRES/TAGS/... value into a list of strings."""
+    if isinstance(value, str):
+        return [value]
+    return [str(v) for v in value]
+
+
+def _package_list(value: ast.AST, lists: Dict[str, List[str]]) -> Optional[List[str]]:
+    """Evaluate a PACKAGES value: a literal list, an earlier literal list's name, or a `+` of those."""
+    if isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add):
+        left, right = _package_list(value.left, lists), _package_list(value.right, lists)
+        return None if left is None or right is None else left + right
+    if isinstance(value, ast.Name):
+        return lists.get(value.id)
+    try:
+        literal = ast.literal_eval(value)
+    except (ValueError, TypeError, SyntaxError):
+        return None
+    if isinstance(literal, (list, tuple)) and all(isinstance(v, str) for v in literal):
+        return list(literal)
+    return None
+
+
+def _is_os_environ(node: ast.AST) -> bool:
+    """True for `os.environ` or a bare `environ` name."""
+    if isinstance(node, ast.Attribute):
+        return node.attr == "environ" and isinstance(node.value, ast.Name) and node.value.id == "os"
+    return isinstance(node, ast.Name) and node.id == "environ"
+
+
+def _scan_references(tree: ast.AST) -> Tuple[Set[str], Set[str]]:
+    """
+    Find the `utils.*` modules imported and the environment variables read
+    (os.environ.get / os.getenv / os.environ[...] with literal names).
     """
-    Discover and import all `module.py` files under `modules/`.
+    helpers: Set[str] = set()
+    env: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module:
+            if node.module == "utils":
+                helpers.update(f"utils.{alias.name}" for alias in node.names)
+            elif node.module.startswith("utils."):
+                helpers.add(node.module)
+        elif isinstance(node, ast.Import):
+            helpers.update(alias.name for alias in node.names if alias.name.startswith("utils."))
+        elif isinstance(node, ast.Call) and node.args:
+            first = node.args[0]
+            if not (isinstance(first, ast.Constant) and isinstance(first.value, str)):
+                continue
+            func = node.func
+            if isinstance(func, ast.Attribute) and func.attr == "get" and _is_os_environ(func.value):
+                env.add(first.value)
+            elif isinstance(func, ast.Attribute) and func.attr == "getenv":
+                env.add(first.value)
+        elif isinstance(node, ast.Subscript) and _is_os_environ(node.value):
+            key = node.slice
+            if isinstance(key, ast.Constant) and isinstance(key.value, str):
+                env.add(key.value)
+    return helpers, env
+
+
+def _extract_manifest(order: int, folder_name: str, module_file: Path) -> Dict[str, Any]:
+    """
+    Build a manifest for one module by parsing (not executing) its source.
 
     Returns:
-        A list of (order_number, folder_name, imported_module), sorted by order ASC.
+        A dict with order, name, path, summary, the MANIFEST_FIELDS keys, the
+        utils helpers it imports, the environment variables it reads and
+        whether it defines probe(). Absent MANIFEST_FIELDS are None so
+        "no REQUIRES" stays distinguishable from []. "packages" holds PACKAGES
+        when it can be read without running the module; "packages_dynamic" is
+        True when the module must be imported to learn its packages (it
+        defines packages(), or PACKAGES is computed).
+    """
+    source = module_file.read_text(encoding="utf-8")
+    tree = ast.parse(source, filename=str(module_file))
+
+    manifest: Dict[str, Any] = {
+        "order": order,
+        "name": folder_name,
+        "path": str(module_file),
+        "summary": "",
+        **{key: None for key in MANIFEST_FIELDS.values()},
+    }
+
+    helpers, env = _scan_references(tree)
+    manifest["utils"] = sorted(helpers)
+    manifest["env"] = sorted(env)
+    manifest["has_probe"] = any(
+        isinstance(node, ast.FunctionDef) and node.name == "probe" for node in tree.body
+    )
+    manifest["packages"] = None
+    manifest["packages_dynamic"] = any(
+        isinstance(node, ast.FunctionDef) and node.name == "packages" for node in tree.body
+    )
+
+    docstring = ast.get_docstring(tree) or ""
+    for line in docstring.splitlines():
+        if line.strip():
+            manifest["summary"] = line.strip()
+            break
+
+    lists: Dict[str, List[str]] = {}  # module-level string lists, for PACKAGES = A + B
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target, value = node.targets[0], node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            target, value = node.target, node.value
+        else:
+            continue
+        if not isinstance(target, ast.Name):
+            continue
+        if target.id == "PACKAGES":
+            manifest["packages"] = _package_list(value, lists)
+            if manifest["packages"] is None:
+                manifest["packages_dynamic"] = True
+            continue
+        evaluated = _package_list(value, lists)
+        if evaluated is not None:
+            lists[target.id] = evaluated
+        if target.id not in MANIFEST_FIELDS:
+            continue
+        try:
+            manifest[MANIFEST_FIELDS[target.id]] = _as_name_list(ast.literal_eval(value))
+        except (ValueError, TypeError, SyntaxError):
+            print(f"⚠️  [{folder_name}] {target.id} must be a literal list; ignoring it.")
+    return manifest
+
+
+def _load_index() -> Dict[str, Any]:
+    """Read the manifest index; a missing or corrupt index is treated as empty."""
+    try:
+        data = json.loads(MANIFEST_INDEX.read_text(encoding="utf-8"))
+        if data.get("version") == MANIFEST_VERSION:
+            return data.get("modules", {})
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {}
+
+
+def _save_index(entries: Dict[str, Any]) -> None:
+    """Atomically rewrite the manifest index (best-effort; read-only trees are fine)."""
+    try:
+        tmp = MANIFEST_INDEX.with_name(MANIFEST_INDEX.name + ".tmp")
+        tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "modules": entries}, indent=1), encoding="utf-8")
+        os.replace(tmp, MANIFEST_INDEX)
+    except OSError as exc:
+        print(f"⚠️  Could not write manifest index {MANIFEST_INDEX}: {exc}")
+
+
+def discover_modules() -> List[Tuple[int, str, Dict[str, Any]]]:
+    """
+    Discover all `module.py` files under `modules/` and return their manifests.
+
+    Returns:
+        A list of (order_number, folder_name, manifest), sorted by order ASC.
 
     Notes:
+        - No module code is executed here; use `load_module()` to import one.
+        - Manifests are reused from the index when mtime and size match.
         - Duplicate order numbers are NOT filtered here—use `validate_no_duplicates`
           before running to enforce uniqueness.
-        - Import errors are reported but do not stop discovery of other modules.
+        - Parse errors are reported but do not stop discovery of other modules.
     """
-    discovered: List[Tuple[int, str, Any]] = []
+    started = time.perf_counter()
+    discovered: List[Tuple[int, str, Dict[str, Any]]] = []
 
     if not MODULES_DIR.exists():
         print(f"⚠️  Modules directory not found: {MODULES_DIR}")
         return discovered
 
+    index = _load_index()
+    fresh: Dict[str, Any] = {}
+    reparsed = 0
+
     for folder in MODULES_DIR.iterdir():
         if not folder.is_dir():
             continue
@@ -75,28 +346,143 @@ def discover_modules() -> List[Tuple[int, str, Any]]:
             continue
 
         module_file = folder / "module.py"
-        if not module_file.exists():
+        try:
+            st = module_file.stat()
+        except FileNotFoundError:
             print(f"⚠️  [{folder.name}] Skipping: module.py not found.")
             continue
 
-        module_name = f"modules.{folder.name}"
+        cached = index.get(folder.name)
+        if cached and cached.get("mtime_ns") == st.st_mtime_ns and cached.get("size") == st.st_size:
+            manifest = cached["manifest"]
+        else:
+            try:
+                manifest = _extract_manifest(order, folder.name, module_file)
+            except Exception as exc:
+                print(f"ERROR: Failed to read manifest from {module_file}: {exc}")
+                continue
+            reparsed += 1
+
+        fresh[folder.name] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "manifest": manifest}
+        discovered.append((order, folder.name, manifest))
+
+    if reparsed or set(fresh) != set(index):
+        _save_index(fresh)
+
+    discovered.sort(key=lambda t: t[0])
+    DISCOVERY_STATS.update({
+        "seconds": time.perf_counter() - started,
+        "modules": len(discovered),
+        "reparsed": reparsed,
+    })
+    return discovered
+
+
+def load_module(manifest: Dict[str, Any]) -> Optional[Any]:
+    """
+    Import a module's code the first time it is needed.
+
+    Returns:
+        The imported module object, or None if the import failed (error printed).
+    """
+    name = manifest["name"]
+    with _LOAD_LOCK:
+        if name in _LOADED:
+            return _LOADED[name]
+
+        module_name = f"modules.{name}"
+        module_file = Path(manifest["path"])
         try:
             _print_action(f"import {module_name}  # from {module_file}")
             spec = importlib.util.spec_from_file_location(module_name, module_file)
             if spec is None or spec.loader is None:
                 print(f"⚠️  Could not load spec for {module_file}")
-                continue
+                return None
 
+            before = set(sys.modules)
+            started = time.perf_counter()
             mod = importlib.util.module_from_spec(spec)
             sys.modules[module_name] = mod
             spec.loader.exec_module(mod)  # noqa: S102 - trusted local file
-            discovered.append((order, folder.name, mod))
+            IMPORT_TIMES[name] = {
+                "seconds": time.perf_counter() - started,
+                "pulled_in": sorted(set(sys.modules) - before - {module_name}),
+            }
+            _LOADED[name] = mod
+            return mod
         except Exception as exc:
+            sys.modules.pop(module_name, None)
             print(f"ERROR: Failed to import {module_file}: {exc}")
-            continue
+            return None
 
-    discovered.sort(key=lambda t: t[0])
-    return discovered
+
+def select_modules(
+    discovered: List[Tuple[int, str, Dict[str, Any]]],
+    *,
+    only: Optional[Iterable[str]] = None,
+    tags: Optional[Iterable[str]] = None,
+) -> Optional[List[Tuple[int, str, Dict[str, Any]]]]:
+    """
+    Narrow discovered modules to the given folder names and/or tags.
+
+    Returns:
+        The filtered list (in order), or None if a requested name is unknown.
+    """
+    selected = discovered
+    if only:
+        wanted = set(only)
+        unknown = wanted - {name for _, name, _ in discovered}
+        if unknown:
+            print(f"❌ Unknown module(s): {', '.join(sorted(unknown))}")
+            return None
+        selected = [entry for entry in selected if entry[1] in wanted]
+    if tags:
+        wanted_tags = set(tags)
+        selected = [entry for entry in selected if wanted_tags & set(entry[2].get("tags") or [])]
+    return selected
+
+
+def print_module_list(discovered: List[Tuple[int, str, Dict[str, Any]]]) -> None:
+    """Print one line per module from its manifest (no module code is imported)."""
+    for order, name, manifest in discovered:
+        details = []
+        if manifest.get("requires") is not None:
+            details.append(f"requires={','.join(manifest['requires']) or '-'}")
+        if manifest.get("tags"):
+            details.append(f"tags={','.join(manifest['tags'])}")
+        if manifest.get("hardware"):
+            details.append(f"hardware={','.join(manifest['hardware'])}")
+        print(f"{order:>4}  {name:<22} {' '.join(details)}")
+        if manifest.get("summary"):
+            print(f"      {manifest['summary']}")
+
+
+def print_import_report(budget_ms: Optional[float] = None) -> bool:
+    """
+    Print discovery and per-module import times (slowest first).
+
+    Arguments:
+        budget_ms: Optional budget for discovery + all imports combined.
+
+    Returns:
+        True if within budget (or no budget given), False otherwise.
+    """
+    discovery_ms = DISCOVERY_STATS.get("seconds", 0.0) * 1000
+    print("\n⏱  Loader import report")
+    print(f"   discovery  {discovery_ms:8.1f} ms  "
+          f"({int(DISCOVERY_STATS.get('modules', 0))} manifests, {int(DISCOVERY_STATS.get('reparsed', 0))} re-parsed)")
+    total_ms = discovery_ms
+    for name, info in sorted(IMPORT_TIMES.items(), key=lambda kv: kv[1]["seconds"], reverse=True):
+        ms = info["seconds"] * 1000
+        total_ms += ms
+        pulled = f"  + {', '.join(info['pulled_in'])}" if info["pulled_in"] else ""
+        print(f"   {name:<22} {ms:8.1f} ms{pulled}")
+    print(f"   total      {total_ms:8.1f} ms")
+
+    if budget_ms is not None and total_ms > budget_ms:
+        print(f"⚠️  Loader cold start {total_ms:.1f} ms exceeds the {budget_ms:.1f} ms budget.")
+        return False
+    return True
 
 
 def validate_no_duplicates(discovered: List[Tuple[int, str, Any]]) -> bool:
@@ -122,47 +508,562 @@ def validate_no_duplicates(discovered: List[Tuple[int, str, Any]]) -> bool:
     return True
 
 
-def run_all(run_callable) -> bool:
+# ------------------------------ Fingerprints ------------------------------
+
+def _utils_imports(helper: str) -> Set[str]:
+    """Return the utils modules imported by one utils module (cached)."""
+    if helper not in _UTILS_IMPORTS:
+        path = UTILS_DIR / (helper.split(".", 1)[1].replace(".", os.sep) + ".py")
+        try:
+            helpers, _ = _scan_references(ast.parse(path.read_text(encoding="utf-8")))
+        except (OSError, SyntaxError):
+            helpers = set()
+        _UTILS_IMPORTS[helper] = helpers
+    return _UTILS_IMPORTS[helper]
+
+
+def _utils_closure(helpers: Iterable[str]) -> List[str]:
+    """Expand a set of utils modules with everything they import, transitively."""
+    seen: Set[str] = set()
+    stack = list(helpers)
+    while stack:
+        helper = stack.pop()
+        if helper in seen:
+            continue
+        seen.add(helper)
+        stack.extend(_utils_imports(helper))
+    return sorted(seen)
+
+
+def compute_fingerprint(manifest: Dict[str, Any]) -> str:
+    """
+    Hash everything a module's behavior depends on: its source, the utils
+    helpers it imports (transitively), its environment toggles and the other
+    files in its folder (configs, themes, ...).
+    """
+    module_file = Path(manifest["path"])
+    digest = hashlib.sha256()
+    digest.update(b"module\0" + module_file.read_bytes())
+
+    for helper in _utils_closure(manifest.get("utils") or []):
+        path = UTILS_DIR / (helper.split(".", 1)[1].replace(".", os.sep) + ".py")
+        try:
+            digest.update(f"\0helper:{helper}\0".encode() + path.read_bytes())
+        except OSError:
+            digest.update(f"\0helper:{helper}:missing".encode())
+
+    for name in manifest.get("env") or []:
+        digest.update(f"\0env:{name}={os.environ.get(name)!r}".encode())
+
+    folder = module_file.parent
+    for path in sorted(folder.rglob("*")):
+        if path == module_file or not path.is_file() or "__pycache__" in path.parts:
+            continue
+        digest.update(f"\0asset:{path.relative_to(folder)}\0".encode() + path.read_bytes())
+
+    return digest.hexdigest()
+
+
+def _should_skip(order: int, name: str, manifest: Dict[str, Any], fingerprint: str, run_callable) -> bool:
+    """True if the module's last successful run used the same fingerprint and probe() agrees."""
+    record = state_store.get_module_record(name)
+    if not record or not record["ok"] or record["fingerprint"] != fingerprint:
+        return False
+
+    if manifest.get("has_probe"):
+        mod = load_module(manifest)
+        probe = getattr(mod, "probe", None) if mod is not None else None
+        if not callable(probe):
+            return False
+        try:
+            if not probe(run_callable):
+                print(f"ℹ️  [{order}] {name}: inputs unchanged but probe() reports drift; re-running.")
+                return False
+        except Exception as exc:
+            print(f"⚠️  [{order}] {name}: probe() failed ({exc}); re-running.")
+            return False
+    return True
+
+
+# ------------------------------ Dependency graph ------------------------------
+
+def has_dependency_metadata(discovered: List[Tuple[int, str, Dict[str, Any]]]) -> bool:
+    """Return True if at least one module declares REQUIRES or PROVIDES."""
+    return any(
+        manifest.get("requires") is not None or manifest.get("provides") is not None
+        for _, _, manifest in discovered
+    )
+
+
+def build_dependency_graph(
+    discovered: List[Tuple[int, str, Dict[str, Any]]],
+    *,
+    universe: Optional[List[Tuple[int, str, Dict[str, Any]]]] = None,
+) -> Optional[Dict[str, Set[str]]]:
+    """
+    Resolve every module's prerequisites into a graph of folder names.
+
+    Arguments:
+        discovered: The modules to run (sorted by order).
+        universe: All discovered modules when `discovered` is a selection;
+            requirements on modules outside the selection are validated
+            against it and then treated as already applied.
+
+    Returns:
+        {folder_name: {prerequisite folder names}}, or None if a requirement
+        cannot be resolved or the graph contains a cycle (diagnostics printed).
+    """
+    selected = {name for _, name, _ in discovered}
+    providers: Dict[str, List[str]] = {}
+    for _, name, manifest in universe or discovered:
+        providers.setdefault(name, []).append(name)
+        for capability in manifest.get("provides") or []:
+            providers.setdefault(capability, []).append(name)
+
+    graph: Dict[str, Set[str]] = {}
+    ok = True
+    for index, (order, name, manifest) in enumerate(discovered):
+        requires = manifest.get("requires")
+        if requires is None:
+            # No metadata: keep the classic behavior of running after every lower-ordered module.
+            graph[name] = {prev for _, prev, _ in discovered[:index]}
+            continue
+
+        deps: Set[str] = set()
+        for req in requires:
+            targets = providers.get(req)
+            if not targets:
+                print(f"❌ [{order}] {name} requires '{req}', which no module provides.")
+                ok = False
+                continue
+            deps.update(t for t in targets if t != name and t in selected)
+        graph[name] = deps
+
+    if not ok:
+        return None
+
+    # Kahn's algorithm purely to detect cycles before anything runs.
+    remaining = {name: set(deps) for name, deps in graph.items()}
+    ready = [name for name, deps in remaining.items() if not deps]
+    while ready:
+        current = ready.pop()
+        del remaining[current]
+        for name, deps in remaining.items():
+            if current in deps:
+                deps.discard(current)
+                if not deps:
+                    ready.append(name)
+    if remaining:
+        print("❌ Dependency cycle detected between modules. Aborting without running any modules.")
+        for name in sorted(remaining):
+            print(f"   - {name} waits on: {', '.join(sorted(remaining[name]))}")
+        return None
+
+    return graph
+
+
+# ------------------------------ Output buffering ------------------------------
+
+class _ThreadRoutedStream(io.TextIOBase):
+    """
+    Stand-in for sys.stdout/sys.stderr that sends writes from worker threads
+    into that thread's buffer, and everything else to the original stream.
+    """
+
+    def __init__(self, fallback) -> None:
+        super().__init__()
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def capture(self, buffer: io.StringIO) -> None:
+        self._local.buffer = buffer
+
+    def release(self) -> None:
+        self._local.buffer = None
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is not None:
+            return buffer.write(text)
+        return self._fallback.write(text)
+
+    def flush(self) -> None:
+        if getattr(self._local, "buffer", None) is None:
+            self._fallback.flush()
+
+
+# ------------------------------ Execution ------------------------------
+
+def _decide_runs(
+    discovered: List[Tuple[int, str, Dict[str, Any]]], run_callable, force: bool
+) -> Dict[str, Tuple[Optional[str], bool]]:
+    """
+    Fingerprint every selected module up front.
+
+    Returns:
+        {name: (fingerprint or None, skip)} where skip means the last successful
+        run had the same fingerprint (and probe() agreed).
+    """
+    decisions: Dict[str, Tuple[Optional[str], bool]] = {}
+    for order, name, manifest in discovered:
+        try:
+            fingerprint: Optional[str] = compute_fingerprint(manifest)
+        except OSError as exc:
+            print(f"⚠️  [{order}] Could not fingerprint {name} ({exc}); it will always run.")
+            fingerprint = None
+        skip = bool(fingerprint) and not force and _should_skip(order, name, manifest, fingerprint, run_callable)
+        decisions[name] = (fingerprint, skip)
+    return decisions
+
+
+def _declared_packages(manifest: Dict[str, Any]) -> List[str]:
+    """
+    A module's repository packages, read from its manifest. Only modules whose
+    packages() (or computed PACKAGES) needs the code are imported here.
+    """
+    if not manifest.get("packages_dynamic"):
+        return [p.strip() for p in manifest.get("packages") or [] if p.strip()]
+    mod = load_module(manifest)
+    return package_plan.declared_packages(mod) if mod is not None else []
+
+
+def _package_requests(
+    discovered: List[Tuple[int, str, Dict[str, Any]]],
+    decisions: Dict[str, Tuple[Optional[str], bool]],
+) -> List[Tuple[str, List[str]]]:
+    """(name, packages) of the modules that will not be skipped, in run order."""
+    requests = []
+    for order, name, manifest in discovered:
+        if decisions[name][1]:
+            continue
+        try:
+            requests.append((name, _declared_packages(manifest)))
+        except Exception as exc:
+            print(f"⚠️  [{order}] Could not read the packages of {name} ({exc}); it will install its own.")
+    return requests
+
+
+def _cancelled_modules() -> Set[str]:
+    """Modules of the current run that failed, or depend (transitively) on one that did."""
+    with _RUN_LOCK:
+        failed = set(_RUN_FAILED)
+        graph = dict(_RUN_GRAPH)
+    cancelled: Set[str] = set(failed)
+    changed = True
+    while changed:
+        changed = False
+        for name, deps in graph.items():
+            if name not in cancelled and deps & cancelled:
+                cancelled.add(name)
+                changed = True
+    return cancelled
+
+
+def _provider_scheduled(
+    discovered: List[Tuple[int, str, Dict[str, Any]]],
+    decisions: Dict[str, Tuple[Optional[str], bool]],
+) -> bool:
+    """True if a module providing PREFETCH_AFTER will run (is not skipped)."""
+    return any(
+        PREFETCH_AFTER in (manifest.get("provides") or []) and not decisions[name][1]
+        for _, name, manifest in discovered
+    )
+
+
+def _arm_prefetch(
+    discovered: List[Tuple[int, str, Dict[str, Any]]],
+    decisions: Dict[str, Tuple[Optional[str], bool]],
+    requests: List[Tuple[str, List[str]]],
+    run_callable,
+) -> None:
+    """
+    Hand the remaining package sets to utils.prefetch. The download starts when
+    the module providing PREFETCH_AFTER completes, or right away if none will run.
+    """
+    providers = {
+        name for _, name, manifest in discovered if PREFETCH_AFTER in (manifest.get("provides") or [])
+    }
+    # Providers install their packages before the prefetch can start.
+    prefetch.arm([(name, pkgs) for name, pkgs in requests if name not in providers], run_callable)
+    if not _provider_scheduled(discovered, decisions):
+        prefetch.start()
+
+
+def _run_one(
+    order: int,
+    name: str,
+    manifest: Dict[str, Any],
+    run_callable,
+    decision: Tuple[Optional[str], bool] = (None, False),
+) -> bool:
+    """
+    Import a single module on demand and call its install(run); True on success.
+    `decision` comes from `_decide_runs()`: a skipped module is not imported.
+    """
+    fingerprint, skip = decision
+    if skip:
+        print(f"⏭  [{order}] {name} unchanged since its last successful run; skipping (use --force to re-run).")
+        return True
+
+    mod = load_module(manifest)
+    if mod is None:
+        print(f"❌ {name} could not be imported.")
+        return False
+
+    fn = getattr(mod, "install", None)
+    if not callable(fn):
+        print(f"⚠️  [{order}] Skipping {name}: no callable install() found.")
+        return True
+
+    print(f"▶ [{order}] Running {name}.install()")
+    try:
+        with aur_queue.owned_by(name):
+            ok = bool(fn(run_callable))
+    except Exception as exc:
+        print(f"ERROR: Exception while running {name}.install(): {exc}")
+        ok = False
+
+    if fingerprint:
+        state_store.record_module(name, fingerprint, ok)
+    if not ok:
+        with _RUN_LOCK:
+            _RUN_FAILED.add(name)
+    if ok and PREFETCH_AFTER in (manifest.get("provides") or []):
+        package_plan.start(exclude=_cancelled_modules())
+        prefetch.start()
+
+    if ok:
+        print(f"✔ [{order}] {name}.install() completed.")
+    else:
+        print(f"❌ {name}.install() reported failure.")
+    return ok
+
+
+def _run_sequential(
+    discovered: List[Tuple[int, str, Dict[str, Any]]],
+    run_callable,
+    decisions: Dict[str, Tuple[Optional[str], bool]],
+) -> bool:
+    """Classic numeric-order run: stop on the first install() failure."""
+    for order, name, manifest in discovered:
+        if not _run_one(order, name, manifest, run_callable, decisions[name]):
+            print(f"❌ Stopping: {name}.install() reported failure.")
+            return False
+    return True
+
+
+def _run_graph(
+    discovered: List[Tuple[int, str, Dict[str, Any]]],
+    graph: Dict[str, Set[str]],
+    run_callable,
+    max_workers: int,
+    decisions: Dict[str, Tuple[Optional[str], bool]],
+) -> bool:
+    """
+    Run modules as soon as their prerequisites completed, up to `max_workers`
+    at a time. A failure cancels the failed module's dependents only.
+    """
+    by_name = {name: (order, manifest) for order, name, manifest in discovered}
+    done: Set[str] = set()
+    failed: Set[str] = set()
+    started: Set[str] = set()
+
+    stdout_router = _ThreadRoutedStream(sys.stdout)
+    stderr_router = _ThreadRoutedStream(sys.stderr)
+
+    def worker(name: str) -> Tuple[bool, str]:
+        order, manifest = by_name[name]
+        buffer = io.StringIO()
+        stdout_router.capture(buffer)
+        stderr_router.capture(buffer)
+        try:
+            ok = _run_one(order, name, manifest, run_callable, decisions[name])
+        finally:
+            stdout_router.release()
+            stderr_router.release()
+        return ok, buffer.getvalue()
+
+    def blocked(name: str) -> Set[str]:
+        """Return failed modules that `name` transitively depends on."""
+        seen: Set[str] = set()
+        stack = list(graph[name])
+        culprits: Set[str] = set()
+        while stack:
+            dep = stack.pop()
+            if dep in seen:
+                continue
+            seen.add(dep)
+            if dep in failed:
+                culprits.add(dep)
+            stack.extend(graph[dep])
+        return culprits
+
+    print(f"ℹ️  Running modules by dependency graph (up to {max_workers} in parallel).")
+    original_stdout, original_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout_router, stderr_router
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="module") as pool:
+            running: Dict[Future, str] = {}
+
+            def submit_ready() -> None:
+                for _, name, _ in discovered:
+                    if name in started or not graph[name] <= done:
+                        continue
+                    started.add(name)
+                    running[pool.submit(worker, name)] = name
+
+            submit_ready()
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    name = running.pop(fut)
+                    try:
+                        ok, output = fut.result()
+                    except Exception as exc:
+                        ok, output = False, f"ERROR: Worker for {name} crashed: {exc}\n"
+                    order, _ = by_name[name]
+                    original_stdout.write(f"\n──── [{order}] {name} ────\n{output}")
+                    original_stdout.flush()
+                    (done if ok else failed).add(name)
+                submit_ready()
+    finally:
+        sys.stdout, sys.stderr = original_stdout, original_stderr
+
+    for order, name, _ in discovered:
+        if name not in started:
+            print(f"⏭  [{order}] Cancelled {name}: depends on failed {', '.join(sorted(blocked(name)))}.")
+
+    if failed:
+        print(f"❌ Failed modules: {', '.join(sorted(failed, key=lambda n: by_name[n][0]))}")
+        return False
+    return True
+
+
+def _resolve_max_workers(max_workers: Optional[int]) -> int:
+    """Pick the worker pool size from the argument, MODULES_MAX_WORKERS, or the default."""
+    if max_workers is None:
+        try:
+            max_workers = int(os.environ.get("MODULES_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        except ValueError:
+            max_workers = DEFAULT_MAX_WORKERS
+    return max(1, max_workers)
+
+
+def run_all(
+    run_callable,
+    *,
+    max_workers: Optional[int] = None,
+    only: Optional[Iterable[str]] = None,
+    tags: Optional[Iterable[str]] = None,
+    force: bool = False,
+    plan_packages: bool = True,
+    prefetch_packages: bool = True,
+) -> bool:
     """
     Discover modules, ensure unique order numbers, and call `install(run_callable)`
-    on each module in order.
+    on each module, honoring declared dependencies.
 
     Arguments:
         run_callable:
             The sudo-runner returned by `start_sudo_session()`.
+        max_workers:
+            Upper bound on concurrently running modules. Defaults to
+            MODULES_MAX_WORKERS or DEFAULT_MAX_WORKERS; 1 forces a serial run.
+        only / tags:
+            Optional selection by folder name and/or tag. Requirements on
+            modules outside the selection are assumed to be applied already.
+        force:
+            Run every selected module even if its fingerprint is unchanged.
+        plan_packages:
+            Install the declared packages of all modules that will run in as
+            few pacman transactions as possible before any install() runs.
+        prefetch_packages:
+            Download the packages later modules still need in the background
+            while earlier modules run (see utils.prefetch).
 
     Returns:
         True if all modules ran successfully, False otherwise.
 
     Behavior:
-        - If duplicates are detected, nothing is run and False is returned.
-        - Stops on the first install() failure to avoid partial configuration.
+        - If duplicates or unresolvable requirements are detected, nothing is run
+          and False is returned.
+        - Without any REQUIRES/PROVIDES metadata (or with max_workers=1), modules
+          run strictly in numeric order and the run stops on the first failure.
+        - Otherwise a failure cancels only the modules that depend on it.
         - Modules without an `install` callable are skipped with a warning.
+        - Only the selected modules are ever imported.
+        - A "Run summary" with what helpers did or avoided is printed at the end.
     """
     try:
-        discovered = discover_modules()
+        universe = discover_modules()
 
-        if not validate_no_duplicates(discovered):
+        if not validate_no_duplicates(universe):
             return False  # Do not run anything when duplicates exist.
 
-        for order, name, mod in discovered:
-            fn = getattr(mod, "install", None)
-            if callable(fn):
-                print(f"▶ [{order}] Running {name}.install()")
-                ok = False
-                try:
-                    ok = bool(fn(run_callable))
-                except Exception as exc:
-                    print(f"ERROR: Exception while running {name}.install(): {exc}")
-                    ok = False
-
-                if not ok:
-                    print(f"❌ Stopping: {name}.install() reported failure.")
-                    return False
-                print(f"✔ [{order}] {name}.install() completed.")
+        discovered = select_modules(universe, only=only, tags=tags)
+        if discovered is None:
+            return False
+        if not discovered:
+            print("⚠️  No modules matched the selection; nothing to do.")
+            return True
+
+        graph = build_dependency_graph(discovered, universe=universe)
+        if graph is None:
+            return False  # Do not run anything with a broken graph.
+
+        with _RUN_LOCK:
+            _RUN_GRAPH.clear()
+            _RUN_GRAPH.update(graph)
+            _RUN_FAILED.clear()
+        decisions = _decide_runs(discovered, run_callable, force)
+        if plan_packages or prefetch_packages:
+            requests = _package_requests(discovered, decisions)
+            if plan_packages:
+                # Providers install their own packages; the rest waits for them.
+                providers = {
+                    name for _, name, manifest in discovered
+                    if PREFETCH_AFTER in (manifest.get("provides") or [])
+                }
+                package_plan.arm([(name, pkgs) for name, pkgs in requests if name not in providers],
+                                 run_callable)
+                if not _provider_scheduled(discovered, decisions):
+                    package_plan.start()
+            if prefetch_packages:
+                _arm_prefetch(discovered, decisions, requests, run_callable)
+
+        workers = _resolve_max_workers(max_workers)
+        try:
+            if workers == 1 or not has_dependency_metadata(discovered):
+                ok = _run_sequential(discovered, run_callable, decisions)
             else:
-                print(f"⚠️  [{order}] Skipping {name}: no callable install() found.")
-        return True
+                ok = _run_graph(discovered, graph, run_callable, workers, decisions)
+        finally:
+            prefetch.stop()
+
+        failed_aur = aur_queue.flush(run_callable)
+        # Barrier failures were handled by the module itself: re-run next time, but do not fail the run.
+        for name in failed_aur + aur_queue.rerun_owners():
+            fingerprint = decisions.get(name, (None, False))[0]
+            if fingerprint:
+                state_store.record_module(name, fingerprint, False)  # re-run next time
+        if failed_aur:
+            print(f"❌ AUR packages queued by {', '.join(failed_aur)} failed to install.")
+            ok = False
+
+        # udev/sysctl/journald/grub/fc-cache/daemon-reload: each at most once, only if notified with a change
+        if not triggers.run_pending(run_callable):
+            ok = False
+
+        package_plan.report()
+        prefetch.report()
+        aur_queue.report()
+        files.report()
+        mirrors.note_downloads(*prefetch.download_counts())
+        run_report.print_report()
+        return ok
     except Exception as exc:
         print(f"ERROR: Unexpected failure in run_all(): {exc}")
         return False
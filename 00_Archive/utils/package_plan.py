@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Whole-run package plan
+Version: 1.1.0
+
+What the module does
+--------------------
+Instead of every module starting its own pacman transaction, the loader
+collects the package set of each module that is about to run, merges and
+de-duplicates them, and installs the result in as few transactions as
+correctness allows:
+
+1) the keyring (`archlinux-keyring`) on its own, so the signatures of every
+   other package are checked against an up-to-date keyring;
+2) everything else in ONE transaction.
+
+Every package installed this way is marked as satisfied in `utils.pacman`, so
+the modules' own `install_packages()` calls become no-ops that do not start
+pacman again. If the combined transaction fails, nothing is marked and the
+modules fall back to their per-module installs (which pinpoint the culprit).
+
+When it runs
+------------
+The loader `arm()`s the plan before the first module and `start()`s it once
+the module that refreshes the mirrorlist, tunes pacman.conf and runs
+`pacman -Syu` (000_core) has completed, so the plan never installs from stale
+databases or a stale mirrorlist (a partial upgrade). Modules that a failed
+dependency has cancelled by then are left out of it.
+
+Declaring packages in a module
+------------------------------
+- PACKAGES = ["pkg", ...]           a plain module-level list, or
+- def packages() -> list[str]       when the set depends on toggles/env.
+
+Only repository packages belong here; AUR packages go through utils.yay.
+
+Report
+------
+The run summary lists the transactions the plan ran, how many module-level
+transactions it made unnecessary, and an estimate of the ALPM hook runs saved
+(hooks whose Target is `*` fire once per transaction, e.g. snap-pac and the
+package-list hook from 030_backup).
+"""
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils import pacman_db, run_report
+from utils.pacman import install_packages, transactions_avoided
+
+# Installed alone, before everything else.
+KEYRING_PACKAGES = ["archlinux-keyring"]
+
+# Where pacman looks for hooks (system first, then admin overrides).
+HOOK_DIRS = [Path("/usr/share/libalpm/hooks"), Path("/etc/pacman.d/hooks")]
+
+_PLAN_STATS: Dict[str, int] = {"transactions": 0}
+
+# The armed plan: (name, packages) pairs and the runner; cleared once started.
+_ARMED_LOCK = threading.Lock()
+_ARMED: Dict[str, Optional[Any]] = {"requests": None, "run": None}
+
+
+def _print_action(text: str) -> None:
+    print(f"$ {text}")
+
+
+def declared_packages(mod: Any) -> List[str]:
+    """Return a module's declared repository packages (packages() wins over PACKAGES)."""
+    fn = getattr(mod, "packages", None)
+    declared = fn() if callable(fn) else getattr(mod, "PACKAGES", None)
+    if not declared:
+        return []
+    return [p.strip() for p in declared if isinstance(p, str) and p.strip()]
+
+
+def build_plan(requests: List[Tuple[str, List[str]]]) -> List[List[str]]:
+    """
+    Merge (name, packages) pairs into ordered transactions.
+
+    Returns:
+        A list of transactions (each a list of package names): the keyring
+        transaction first (if any module asked for it), then everything else.
+        Packages that are already installed are left out.
+    """
+    seen: Dict[str, str] = {}
+    for name, pkgs in requests:
+        for pkg in pkgs:
+            seen.setdefault(pkg, name)
+
+    wanted = pacman_db.missing_packages(list(seen))
+    keyring = [p for p in KEYRING_PACKAGES if p in wanted]
+    rest = [p for p in wanted if p not in keyring]
+    return [tx for tx in (keyring, rest) if tx]
+
+
+def _always_firing_hooks() -> int:
+    """Count hooks that trigger on every transaction (Target = *), later dirs overriding earlier."""
+    hooks: Dict[str, bool] = {}
+    for directory in HOOK_DIRS:
+        try:
+            entries = sorted(directory.glob("*.hook"))
+        except OSError:
+            continue
+        for hook in entries:
+            try:
+                text = hook.read_text(encoding="utf-8", errors="ignore")
+            except OSError:
+                continue
+            targets = [line.split("=", 1)[1].strip() for line in text.splitlines()
+                       if line.strip().startswith("Target") and "=" in line]
+            hooks[hook.name] = "*" in targets
+    return sum(1 for fires in hooks.values() if fires)
+
+
+def apply_plan(transactions: List[List[str]], run: Callable) -> bool:
+    """
+    Install the planned transactions in order.
+
+    Returns:
+        True if every transaction succeeded. On failure, the packages of the
+        failed (and later) transactions are left for the modules to install.
+    """
+    total = sum(len(tx) for tx in transactions)
+    if not total:
+        return True
+
+    print(f"▶ Package plan: {total} package(s) in {len(transactions)} transaction(s)")
+    for tx in transactions:
+        _print_action(f"# plan transaction {_PLAN_STATS['transactions'] + 1}: {len(tx)} package(s)")
+        if not install_packages(tx, run):
+            print("⚠️  Package plan transaction failed; modules will install their own packages.")
+            return False
+        _PLAN_STATS["transactions"] += 1  # install_packages() marked them satisfied
+    return True
+
+
+def report() -> None:
+    """Add the plan's savings to the run summary."""
+    ran = _PLAN_STATS["transactions"]
+    avoided = transactions_avoided()
+    if avoided:
+        run_report.add("Packages", f"{avoided} install call(s) found everything installed; pacman/yay not started")
+    if not ran:
+        return
+    saved = max(0, avoided - ran)
+    hooks = _always_firing_hooks()
+    run_report.add("Package plan", f"{ran} planned transaction(s)")
+    run_report.add("Package plan", f"transactions saved: {saved}; "
+                                   f"hook runs saved: ~{saved * hooks} ({hooks} hook(s) fire on every transaction)")
+
+
+def run_plan(requests: List[Tuple[str, List[str]]], run: Callable) -> bool:
+    """Build and apply the plan for (name, packages) pairs; returns apply_plan()'s result."""
+    return apply_plan(build_plan(requests), run)
+
+
+def arm(requests: List[Tuple[str, List[str]]], run: Callable) -> None:
+    """Remember the (name, packages) pairs for `start()`, in run order."""
+    with _ARMED_LOCK:
+        _ARMED["requests"] = list(requests)
+        _ARMED["run"] = run
+
+
+def start(exclude: Iterable[str] = ()) -> bool:
+    """
+    Apply the armed plan once, leaving out the modules in `exclude`.
+
+    Returns:
+        apply_plan()'s result; True when nothing was armed (or it already ran).
+    """
+    with _ARMED_LOCK:
+        requests, run = _ARMED["requests"], _ARMED["run"]
+        _ARMED["requests"] = None
+    if not requests or run is None:
+        return True
+    skipped = set(exclude)
+    left_out = [name for name, _ in requests if name in skipped]
+    if left_out:
+        print(f"ℹ️  Package plan: leaving out {', '.join(left_out)} (cancelled by a failed dependency)")
+    return run_plan([(name, pkgs) for name, pkgs in requests if name not in skipped], run)
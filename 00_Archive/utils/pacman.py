@@ -2,7 +2,7 @@
 #!/usr/bin/env python3
 """
 Pacman install helper that uses a provided sudo session runner.
-Version: 2.0.0
+Version: 2.1.0
 
 What the module does
 --------------------
@@ -16,6 +16,17 @@ Key behavior
 - Uses: pacman -S --needed --noconfirm <packages...>
   * `--needed` makes the operation idempotent (already-installed packages are skipped).
 - Prints shell-like actions before running, surfaces useful output on success/failure.
+- Transactions are serialized through `PACKAGE_LOCK`, so modules running in
+  parallel never race for pacman's database lock.
+- Packages already installed earlier in this run (e.g. by the whole-run plan in
+  utils.package_plan, recorded via `mark_satisfied`) are filtered out; when
+  nothing is left, pacman is not started at all.
+- Before a transaction, waits for packages the background prefetcher
+  (utils.prefetch) is about to put into pacman's cache, instead of
+  downloading them a second time.
+- Packages already installed on the system are filtered out the same way, by
+  reading the local package database in-process (utils.pacman_db) instead of
+  paying for a pacman start, sync-DB load and lock acquisition per call.
 - Robust error handling: exceptions are caught, clear messages are printed,
   and the function returns `True` (success) or `False` (failure).
 
@@ -40,6 +51,18 @@ finally:
 
 from typing import List, Callable
 import sys
+import threading
+
+from utils import pacman_db, prefetch
+
+# pacman holds a global database lock, so package transactions issued by
+# modules running in parallel (see utils.module_loader) must take turns.
+PACKAGE_LOCK = threading.RLock()
+
+# Packages known to be installed during this run, and how many
+# install_packages() calls that knowledge turned into no-ops.
+_SATISFIED: set = set()
+_STATS = {"avoided": 0}
 
 
 def _print_action(cmd: str) -> None:
@@ -54,6 +77,23 @@ def _join(cmd: List[str]) -> str:
     return " ".join(cmd)
 
 
+def mark_satisfied(packages: List[str]) -> None:
+    """Remember packages that were installed during this run."""
+    with PACKAGE_LOCK:
+        _SATISFIED.update(packages)
+
+
+def transactions_avoided() -> int:
+    """Number of install_packages() calls that needed no pacman transaction."""
+    return _STATS["avoided"]
+
+
+def note_avoided() -> None:
+    """Count an install call (e.g. from utils.yay) that needed no transaction."""
+    with PACKAGE_LOCK:
+        _STATS["avoided"] += 1
+
+
 def install_packages(packages: List[str], run: Callable) -> bool:
     """
     Install the given packages with pacman if not already present.
@@ -68,11 +108,21 @@ def install_packages(packages: List[str], run: Callable) -> bool:
     if not cleaned:
         return True
 
+    with PACKAGE_LOCK:
+        missing = pacman_db.missing_packages([pkg for pkg in cleaned if pkg not in _SATISFIED])
+        if not missing:
+            _STATS["avoided"] += 1
+            _print_action(f"{_join(['pacman', '-S', '--needed', *cleaned])}  # already installed; skipped")
+            return True
+    cleaned = missing
+    prefetch.wait_for(cleaned)
+
     cmd = ["pacman", "-S", "--needed", "--noconfirm", *cleaned]
     _print_action(_join(cmd))
 
     # Capture output so we can show diagnostics if it fails.
-    result = run(cmd, check=False, capture_output=True)
+    with PACKAGE_LOCK:
+        result = run(cmd, check=False, capture_output=True)
 
     if result.returncode != 0:
         _print_error("pacman failed with a non-zero exit status.")
@@ -90,4 +140,5 @@ def install_packages(packages: List[str], run: Callable) -> bool:
         # pacman sometimes warns to stderr even on success
         print(result.stderr.rstrip(), file=sys.stderr)
 
+    mark_satisfied(cleaned)
     return True
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+In-process reader of the local pacman database
+Version: 1.0.0
+
+What the module does
+--------------------
+Reads `/var/lib/pacman/local/<name>-<version>-<rel>/desc` directly (no pacman,
+no root, no database lock) and keeps an in-memory index of installed packages:
+
+    {name: {"version": str, "provides": [str], "reason": int, "installdate": int}}
+
+`utils.pacman.install_packages()` and `utils.yay.install_packages()` use it to
+drop packages that are already installed, and skip the subprocess entirely
+when nothing is missing.
+
+Behavior
+--------
+- The index is built once and reused until the database directory's mtime
+  changes (pacman adds/removes a `<name>-<version>` directory for every install,
+  upgrade and removal, which bumps the mtime).
+- A package counts as installed only by its exact name. `pacman -S foo`
+  installs the real `foo` even when another installed package provides `foo`,
+  so provides are indexed (see `provider_of`) but never used for filtering.
+- Names with version constraints (`foo>=1.2`) are never filtered; pacman decides.
+- An installed package counts as satisfied even if the sync DB has a newer
+  version: upgrades are `pacman -Syu`'s job (done by 000_core), not `-S --needed`.
+- If the database cannot be read (not Arch, unusual permissions), every package
+  is reported as missing, so callers fall back to plain pacman.
+
+Configuration
+-------------
+The database directory defaults to /var/lib/pacman/local. Override it with
+`$PACMAN_LOCAL_DB` or by passing `db_path=` to any function, e.g. to point at a
+fixture directory laid out in the same on-disk format.
+
+Public API
+----------
+parse_desc(text: str) -> dict
+load_index(db_path=None) -> dict[str, dict]
+is_installed(name: str, db_path=None) -> bool
+provider_of(name: str, db_path=None) -> str | None
+missing_packages(packages: list[str], db_path=None) -> list[str]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_DB_PATH = "/var/lib/pacman/local"
+
+_VERSION_OPERATORS = ("<", ">", "=")
+
+_LOCK = threading.Lock()
+# db path -> (directory mtime_ns, index)
+_CACHE: Dict[str, tuple] = {}
+
+
+def _print_error(message: str) -> None:
+    """Print a clear error message to stderr so it stands out in logs."""
+    print(f"ERROR: {message}", file=sys.stderr)
+
+
+def _db_path(db_path: Optional[str]) -> Path:
+    return Path(db_path or os.environ.get("PACMAN_LOCAL_DB") or DEFAULT_DB_PATH)
+
+
+def _strip_version(spec: str) -> str:
+    for index, char in enumerate(spec):
+        if char in _VERSION_OPERATORS:
+            return spec[:index]
+    return spec
+
+
+def parse_desc(text: str) -> Dict[str, List[str]]:
+    """
+    Parse a pacman `desc` file into {"NAME": [...], "VERSION": [...], ...}.
+
+    Sections look like `%NAME%` followed by one value per line, ended by a blank line.
+    """
+    sections: Dict[str, List[str]] = {}
+    current: Optional[List[str]] = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            current = None
+        elif line.startswith("%") and line.endswith("%") and len(line) > 2:
+            current = sections.setdefault(line[1:-1], [])
+        elif current is not None:
+            current.append(line)
+    return sections
+
+
+def _entry(sections: Dict[str, List[str]]) -> Dict[str, Any]:
+    def first_int(key: str) -> int:
+        try:
+            return int(sections.get(key, ["0"])[0])
+        except ValueError:
+            return 0
+
+    return {
+        "version": (sections.get("VERSION") or [""])[0],
+        "provides": [_strip_version(p) for p in sections.get("PROVIDES", [])],
+        "reason": first_int("REASON"),  # 0 = explicitly installed, 1 = as a dependency
+        "installdate": first_int("INSTALLDATE"),
+    }
+
+
+def _build_index(path: Path) -> Dict[str, Dict[str, Any]]:
+    index: Dict[str, Dict[str, Any]] = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            try:
+                with open(os.path.join(entry.path, "desc"), encoding="utf-8", errors="replace") as fh:
+                    sections = parse_desc(fh.read())
+            except OSError:
+                continue  # half-written entry or a stray directory
+            names = sections.get("NAME")
+            if names:
+                index[names[0]] = _entry(sections)
+    return index
+
+
+def load_index(db_path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Return the index of installed packages, rebuilding it only if the database changed.
+
+    Returns:
+        {name: {"version", "provides", "reason", "installdate"}}; empty if unreadable.
+    """
+    path = _db_path(db_path)
+    key = str(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return {}
+
+    with _LOCK:
+        cached = _CACHE.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            index = _build_index(path)
+        except OSError as exc:
+            _print_error(f"Could not read the pacman database at {path}: {exc}")
+            return {}
+        _CACHE[key] = (mtime, index)
+        return index
+
+
+def is_installed(name: str, db_path: Optional[str] = None) -> bool:
+    """True if a package with exactly this name is installed."""
+    return name in load_index(db_path)
+
+
+def provider_of(name: str, db_path: Optional[str] = None) -> Optional[str]:
+    """Return the installed package that is or provides `name`, or None."""
+    index = load_index(db_path)
+    if name in index:
+        return name
+    for pkg, entry in index.items():
+        if name in entry["provides"]:
+            return pkg
+    return None
+
+
+def missing_packages(packages: List[str], db_path: Optional[str] = None) -> List[str]:
+    """Return the packages from `packages` that are not installed (order kept)."""
+    index = load_index(db_path)
+    if not index:
+        return list(packages)
+    return [
+        pkg for pkg in packages
+        if pkg not in index or any(op in pkg for op in _VERSION_OPERATORS)
+    ]
+
+
+if __name__ == "__main__":
+    # Demonstration: summarize the local database (or a fixture dir given as argv[1]).
+    target = sys.argv[1] if len(sys.argv) > 1 else None
+    idx = load_index(target)
+    explicit = sum(1 for e in idx.values() if e["reason"] == 0)
+    print(f"{len(idx)} package(s) installed in {_db_path(target)} ({explicit} explicit)")
+    print("missing from [git, vim, no-such-package]:", missing_packages(["git", "vim", "no-such-package"], target))
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Background package download prefetch
+Version: 1.2.0
+
+What the module does
+--------------------
+While earlier modules are busy configuring (snapper, udev rules, ...), the
+network is idle. This helper downloads the packages later modules will install
+into pacman's cache in a background thread, so their `install_packages()`
+calls only have to verify and unpack.
+
+How it works
+------------
+1) `arm(modules, run)` records the package sets of the modules that will run,
+   in the order they will run.
+2) `start()` (called by the loader once the module providing "mirrors" has
+   refreshed the mirrorlist and synced the databases) resolves each set with
+   `pacman -Sp --needed --print-format "%n %l"`. This prints download URLs
+   without taking pacman's database lock, so module transactions are not
+   blocked. The URLs are downloaded earliest-needed first, as many at a time
+   as pacman's own ParallelDownloads (from /etc/pacman.conf), into
+   /var/cache/pacman/pkg. Each file is written under a temporary name and
+   renamed into place, so pacman never sees a half-written package.
+3) `utils.pacman.install_packages()` calls `wait_for(packages)` before its
+   transaction: sets containing those packages that are not resolved yet,
+   and queued files for them (dependencies included), jump to the front, and
+   the install waits for them instead of downloading them a second time.
+
+Signatures are not fetched: Arch sync databases carry each package's
+signature, so pacman does not need the detached `.sig` file.
+
+Report
+------
+Progress (files/bytes) is kept up to date in the run summary. At the end
+`report()` adds the time saved: background download time minus the time
+installs spent waiting for the prefetcher. `download_counts()` hands the
+successes and failures to utils.mirrors, which re-ranks mirrors when too
+many downloads fail.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from utils import run_report
+
+CACHE_DIR = Path("/var/cache/pacman/pkg")
+PACMAN_CONF = Path("/etc/pacman.conf")
+
+# Concurrent downloads when pacman.conf does not set ParallelDownloads (pacman's own default is 1).
+DEFAULT_PARALLEL_DOWNLOADS = 5
+
+# How long an install waits for its packages before letting pacman download them itself.
+WAIT_TIMEOUT_SEC = 300
+
+# How long stop() waits for the downloads in flight at the end of the run.
+STOP_TIMEOUT_SEC = 30
+
+# The temporary suffix differs from pacman's own ".part", which pacman would try to resume.
+_TMP_SUFFIX = ".prefetch"
+
+_COND = threading.Condition()
+_STATE: Dict[str, object] = {
+    "modules": [],        # [(module name, [packages])] in run order
+    "run": None,
+    "thread": None,
+    "stop": False,
+    "to_resolve": [],     # [(module name, [packages])] not resolved yet
+    "resolving": frozenset(),  # packages of the set pacman -Sp is resolving right now
+    "resolved": False,    # every set resolved; downloaders exit once the queue is empty
+    "queue": [],          # [(package name, url, requested set)] still to download
+    "inflight": [],       # [(package name, url, requested set)] being downloaded
+    "busy_since": 0.0,    # when the inflight list last became non-empty
+}
+_STATS = {"files": 0, "bytes": 0, "cached": 0, "failed": 0, "download_sec": 0.0, "wait_sec": 0.0}
+
+
+def _print_action(text: str) -> None:
+    print(f"$ {text}")
+
+
+def _parallel_downloads() -> int:
+    """ParallelDownloads from pacman.conf, else DEFAULT_PARALLEL_DOWNLOADS."""
+    try:
+        match = re.search(r"^\s*ParallelDownloads\s*=\s*(\d+)", PACMAN_CONF.read_text(encoding="utf-8"), re.M)
+    except OSError:
+        match = None
+    return max(1, int(match.group(1))) if match else DEFAULT_PARALLEL_DOWNLOADS
+
+
+def _resolve(packages: List[str]) -> List[Tuple[str, str]]:
+    """Return [(package name, url)] pacman would download for `packages` (deps included)."""
+    cmd = ["pacman", "-Sp", "--needed", "--print-format", "%n %l", *packages]
+    try:
+        res = subprocess.run(cmd, check=False, capture_output=True, text=True)
+    except OSError:
+        return []
+    if res.returncode != 0:
+        return []  # e.g. an AUR name in the set; those modules just download inline
+    resolved = []
+    for line in res.stdout.splitlines():
+        name, _, url = line.strip().partition(" ")
+        if url and not url.startswith("file://"):
+            resolved.append((name, url))
+    return resolved
+
+
+def _update_progress() -> None:
+    with _COND:
+        pending = len(_STATE["queue"]) + len(_STATE["inflight"])
+        stats = dict(_STATS)
+    run_report.set_line(
+        "Prefetch", "progress",
+        f"{stats['files']} file(s), {stats['bytes'] / 1e6:.1f} MB downloaded in the background; "
+        f"{stats['cached']} already cached; {pending} pending; {stats['failed']} failed",
+    )
+
+
+def _download(name: str, url: str, run: Callable) -> None:
+    dest = CACHE_DIR / url.rsplit("/", 1)[-1]
+    if dest.exists():
+        with _COND:
+            _STATS["cached"] += 1
+        return
+    tmp = f"{dest}{_TMP_SUFFIX}"
+    script = 'curl -fsSL --retry 2 -o "$1" "$2" && mv -f "$1" "$3" || { rm -f "$1"; exit 1; }'
+    res = run(["sh", "-c", script, "sh", tmp, url, str(dest)], check=False, capture_output=True)
+    try:
+        size = os.path.getsize(dest) if res.returncode == 0 else 0
+    except OSError:
+        size = 0
+    with _COND:
+        if res.returncode != 0:
+            _STATS["failed"] += 1
+            return
+        _STATS["files"] += 1
+        _STATS["bytes"] += size
+
+
+def _downloader(run: Callable) -> None:
+    """Take queued files one at a time until the queue is empty and every set is resolved."""
+    while True:
+        with _COND:
+            _COND.wait_for(lambda: _STATE["stop"] or _STATE["queue"] or _STATE["resolved"])
+            if _STATE["stop"] or not _STATE["queue"]:
+                return
+            item = _STATE["queue"].pop(0)
+            if not _STATE["inflight"]:
+                _STATE["busy_since"] = time.monotonic()
+            _STATE["inflight"].append(item)
+        try:
+            _download(item[0], item[1], run)
+        except Exception:
+            with _COND:
+                _STATS["failed"] += 1
+        with _COND:
+            _STATE["inflight"].remove(item)
+            if not _STATE["inflight"]:  # wall-clock time with at least one download running
+                _STATS["download_sec"] += time.monotonic() - _STATE["busy_since"]
+            _COND.notify_all()
+        _update_progress()
+
+
+def _worker() -> None:
+    """Resolve the package sets in need order while the downloaders work through the queue."""
+    run = _STATE["run"]
+    downloaders = [
+        threading.Thread(target=_downloader, args=(run,), name=f"package-prefetch-{i}", daemon=True)
+        for i in range(_parallel_downloads())
+    ]
+    for thread in downloaders:
+        thread.start()
+    seen = set()
+    while True:
+        with _COND:
+            if _STATE["stop"] or not _STATE["to_resolve"]:
+                break
+            _module, packages = _STATE["to_resolve"].pop(0)
+            requested = frozenset(packages)
+            _STATE["resolving"] = requested
+        resolved = _resolve(packages)
+        with _COND:
+            for name, url in [] if _STATE["stop"] else resolved:
+                if url not in seen:
+                    seen.add(url)
+                    _STATE["queue"].append((name, url, requested))
+            _STATE["resolving"] = frozenset()
+            _COND.notify_all()
+    with _COND:
+        _STATE["resolved"] = True
+        _COND.notify_all()
+    for thread in downloaders:
+        thread.join()  # stop() bounds how long the loader waits for this thread
+
+
+def arm(modules: List[Tuple[str, List[str]]], run: Callable) -> None:
+    """Remember the (module name, packages) pairs to prefetch, in run order."""
+    with _COND:
+        _STATE["modules"] = [(name, list(pkgs)) for name, pkgs in modules if pkgs]
+        _STATE["run"] = run
+
+
+def start() -> bool:
+    """Start the background prefetch once; returns True if a thread was started."""
+    with _COND:
+        if _STATE["thread"] is not None or not _STATE["modules"] or _STATE["run"] is None:
+            return False
+        total = sum(len(pkgs) for _, pkgs in _STATE["modules"])
+        _print_action(f"# prefetching packages for {len(_STATE['modules'])} module(s) ({total} package(s)) "
+                      f"in the background, {_parallel_downloads()} download(s) at a time")
+        _STATE["to_resolve"] = list(_STATE["modules"])
+        thread = threading.Thread(target=_worker, name="package-prefetch", daemon=True)
+        _STATE["thread"] = thread
+    thread.start()
+    return True
+
+
+def wait_for(packages: List[str], timeout: Optional[float] = WAIT_TIMEOUT_SEC) -> None:
+    """
+    Move pending work for `packages` to the front and wait until their files are in the cache.
+
+    Waits while a set containing one of them is still being resolved, and for
+    queued or in-flight files of those packages or of their dependencies.
+    Returns immediately when no prefetch is running or nothing of theirs is pending.
+    """
+    wanted = set(packages)
+    started = time.monotonic()
+
+    def concerns(item: Tuple[str, str, FrozenSet[str]]) -> bool:
+        return item[0] in wanted or not wanted.isdisjoint(item[2])
+
+    with _COND:
+        if _STATE["thread"] is None:
+            return
+        # Stable sorts: keep the need order otherwise.
+        _STATE["to_resolve"].sort(key=lambda entry: wanted.isdisjoint(entry[1]))
+        _STATE["queue"].sort(key=lambda item: not concerns(item))
+
+        def pending() -> bool:
+            if _STATE["stop"]:
+                return False
+            if not wanted.isdisjoint(_STATE["resolving"]):
+                return True
+            if any(not wanted.isdisjoint(pkgs) for _, pkgs in _STATE["to_resolve"]):
+                return True
+            return any(concerns(item) for item in _STATE["queue"] + _STATE["inflight"])
+
+        if not pending():
+            return
+        _COND.wait_for(lambda: not pending(), timeout=timeout)
+        _STATS["wait_sec"] += time.monotonic() - started
+
+
+def stop() -> None:
+    """Cancel work that has not started and wait briefly for the downloads in flight."""
+    with _COND:
+        _STATE["stop"] = True
+        _STATE["queue"] = []
+        _STATE["to_resolve"] = []
+        thread = _STATE["thread"]
+        _COND.notify_all()
+    if thread is not None:
+        thread.join(timeout=STOP_TIMEOUT_SEC)
+
+
+def download_counts() -> Tuple[int, int]:
+    """Return (files downloaded, downloads failed) so far; feeds utils.mirrors' failure rate."""
+    with _COND:
+        return _STATS["files"], _STATS["failed"]
+
+
+def report() -> None:
+    """Add the final prefetch numbers to the run summary."""
+    if _STATE["thread"] is None:
+        return
+    _update_progress()
+    saved = max(0.0, _STATS["download_sec"] - _STATS["wait_sec"])
+    run_report.set_line(
+        "Prefetch", "saved",
+        f"~{saved:.1f}s of downloading taken off the critical path "
+        f"({_STATS['download_sec']:.1f}s downloading, {_STATS['wait_sec']:.1f}s spent waiting by installs)",
+    )
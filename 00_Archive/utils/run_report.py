@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Run summary collector
+Version: 1.0.0
+
+What the module does
+--------------------
+Lets helpers (package plan, prefetch, file deployment, ...) record short
+lines about what they did or avoided during a provisioning run, grouped by
+section, and prints them as one "Run summary" block at the end of
+`utils.module_loader.run_all()`.
+
+Public API
+----------
+add(section: str, line: str) -> None
+    Append a line under a section (sections keep first-use order).
+set_line(section: str, key: str, line: str) -> None
+    Add or replace a keyed line (for counters that are updated repeatedly).
+print_report() -> None
+    Print every recorded section; prints nothing when the report is empty.
+reset() -> None
+    Forget everything (mainly for repeated runs inside one process).
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Tuple
+
+_LOCK = threading.Lock()
+_SECTIONS: Dict[str, List[Tuple[str, str]]] = {}
+
+
+def add(section: str, line: str) -> None:
+    """Append a line under `section`."""
+    with _LOCK:
+        _SECTIONS.setdefault(section, []).append(("", line))
+
+
+def set_line(section: str, key: str, line: str) -> None:
+    """Add a line under `section`, replacing an earlier line with the same key."""
+    with _LOCK:
+        lines = _SECTIONS.setdefault(section, [])
+        for index, (existing, _) in enumerate(lines):
+            if existing == key:
+                lines[index] = (key, line)
+                return
+        lines.append((key, line))
+
+
+def print_report() -> None:
+    """Print all sections as one block."""
+    with _LOCK:
+        if not _SECTIONS:
+            return
+        print("\n📋 Run summary")
+        for section, lines in _SECTIONS.items():
+            print(f"   {section}:")
+            for _, line in lines:
+                print(f"     - {line}")
+
+
+def reset() -> None:
+    """Clear all recorded lines."""
+    with _LOCK:
+        _SECTIONS.clear()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Persistent provisioning state (SQLite)
+Version: 1.0.0
+
+What the module does
+--------------------
+Keeps a small SQLite database that survives between provisioning runs:
+
+- `modules` table: per-module fingerprint of the last run, its result and time,
+  used by `utils.module_loader` to skip modules whose inputs did not change.
+- `kv` table: JSON values under string keys for other helpers that need to
+  remember something between runs.
+
+Location
+--------
+The orchestrator runs as your normal user (root work goes through the sudo
+runner), so the database lives in a user-writable state directory:
+
+    $DOTFILES_STATE_DIR                 (if set, e.g. /var/lib/dotfiles)
+    $XDG_STATE_HOME/dotfiles            (otherwise)
+    ~/.local/state/dotfiles             (fallback)
+
+Behavior
+--------
+- Every call opens its own short-lived connection, so the store is safe to use
+  from modules running in parallel threads.
+- Failures are reported and swallowed: a broken state store never breaks a
+  provisioning run, it only disables skipping.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DB_FILENAME = "state.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS modules (
+    name        TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    ok          INTEGER NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS kv (
+    key        TEXT PRIMARY KEY,
+    value      TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_WRITE_LOCK = threading.Lock()
+
+
+def _print_error(message: str) -> None:
+    """Print a clear error message to stderr so it stands out in logs."""
+    print(f"ERROR: {message}", file=sys.stderr)
+
+
+def state_dir() -> Path:
+    """Return the directory that holds persistent provisioning state."""
+    override = os.environ.get("DOTFILES_STATE_DIR")
+    if override:
+        return Path(override).expanduser()
+    base = os.environ.get("XDG_STATE_HOME") or str(Path.home() / ".local" / "state")
+    return Path(base) / "dotfiles"
+
+
+def db_path() -> Path:
+    """Return the full path of the SQLite database."""
+    return state_dir() / DB_FILENAME
+
+
+def _connect() -> sqlite3.Connection:
+    path = db_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def get_module_record(name: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the last recorded run of a module.
+
+    Returns:
+        {"fingerprint": str, "ok": bool, "finished_at": float} or None.
+    """
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT fingerprint, ok, finished_at FROM modules WHERE name = ?", (name,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error) as exc:
+        _print_error(f"Could not read state for {name}: {exc}")
+        return None
+    if row is None:
+        return None
+    return {"fingerprint": row[0], "ok": bool(row[1]), "finished_at": row[2]}
+
+
+def record_module(name: str, fingerprint: str, ok: bool) -> bool:
+    """Store the outcome of a module run. Returns True if the record was written."""
+    try:
+        with _WRITE_LOCK:
+            conn = _connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO modules (name, fingerprint, ok, finished_at) VALUES (?, ?, ?, ?)",
+                        (name, fingerprint, int(ok), time.time()),
+                    )
+            finally:
+                conn.close()
+        return True
+    except (OSError, sqlite3.Error) as exc:
+        _print_error(f"Could not record state for {name}: {exc}")
+        return False
+
+
+def get_value(key: str, default: Any = None) -> Any:
+    """Return the JSON value stored under `key`, or `default`."""
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+        return default if row is None else json.loads(row[0])
+    except (OSError, sqlite3.Error, ValueError) as exc:
+        _print_error(f"Could not read state key {key}: {exc}")
+        return default
+
+
+def set_value(key: str, value: Any) -> bool:
+    """Store a JSON-serializable value under `key`. Returns True on success."""
+    try:
+        payload = json.dumps(value)
+        with _WRITE_LOCK:
+            conn = _connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO kv (key, value, updated_at) VALUES (?, ?, ?)",
+                        (key, payload, time.time()),
+                    )
+            finally:
+                conn.close()
+        return True
+    except (OSError, sqlite3.Error, TypeError, ValueError) as exc:
+        _print_error(f"Could not write state key {key}: {exc}")
+        return False
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Privileged command broker (root side)
+Version: 1.1.0
+
+What the module does
+--------------------
+This script is started ONCE per provisioning run by `utils.sudo_session`
+through `sudo -n`, and then executes commands on behalf of the unprivileged
+orchestrator, so each command costs a socket round-trip instead of a full
+`sudo` fork/exec with PAM and policy evaluation.
+
+Protocol
+--------
+- Listens on a Unix socket created inside a private (0700) directory owned by
+  the invoking user; the socket itself is chowned to that user with mode 0600.
+- Every accepted connection is verified with SO_PEERCRED: only the
+  orchestrator process itself (`--parent-pid`, running as the invoking
+  user's uid) may talk to the broker. Other processes of the same user
+  (another terminal, a build script) are turned away, as they would be by
+  sudo's per-tty timestamp.
+- The orchestrator passes a random per-session token on the broker's stdin
+  (the startup pipe, read once); every request must carry it as "token",
+  otherwise the connection is dropped.
+- One JSON object per line in each direction:
+    request:  {"token": str, "cmd": [...], "capture": bool, "cwd": str|null,
+               "env": {..}|null, "input": str|null}
+    response: {"returncode": int, "stdout": str|null, "stderr": str|null}
+  A request of {"shutdown": true} stops the broker.
+- Each connection is served by its own thread, so callers running in parallel
+  (one connection per thread) do not wait on each other.
+- Commands run with `capture: false` inherit the broker's stdout/stderr, which
+  is the orchestrator's terminal, exactly like the previous `sudo -n` path.
+
+Lifetime
+--------
+The broker exits on a shutdown request, or when the orchestrator process
+(`--parent-pid`) disappears, so it never outlives the run.
+
+This file must stay self-contained (standard library only): it runs as root
+with root's environment, outside the orchestrator's import path.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hmac
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+from typing import Any, Dict
+
+_PEERCRED = struct.Struct("3i")  # pid, uid, gid
+
+
+def _print_error(message: str) -> None:
+    print(f"ERROR: sudo-broker: {message}", file=sys.stderr)
+
+
+def _peer(conn: socket.socket) -> tuple:
+    """(pid, uid) of the process on the other end of `conn`."""
+    raw = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEERCRED.size)
+    pid, uid, _gid = _PEERCRED.unpack(raw)
+    return pid, uid
+
+
+def _read_token() -> str:
+    """Read the session token from the startup pipe, then detach stdin (commands get /dev/null)."""
+    token = sys.stdin.readline().strip()
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, sys.stdin.fileno())
+    os.close(devnull)
+    return token
+
+
+def _execute(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one command as root and return its result as a JSON-able dict."""
+    cmd = [str(part) for part in request.get("cmd") or []]
+    if not cmd:
+        return {"returncode": 1, "stdout": None, "stderr": "sudo-broker: empty command\n"}
+
+    capture = bool(request.get("capture"))
+    try:
+        res = subprocess.run(
+            cmd,
+            check=False,
+            capture_output=capture,
+            text=True,
+            cwd=request.get("cwd"),
+            env=request.get("env"),
+            input=request.get("input"),
+        )
+        return {"returncode": res.returncode, "stdout": res.stdout, "stderr": res.stderr}
+    except FileNotFoundError:
+        # Mirror sudo's own behavior for unknown commands (exit status 1).
+        message = f"sudo-broker: {cmd[0]}: command not found\n"
+        if not capture:
+            sys.stderr.write(message)
+            sys.stderr.flush()
+        return {"returncode": 1, "stdout": None, "stderr": message if capture else None}
+    except Exception as exc:
+        message = f"sudo-broker: {cmd[0]}: {exc}\n"
+        return {"returncode": 1, "stdout": None, "stderr": message if capture else None}
+
+
+def _serve_connection(conn: socket.socket, stop_evt: threading.Event, token: str) -> None:
+    with conn, conn.makefile("rwb") as stream:
+        for line in stream:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                _print_error("dropping connection after a malformed request")
+                return
+            if not isinstance(request, dict) or not hmac.compare_digest(str(request.get("token", "")), token):
+                _print_error("dropping connection after a request without the session token")
+                return
+            if request.get("shutdown"):
+                stop_evt.set()
+                stream.write(b'{"returncode": 0, "stdout": null, "stderr": null}\n')
+                stream.flush()
+                return
+            response = _execute(request)
+            stream.write(json.dumps(response).encode("utf-8") + b"\n")
+            stream.flush()
+
+
+def _watch_parent(parent_pid: int, stop_evt: threading.Event) -> None:
+    while not stop_evt.wait(1.0):
+        try:
+            os.kill(parent_pid, 0)
+        except ProcessLookupError:
+            stop_evt.set()
+        except PermissionError:
+            pass  # Still alive (owned by someone else).
+
+
+def serve(socket_path: str, owner_uid: int, parent_pid: int, token: str) -> int:
+    """Accept connections from `parent_pid` carrying `token` until shutdown or until the parent exits."""
+    stop_evt = threading.Event()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(socket_path)
+        os.chown(socket_path, owner_uid, -1)
+        os.chmod(socket_path, 0o600)
+        server.listen()
+        server.settimeout(0.5)
+    except OSError as exc:
+        _print_error(f"cannot listen on {socket_path}: {exc}")
+        return 1
+
+    threading.Thread(target=_watch_parent, args=(parent_pid, stop_evt), daemon=True).start()
+
+    try:
+        while not stop_evt.is_set():
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            pid, uid = _peer(conn)
+            if pid != parent_pid or uid not in (owner_uid, 0):
+                _print_error(f"refusing connection from pid {pid} (uid {uid}); only pid {parent_pid} may connect")
+                conn.close()
+                continue
+            conn.settimeout(None)
+            threading.Thread(target=_serve_connection, args=(conn, stop_evt, token), daemon=True).start()
+    finally:
+        server.close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Root-side command broker for utils.sudo_session")
+    parser.add_argument("--socket", required=True, help="Unix socket path to listen on")
+    parser.add_argument("--uid", required=True, type=int, help="Uid the orchestrator runs as (or root)")
+    parser.add_argument("--parent-pid", required=True, type=int,
+                        help="The only process allowed to connect; exit when it is gone")
+    args = parser.parse_args()
+    if os.geteuid() != 0:
+        _print_error("must be started as root (via sudo)")
+        return 1
+    token = _read_token()
+    if not token:
+        _print_error("no session token on stdin")
+        return 1
+    return serve(args.socket, args.uid, args.parent_pid, token)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
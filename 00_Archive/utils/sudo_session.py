@@ -1,8 +1,8 @@
 # utils/sudo_session.py
 #!/usr/bin/env python3
 """
-Sudo Session Manager (Keep-Alive)
-Version: 2.0.0
+Sudo Session Manager (Keep-Alive + Privileged Broker)
+Version: 3.0.0
 
 What the module does
 --------------------
@@ -11,23 +11,51 @@ memory. It:
 
 1) Prompts once for your password and seeds sudo's timestamp cache (`sudo -S -v`).
 2) Starts a background thread to refresh the timestamp (`sudo -n -v`) periodically.
-3) Exposes a `run(cmd, ...)` callable that executes commands as root using `sudo -n`.
-4) Exposes a `close()` callable that stops the keep-alive and clears credentials.
+3) Starts ONE long-lived root helper (`utils/sudo_broker.py`, via `sudo -n`)
+   that executes commands on request over a private Unix socket.
+4) Exposes a `run(cmd, ...)` callable that executes commands as root through
+   the broker, falling back to one `sudo -n` per command if the broker is
+   unavailable (or disabled with SUDO_BROKER=0).
+5) Exposes a `close()` callable that stops the broker and the keep-alive and
+   clears credentials.
 
 Design notes
 ------------
 - The password is only passed to `sudo -S -v` and then discarded immediately.
 - All subsequent calls use `-n` (non-interactive). If the timestamp expires,
   commands will fail instead of blocking for a password.
+- The broker saves sudo's PAM/policy evaluation and a fork/exec per command;
+  `benchmarks/bench_sudo_broker.py` measures the per-command latency of both
+  paths. The keep-alive still runs because tools like yay call sudo themselves.
+- Each calling thread gets its own broker connection, so modules running in
+  parallel do not serialize on the broker.
+- Only this process may use the broker: it checks the connecting pid
+  (SO_PEERCRED) and a random per-session token that is handed to it on its
+  stdin at start-up and sent with every request. Other processes of the same
+  user cannot run commands through it.
 """
 
 from __future__ import annotations
 
 import atexit
 import getpass
+import json
+import os
+import secrets
+import shutil
+import socket
 import subprocess
+import sys
+import tempfile
 import threading
-from typing import Iterable, Optional
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+BROKER_SCRIPT = Path(__file__).resolve().parent / "sudo_broker.py"
+
+# How long to wait for the broker's socket to accept connections.
+BROKER_START_TIMEOUT_SEC = 10.0
 
 
 def _print_action(text: str) -> None:
@@ -72,24 +100,133 @@ def _keepalive_loop(stop_evt: threading.Event, interval: int) -> None:
         stop_evt.wait(interval)
 
 
-def start_sudo_session(keepalive_interval_sec: int = 60):
+class _BrokerNotReached(OSError):
+    """The broker could not be connected to, so the request was never sent."""
+
+
+class _BrokerClient:
+    """Unprivileged side of the broker: one socket connection per thread."""
+
+    def __init__(self, proc: subprocess.Popen, socket_dir: str, token: str) -> None:
+        self.proc = proc
+        self.token = token
+        self.socket_dir = socket_dir
+        self.socket_path = os.path.join(socket_dir, "broker.sock")
+        self._local = threading.local()
+
+    def _stream(self):
+        stream = getattr(self._local, "stream", None)
+        if stream is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+            except OSError as exc:
+                sock.close()
+                raise _BrokerNotReached(exc.errno, f"cannot connect to the broker: {exc.strerror or exc}") from exc
+            stream = sock.makefile("rwb")
+            sock.close()  # The file object keeps the underlying socket open.
+            self._local.stream = stream
+        return stream
+
+    def call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send one request and wait for its response.
+
+        Raises _BrokerNotReached if nothing was sent, OSError/ValueError if the
+        request may have reached the broker but no complete reply came back.
+        """
+        stream = self._stream()
+        try:
+            stream.write(json.dumps({**request, "token": self.token}).encode("utf-8") + b"\n")
+            stream.flush()
+            line = stream.readline()
+        except OSError:
+            self._local.stream = None
+            raise
+        if not line:
+            self._local.stream = None
+            raise OSError("broker closed the connection")
+        return json.loads(line)
+
+    def close(self) -> None:
+        try:
+            self.call({"shutdown": True})
+        except (OSError, ValueError):
+            pass
+        try:
+            self.proc.wait(timeout=3)
+        except subprocess.TimeoutExpired:
+            self.proc.terminate()
+        shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+
+def _start_broker() -> Optional[_BrokerClient]:
+    """
+    Launch the root-side broker once via `sudo -n` and wait until it accepts
+    connections. Returns None (after printing why) if it cannot be started.
+    """
+    socket_dir = tempfile.mkdtemp(prefix="sudo-broker-")  # 0700, owned by us
+    client: Optional[_BrokerClient] = None
+    try:
+        cmd = [
+            "sudo", "-n", sys.executable, str(BROKER_SCRIPT),
+            "--socket", os.path.join(socket_dir, "broker.sock"),
+            "--uid", str(os.getuid()),
+            "--parent-pid", str(os.getpid()),
+        ]
+        _print_action("sudo -n " + " ".join(cmd[2:4]) + "  # start privileged broker")
+        token = secrets.token_hex(32)
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, text=True)
+        client = _BrokerClient(proc, socket_dir, token)
+        try:
+            proc.stdin.write(token + "\n")  # only the broker ever sees it
+            proc.stdin.close()
+        except OSError:
+            pass  # the broker already exited; the loop below notices
+
+        deadline = time.monotonic() + BROKER_START_TIMEOUT_SEC
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                break
+            if os.path.exists(client.socket_path):
+                try:
+                    if client.call({"cmd": ["true"], "capture": True})["returncode"] == 0:
+                        return client
+                except (OSError, ValueError):
+                    pass  # bound but not chown'ed/listening yet; retry until the deadline
+            time.sleep(0.05)
+        print("⚠️  Privileged broker did not come up; using one `sudo -n` per command.")
+    except Exception as exc:
+        print(f"⚠️  Could not start privileged broker ({exc}); using one `sudo -n` per command.")
+
+    if client is not None:
+        client.close()
+    else:
+        shutil.rmtree(socket_dir, ignore_errors=True)
+    return None
+
+
+def start_sudo_session(keepalive_interval_sec: int = 60, *, use_broker: Optional[bool] = None):
     """
     Start a sudo session that never stores the password in memory.
 
     Arguments:
         keepalive_interval_sec:
             Seconds between timestamp refreshes. Minimum enforced to 10 seconds.
+        use_broker:
+            Start the persistent root broker (default: True unless SUDO_BROKER=0).
 
     Returns:
         (run, close) where:
 
         - run(cmd, *, check=True, capture_output=False, cwd=None, env=None, input_text=None)
             -> subprocess.CompletedProcess
-          Executes `sudo -n <cmd...>` so it never prompts. If the sudo timestamp
-          is invalid, the command will fail quickly (non-zero return code).
+          Executes <cmd...> as root through the broker (or `sudo -n <cmd...>`
+          as a fallback) so it never prompts. If the sudo timestamp is invalid,
+          the command will fail quickly (non-zero return code).
 
         - close() -> None
-          Stops keep-alive and clears sudo credentials (`sudo -K`).
+          Stops the broker and keep-alive and clears sudo credentials (`sudo -K`).
 
     Behavior:
         - Prints shell-style actions for visibility.
@@ -98,6 +235,10 @@ def start_sudo_session(keepalive_interval_sec: int = 60):
         # We still return a run/close pair, but `run` will fail if sudo is unusable.
         print("⚠️  Continuing without a valid sudo timestamp. Commands may fail (-n).")
 
+    if use_broker is None:
+        use_broker = os.environ.get("SUDO_BROKER", "1") not in ("0", "false", "False", "no", "No")
+    broker = _start_broker() if use_broker else None
+
     stop_evt = threading.Event()
     interval = max(10, int(keepalive_interval_sec))
     _print_action(f"(keepalive) sudo -n -v every {interval}s")
@@ -110,8 +251,13 @@ def start_sudo_session(keepalive_interval_sec: int = 60):
     t.start()
 
     def close() -> None:
-        """Stop keep-alive thread and clear sudo credentials."""
+        """Stop the broker and keep-alive thread, then clear sudo credentials."""
+        nonlocal broker
         try:
+            if broker is not None:
+                _print_action("(broker) shutdown")
+                broker.close()
+                broker = None
             if not stop_evt.is_set():
                 stop_evt.set()
                 t.join(timeout=2)
@@ -146,11 +292,46 @@ def start_sudo_session(keepalive_interval_sec: int = 60):
             subprocess.CompletedProcess with `returncode`, `stdout`, and `stderr`.
 
         Notes:
-            - Uses `sudo -n` to ensure no interactive prompts occur.
+            - Goes through the persistent broker when it is running; otherwise
+              uses `sudo -n` to ensure no interactive prompts occur.
+            - Falls back to `sudo -n` only if the broker could not be reached;
+              a request lost after it was sent returns code 1 instead of
+              possibly running the command twice.
             - If the sudo timestamp is invalid, return code will be non-zero.
         """
+        cmd = [str(part) for part in cmd]
+        _print_action("sudo -n " + " ".join(cmd))
+        if broker is not None:
+            try:
+                reply = broker.call({
+                    "cmd": cmd,
+                    "capture": capture_output,
+                    "cwd": cwd,
+                    "env": env,
+                    "input": input_text,
+                })
+            except _BrokerNotReached as exc:
+                print(f"⚠️  Broker unreachable ({exc}); falling back to sudo -n.")
+            except (OSError, ValueError) as exc:
+                # The command may already have run as root: do not run it a second time.
+                print(f"ERROR: Broker request for `{' '.join(cmd)}` failed after it was sent ({exc}).",
+                      file=sys.stderr)
+                result = subprocess.CompletedProcess(
+                    cmd, 1, stdout="" if capture_output else None,
+                    stderr=f"broker request failed: {exc}" if capture_output else None,
+                )
+                if check:
+                    result.check_returncode()
+                return result
+            else:
+                result = subprocess.CompletedProcess(
+                    cmd, reply["returncode"], stdout=reply.get("stdout"), stderr=reply.get("stderr"),
+                )
+                if check:
+                    result.check_returncode()
+                return result
+
         try:
-            _print_action("sudo -n " + " ".join(cmd))
             return subprocess.run(
                 ["sudo", "-n", *cmd],
                 check=check,
@@ -2,11 +2,11 @@
 #!/usr/bin/env python3
 """
 Symlink utility that can use your sudo session runner for privileged paths.
-Version: 2.0.0
+Version: 3.1.0
 
 What the module does
 --------------------
-Provides two high-level helpers for creating symlinks safely:
+Provides high-level helpers for creating symlinks safely:
 
 1) symlink_directory(source_dir, link_path, *, run=None, use_relative=False)
    - Creates ONE symlink that points to an entire directory.
@@ -15,48 +15,77 @@ Provides two high-level helpers for creating symlinks safely:
    - Mirrors a directory tree by creating real directories in the destination,
      and placing symlinks for files inside those directories.
 
+3) symlink_many(pairs, *, run=None, use_relative=False)
+   - Creates many individual (source, link_path) symlinks in one batch.
+
+Plan, then apply
+----------------
+All helpers first walk the source once and stat each destination once, which
+yields an explicit operation list (`plan_links()`):
+
+    ("mkdir", dir) / ("backup", path, backup_path) / ("remove", path) /
+    ("link", target, link) / ("skip", link, reason)
+
+`apply_plan()` then makes every change in ONE step and prints a compact
+per-call summary (e.g. "2 created, 38 unchanged, 1 replaced (1 backed up),
+0 dir(s) created") instead of one `$ ln -s` line per file.
+`count_ops()` returns the same numbers as a dict.
+
 Sudo-session compatibility
 --------------------------
-If you pass `run` (from `start_sudo_session()`), *all filesystem actions that
-need privileges* are performed via shell commands executed by that runner
-(e.g., `mkdir -p`, `mv`, `ln -s`).  
-If `run` is omitted, the module uses Python's `os`/`shutil` APIs and will require
-the current process to have sufficient permissions.
+If you pass `run` (from `start_sudo_session()`), the operation list is
+rendered as a single POSIX shell script and executed by one privileged
+`sh -s` process, instead of separate `mkdir -p` / `mv` / `ln -s` commands per
+file. If `run` is omitted, the module uses Python's `os`/`shutil` APIs and
+will require the current process to have sufficient permissions.
 
 Key behavior
 ------------
 - Per-run backups:
   Existing destinations are moved to:
     <this_module_dir>/backup/<YYYYmmdd-HH%M%S>/<original/absolute/path/without/leading/slash>
-- Idempotent by design: destinations are backed up then recreated consistently.
+- Idempotent fast path: a link that already points at the computed target
+  (compared with `os.readlink`) is left alone, so re-runs neither touch the
+  disk nor grow the backup directory.
+- A regular file whose content equals its source is replaced by the link
+  without a backup (the source already holds the same bytes).
+- Anything else at the destination is backed up, then replaced.
+- A failing operation does not stop the others; the helper returns False.
 - Clear printed actions; robust error handling with True/False returns.
 
 Example
 -------
 from utils.sudo_session import start_sudo_session
-from utils.symlinker import symlink_directory, symlink_tree_files
+from utils.symlinker import symlink_directory, symlink_many, symlink_tree_files
 
 run, close = start_sudo_session()
 try:
     symlink_directory("/opt/myrepo/app", "/etc/myapp", run=run)
     symlink_tree_files("/opt/myrepo/config", "/etc/myapp", run=run)
+    symlink_many([("/opt/myrepo/a.conf", "/etc/a.conf"), ("/opt/myrepo/b.conf", "/etc/b.conf")], run=run)
 finally:
     close()
 """
 
 from __future__ import annotations
 
+import filecmp
 import os
+import shlex
 import sys
 import shutil
 from pathlib import Path
 from datetime import datetime
-from typing import Callable, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 
 # Timestamp used to group all backups for one execution.
 RUN_TIMESTAMP = datetime.now().strftime("%Y%m%d-%H%M%S")
 
+# One planned operation: ("mkdir", dir) | ("backup", path, backup_path) |
+# ("remove", path) | ("link", target, link) | ("skip", link, reason)
+Op = Tuple[str, ...]
+
 
 # ------------------------------ Printing helpers ------------------------------
 
@@ -75,98 +104,13 @@ def _script_dir() -> Path:
     return Path(__file__).resolve().parent
 
 
-# ------------------------------ Runner helpers ------------------------------
-
-def _run_or_os(run: Optional[Callable], cmd: list[str]) -> Tuple[bool, Optional[str], Optional[str]]:
-    """
-    Execute a command either through the provided sudo-session runner or via subprocess.
-
-    Returns:
-        (ok, stdout_or_none, stderr_or_none)
-    """
-    try:
-        if run is None:
-            # No sudo runner provided -> use subprocess directly.
-            import subprocess
-            res = subprocess.run(cmd, check=False, text=True, capture_output=True)
-            return (res.returncode == 0, res.stdout, res.stderr)
-        else:
-            # Use provided sudo runner (already wraps command with 'sudo -n').
-            res = run(cmd, check=False, capture_output=True)
-            return (res.returncode == 0, res.stdout, res.stderr)
-    except Exception as exc:
-        return (False, None, str(exc))
-
-
-def _ensure_dir_exists(path: Path, *, run: Optional[Callable]) -> bool:
-    try:
-        if path.exists():
-            if path.is_dir():
-                return True
-            _print_error(f"Path exists but is not a directory: {path}")
-            return False
-        _print_action(f"mkdir -p {path}")
-        if run is None:
-            path.mkdir(parents=True, exist_ok=True)
-        else:
-            ok, out, err = _run_or_os(run, ["mkdir", "-p", str(path)])
-            if not ok:
-                if out: print(out.rstrip())
-                if err: _print_error(err.rstrip())
-                return False
-        return True
-    except Exception as exc:
-        _print_error(f"Failed to create directory '{path}': {exc}")
-        return False
+# ------------------------------ Path helpers ------------------------------
 
 def _backup_root_dir() -> Path:
     """Compute backup root folder for this run."""
     return _script_dir() / "backup" / RUN_TIMESTAMP
 
 
-def _backup_existing_path(target: Path, *, run: Optional[Callable]) -> bool:
-    """
-    Move an existing path (file/dir/symlink) into the per-run backup directory.
-    Returns True if moved (or nothing to move), False on failure.
-    """
-    try:
-        if not target.exists() and not target.is_symlink():
-            return True  # Nothing to back up.
-
-        backup_root = _backup_root_dir()
-        backup_dest = backup_root / Path(str(target).lstrip(os.sep))
-
-        if not _ensure_dir_exists(backup_dest.parent, run=run):
-            return False
-
-        _print_action(f"mv {target} {backup_dest}")
-        if run is None:
-            # Use shutil.move to handle files/dirs/symlinks.
-            backup_root.mkdir(parents=True, exist_ok=True)
-            shutil.move(str(target), str(backup_dest))
-        else:
-            # Ensure backup root exists via runner too.
-            ok, out, err = _run_or_os(run, ["mkdir", "-p", str(backup_dest.parent)])
-            if not ok:
-                if out:
-                    print(out.rstrip())
-                if err:
-                    _print_error(err.rstrip())
-                return False
-            ok, out, err = _run_or_os(run, ["mv", str(target), str(backup_dest)])
-            if not ok:
-                if out:
-                    print(out.rstrip())
-                if err:
-                    _print_error(err.rstrip())
-                return False
-
-        return True
-    except Exception as exc:
-        _print_error(f"Failed to back up '{target}': {exc}")
-        return False
-
-
 def _compute_symlink_target(source: Path, link: Path, use_relative: bool) -> str:
     """Compute absolute/relative path to store in the symlink."""
     if use_relative:
@@ -174,42 +118,200 @@ def _compute_symlink_target(source: Path, link: Path, use_relative: bool) -> str
     return str(source.resolve())
 
 
-def _create_symlink(source: Path, link: Path, *, run: Optional[Callable], use_relative: bool) -> bool:
-    """Create the symlink (backing up an existing path first)."""
+def _same_content(source: Path, dest: Path) -> bool:
+    """True if `dest` is a regular file (not a link) with exactly the bytes of `source`."""
     try:
-        if not source.exists() and not source.is_symlink():
-            _print_error(f"Source does not exist: {source}")
+        if dest.is_symlink() or not dest.is_file() or not source.is_file():
             return False
+        return filecmp.cmp(source, dest, shallow=False)
+    except OSError:
+        return False  # unreadable: keep a backup to be safe
 
-        if not _ensure_dir_exists(link.parent, run=run):
+
+# ------------------------------ Planner ------------------------------
+
+def _plan(
+    pairs: List[Tuple[Path, Path]],
+    dirs: List[Path],
+    use_relative: bool,
+) -> Tuple[List[Op], bool]:
+    """
+    Stat every destination once and turn (source, link) pairs plus the
+    directories to mirror into an explicit operation list.
+
+    Returns:
+        (ops, ok) where ok is False if some entry could not be planned.
+    """
+    ops: List[Op] = []
+    ok = True
+    known_dirs: Dict[Path, bool] = {}  # path -> usable as a directory
+
+    def ensure_dir(path: Path) -> bool:
+        if path in known_dirs:
+            return known_dirs[path]
+        if path.parent != path and not ensure_dir(path.parent):
+            known_dirs[path] = False
             return False
+        if path.is_dir():
+            usable = True
+        elif path.exists() or path.is_symlink():
+            _print_error(f"Path exists but is not a directory: {path}")
+            usable = False
+        else:
+            ops.append(("mkdir", str(path)))
+            usable = True
+        known_dirs[path] = usable
+        return usable
 
-        # Backup existing destination, if present.
-        if link.exists() or link.is_symlink():
-            if not _backup_existing_path(link, run=run):
-                return False
+    for directory in dirs:
+        if not ensure_dir(directory):
+            ok = False
 
+    for source, link in pairs:
+        if not source.exists() and not source.is_symlink():
+            _print_error(f"Source does not exist: {source}")
+            ops.append(("skip", str(link), "source missing"))
+            ok = False
+            continue
+        if not ensure_dir(link.parent):
+            ops.append(("skip", str(link), "parent is not a directory"))
+            ok = False
+            continue
         target = _compute_symlink_target(source, link, use_relative)
-        _print_action(f"ln -s {target} {link}")
+        if link.is_symlink():
+            try:
+                if os.readlink(link) == target:
+                    ops.append(("skip", str(link), "unchanged"))
+                    continue
+            except OSError:
+                pass
+        if _same_content(source, link):
+            ops.append(("remove", str(link)))
+        elif link.exists() or link.is_symlink():
+            backup_dest = _backup_root_dir() / Path(str(link).lstrip(os.sep))
+            ops.append(("backup", str(link), str(backup_dest)))
+        ops.append(("link", target, str(link)))
 
-        if run is None:
-            os.symlink(target, str(link))
-        else:
-            ok, out, err = _run_or_os(run, ["ln", "-s", target, str(link)])
-            if not ok:
-                if out:
-                    print(out.rstrip())
-                if err:
-                    _print_error(err.rstrip())
-                return False
+    return ops, ok
+
+
+def count_ops(ops: List[Op]) -> Dict[str, int]:
+    """
+    Summarize an operation list.
+
+    Returns:
+        {"created", "unchanged", "replaced", "backed_up", "dirs", "failed"} counts.
+    """
+    kinds: Dict[str, int] = {}
+    for op in ops:
+        kinds[op[0]] = kinds.get(op[0], 0) + 1
+    unchanged = sum(1 for op in ops if op[0] == "skip" and op[2] == "unchanged")
+    replaced = kinds.get("backup", 0) + kinds.get("remove", 0)
+    return {
+        "created": kinds.get("link", 0) - replaced,
+        "unchanged": unchanged,
+        "replaced": replaced,
+        "backed_up": kinds.get("backup", 0),
+        "dirs": kinds.get("mkdir", 0),
+        "failed": kinds.get("skip", 0) - unchanged,
+    }
+
+
+def _summary(ops: List[Op]) -> str:
+    c = count_ops(ops)
+    text = (f"{c['created']} created, {c['unchanged']} unchanged, {c['replaced']} replaced "
+            f"({c['backed_up']} backed up), {c['dirs']} dir(s) created")
+    return text + (f", {c['failed']} failed" if c["failed"] else "")
+
+
+def _script(ops: List[Op]) -> str:
+    """Render the operation list as one POSIX sh script that keeps going on errors."""
+    lines = ["rc=0", 'fail() { echo "failed: $*" >&2; rc=1; }']
+    for op in ops:
+        kind, args = op[0], [shlex.quote(a) for a in op[1:]]
+        if kind == "mkdir":
+            lines.append(f"mkdir -p -- {args[0]} || fail mkdir {args[0]}")
+        elif kind == "backup":
+            parent = shlex.quote(os.path.dirname(op[2]))
+            lines.append(f"{{ mkdir -p -- {parent} && mv -- {args[0]} {args[1]}; }} || fail mv {args[0]}")
+        elif kind == "remove":
+            lines.append(f"rm -f -- {args[0]} || fail rm {args[0]}")
+        elif kind == "link":
+            lines.append(f"ln -s -- {args[0]} {args[1]} || fail ln {args[1]}")
+    lines.append("exit $rc")
+    return "\n".join(lines) + "\n"
+
+
+def _apply_in_process(ops: List[Op]) -> bool:
+    ok = True
+    for op in ops:
+        kind = op[0]
+        try:
+            if kind == "mkdir":
+                os.makedirs(op[1], exist_ok=True)
+            elif kind == "backup":
+                os.makedirs(os.path.dirname(op[2]), exist_ok=True)
+                shutil.move(op[1], op[2])
+            elif kind == "remove":
+                os.unlink(op[1])
+            elif kind == "link":
+                os.symlink(op[1], op[2])
+        except OSError as exc:
+            _print_error(f"{kind} {op[-1]}: {exc}")
+            ok = False
+    return ok
+
+
+def apply_plan(ops: List[Op], *, run: Optional[Callable] = None) -> bool:
+    """
+    Apply an operation list from `plan_links()`.
+
+    With `run`, every change is made by ONE privileged `sh -s` process; without
+    it, Python's filesystem APIs are used in-process. A compact summary replaces
+    the per-file command lines.
 
+    Returns:
+        True if every operation succeeded.
+    """
+    work = [op for op in ops if op[0] != "skip"]
+    if not work:
+        _print_action(f"# symlinks: nothing to change ({_summary(ops)})")
         return True
-    except FileExistsError:
-        _print_error(f"Destination already exists and could not be replaced: {link}")
-        return False
+
+    if run is None:
+        _print_action(f"# symlinks: {_summary(ops)}")
+        return _apply_in_process(work)
+
+    _print_action(f"sh -s  # symlinks: {_summary(ops)}")
+    try:
+        res = run(["sh", "-s"], check=False, capture_output=True, input_text=_script(work))
     except Exception as exc:
-        _print_error(f"Failed to create symlink '{link}': {exc}")
+        _print_error(f"Failed to apply symlink batch: {exc}")
         return False
+    if res.returncode != 0:
+        if res.stdout:
+            print(res.stdout.rstrip())
+        if res.stderr:
+            _print_error(res.stderr.rstrip())
+        return False
+    return True
+
+
+def plan_links(
+    pairs: Iterable[Tuple[Path | str, Path | str]],
+    *,
+    use_relative: bool = False,
+) -> Tuple[List[Op], bool]:
+    """
+    Compute the operations needed to make each link point at its source.
+
+    Returns:
+        (ops, ok): ops is a list of ("mkdir", dir) / ("backup", path, backup_path) /
+        ("remove", path) / ("link", target, link) / ("skip", link, reason) tuples
+        (reason "unchanged" for links that are already correct); ok is False if
+        some pair could not be planned (missing source, blocked parent).
+    """
+    return _plan([(Path(s), Path(d)) for s, d in pairs], [], use_relative)
 
 
 # ------------------------------ Public API ------------------------------
@@ -248,7 +350,7 @@ def symlink_directory(
         _print_error(f"Source path exists but is not a directory: {src}")
         return False
 
-    return _create_symlink(src, dst, run=run, use_relative=use_relative)
+    return symlink_many([(src, dst)], run=run, use_relative=use_relative)
 
 
 def symlink_tree_files(
@@ -284,35 +386,48 @@ def symlink_tree_files(
             _print_error(f"Source directory does not exist or is not a directory: {src_root}")
             return False
 
-        if not _ensure_dir_exists(dst_root, run=run):
-            return False
-
-        overall_ok = True
-
+        # Walk the source once; the planner stats each destination once.
+        dirs: List[Path] = []
+        pairs: List[Tuple[Path, Path]] = []
         for root, _dirs, files in os.walk(src_root):
             root_path = Path(root)
-            relative = root_path.relative_to(src_root)
-            mirrored_dir = dst_root / relative
+            mirrored_dir = dst_root / root_path.relative_to(src_root)
+            dirs.append(mirrored_dir)
+            pairs.extend((root_path / filename, mirrored_dir / filename) for filename in files)
 
-            if not _ensure_dir_exists(mirrored_dir, run=run):
-                overall_ok = False
-                continue
+        ops, planned_ok = _plan(pairs, dirs, use_relative)
+        return apply_plan(ops, run=run) and planned_ok
+    except Exception as exc:
+        _print_error(f"Unexpected error while mirroring symlinks: {exc}")
+        return False
 
-            for filename in files:
-                src_file = root_path / filename
-                dst_link = mirrored_dir / filename
 
-                if not src_file.exists() and not src_file.is_symlink():
-                    _print_error(f"Source file missing, skipping: {src_file}")
-                    overall_ok = False
-                    continue
+def symlink_many(
+    pairs: Iterable[Tuple[Path | str, Path | str]],
+    *,
+    run: Optional[Callable] = None,
+    use_relative: bool = False
+) -> bool:
+    """
+    Create many individual symlinks in one batch.
 
-                if not _create_symlink(src_file, dst_link, run=run, use_relative=use_relative):
-                    overall_ok = False
+    Arguments:
+        pairs:
+            (source, link_path) pairs; links that are already correct are left alone.
+        run:
+            Optional sudo-session runner; all changes are applied by one
+            privileged process. If omitted, Python's filesystem APIs are used.
+        use_relative:
+            If True, create relative symlinks; otherwise absolute.
 
-        return overall_ok
+    Returns:
+        True if every link was created, False if ANY pair failed.
+    """
+    try:
+        ops, planned_ok = plan_links(pairs, use_relative=use_relative)
+        return apply_plan(ops, run=run) and planned_ok
     except Exception as exc:
-        _print_error(f"Unexpected error while mirroring symlinks: {exc}")
+        _print_error(f"Unexpected error while creating symlinks: {exc}")
         return False
 
 
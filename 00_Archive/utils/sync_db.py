@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Conditional system upgrade: skip `pacman -Syu` when the sync databases are unchanged
+Version: 1.1.0
+
+What the module does
+--------------------
+`pacman -Syu` re-downloads every repository database and walks the whole
+installed set, even when nothing upstream changed since the last run minutes
+ago. If none of the repository databases changed since the last successful
+upgrade, there is nothing to upgrade, so this helper asks the mirror first:
+
+1) The repositories and their first server are read from /etc/pacman.conf
+   (a `Server =` line in the section, else the first one in its `Include`d
+   mirrorlist); `$repo` and `$arch` are filled in.
+2) Each `<repo>.db` gets a HEAD request carrying the validators recorded after
+   the last successful upgrade (`If-None-Match` with the ETag,
+   `If-Modified-Since` with the Last-Modified date). 304 means unchanged; for
+   servers that ignore conditional headers, equal ETag/Last-Modified values
+   count as unchanged too.
+3) If every database is unchanged and the server is the same one, the upgrade
+   is skipped. Otherwise `pacman -Syu --noconfirm` runs, and on success the
+   validators fetched in step 2 are recorded (state key "pacman.last_upgrade").
+
+The loader's fingerprint skip asks the same question: 000_core's `probe()`
+calls `databases_unchanged()`, so a changed upstream database makes the
+module (and its upgrade) run even when nothing else changed.
+
+A failed upgrade drops the record, so the next run (and probe) upgrades again.
+
+Validators are taken before the upgrade, so a database that changes in
+between only causes one extra upgrade on the next run, never a missed one.
+Any doubt (no record, no answer, a new repository or server, a force flag)
+means a full upgrade.
+
+Configuration
+-------------
+`pacman_conf=` points at another pacman.conf (e.g. one whose servers are a
+local HTTP server serving a fake repo). `arch=` overrides the architecture.
+
+Public API
+----------
+repo_servers(pacman_conf=PACMAN_CONF, arch=None) -> dict[str, str]
+check_databases(servers, record) -> (unchanged: bool, validators: dict, reason: str)
+databases_unchanged(pacman_conf=PACMAN_CONF) -> (unchanged: bool, reason: str)
+conditional_upgrade(run, force=False, pacman_conf=PACMAN_CONF) -> bool
+"""
+
+from __future__ import annotations
+
+import platform
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils import mirrors, run_report, state_store
+
+PACMAN_CONF = Path("/etc/pacman.conf")
+STATE_KEY = "pacman.last_upgrade"
+HEAD_TIMEOUT_SEC = 10.0
+
+_SECTION_RE = re.compile(r"^\s*\[([^\]]+)\]\s*$")
+_KEY_RE = re.compile(r"^\s*(Server|Include|Architecture)\s*=\s*(\S+)")
+
+
+def _print_action(text: str) -> None:
+    print(f"$ {text}")
+
+
+def _print_error(message: str) -> None:
+    """Print a clear error message to stderr so it stands out in logs."""
+    print(f"ERROR: {message}", file=sys.stderr)
+
+
+def repo_servers(pacman_conf: Path = PACMAN_CONF, arch: Optional[str] = None) -> Dict[str, str]:
+    """
+    Return {repo: URL of <repo>.db on its first server} for every repository in pacman.conf.
+
+    Repositories without a usable server are left out.
+    """
+    try:
+        lines = Path(pacman_conf).read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError as exc:
+        _print_error(f"Could not read {pacman_conf}: {exc}")
+        return {}
+
+    conf_arch = None
+    sections: Dict[str, Dict[str, list]] = {}
+    current = None
+    for line in lines:
+        line = line.split("#", 1)[0]
+        section = _SECTION_RE.match(line)
+        if section:
+            current = section.group(1)
+            continue
+        key = _KEY_RE.match(line)
+        if not key or current is None:
+            continue
+        if current == "options":
+            if key.group(1) == "Architecture":
+                conf_arch = key.group(2)
+        else:
+            sections.setdefault(current, {"Server": [], "Include": []}).setdefault(key.group(1), []).append(key.group(2))
+
+    if arch is None:
+        arch = conf_arch if conf_arch and conf_arch != "auto" else platform.machine()
+    urls: Dict[str, str] = {}
+    for repo, keys in sections.items():
+        servers = list(keys.get("Server", []))
+        for include in keys.get("Include", []):
+            servers += mirrors.read_servers(Path(include))
+        if servers:
+            base = servers[0].replace("$repo", repo).replace("$arch", arch)
+            urls[repo] = f"{base.rstrip('/')}/{repo}.db"
+    return urls
+
+
+def _head(url: str, validators: Dict[str, str]) -> Tuple[int, Dict[str, str]]:
+    """HEAD `url` with conditional headers; returns (status, {"etag", "last_modified"})."""
+    request = urllib.request.Request(url, method="HEAD")
+    if validators.get("etag"):
+        request.add_header("If-None-Match", validators["etag"])
+    if validators.get("last_modified"):
+        request.add_header("If-Modified-Since", validators["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=HEAD_TIMEOUT_SEC) as resp:
+            status, headers = resp.status, resp.headers
+    except urllib.error.HTTPError as exc:
+        if exc.code != 304:
+            raise
+        status, headers = 304, exc.headers
+    fresh = {"etag": headers.get("ETag") or "", "last_modified": headers.get("Last-Modified") or ""}
+    if status == 304:
+        # A 304 may omit the validators; keep the ones that matched
+        fresh = {key: fresh[key] or validators.get(key, "") for key in fresh}
+    return status, fresh
+
+
+def check_databases(
+    servers: Dict[str, str],
+    record: Optional[Dict[str, Any]],
+) -> Tuple[bool, Dict[str, Dict[str, str]], str]:
+    """
+    Ask the server whether any repository database changed since `record`.
+
+    Returns:
+        (unchanged, {url: validators} to record after an upgrade, reason)
+    """
+    known = (record or {}).get("databases", {})
+    validators: Dict[str, Dict[str, str]] = {}
+    changed = []
+
+    def check(url: str) -> Tuple[str, Optional[Tuple[int, Dict[str, str]]], str]:
+        try:
+            return url, _head(url, known.get(url, {})), ""
+        except (OSError, urllib.error.URLError, ValueError) as exc:
+            return url, None, str(getattr(exc, "reason", exc))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(servers)))) as pool:
+        results = list(pool.map(check, servers.values()))
+
+    for url, answer, error in results:
+        if answer is None:
+            return False, {}, f"could not check {url}: {error}"
+        status, fresh = answer
+        validators[url] = fresh
+        old = known.get(url)
+        same = status == 304 or (old is not None and any(fresh[k] and fresh[k] == old.get(k) for k in fresh))
+        if not same:
+            changed.append(url.rsplit("/", 1)[-1])
+
+    if not record:
+        return False, validators, "no record of a previous upgrade"
+    if not servers:
+        return False, validators, "no repositories found in pacman.conf"
+    if set(servers.values()) != set(known):
+        return False, validators, "repositories or server changed since the last upgrade"
+    if changed:
+        return False, validators, f"changed upstream: {', '.join(changed)}"
+    return True, validators, "all sync databases unchanged since the last upgrade"
+
+
+def databases_unchanged(pacman_conf: Path = PACMAN_CONF) -> Tuple[bool, str]:
+    """Check every sync database against the last successful upgrade (HEAD requests only)."""
+    unchanged, _, reason = check_databases(repo_servers(pacman_conf), state_store.get_value(STATE_KEY, None))
+    return unchanged, reason
+
+
+def conditional_upgrade(run: Callable, force: bool = False, pacman_conf: Path = PACMAN_CONF) -> bool:
+    """
+    Run `pacman -Syu --noconfirm` unless the sync databases are unchanged since the last one.
+
+    Returns:
+        True if the system is up to date (upgraded or skipped), False if the upgrade failed.
+    """
+    record = state_store.get_value(STATE_KEY, None)
+    started = time.monotonic()
+    servers = repo_servers(pacman_conf)
+    unchanged, validators, reason = check_databases(servers, record)
+    check_sec = time.monotonic() - started
+
+    if unchanged and not force:
+        when = datetime.fromtimestamp(record["at"]).strftime("%Y-%m-%d %H:%M")
+        _print_action(f"# pacman -Syu skipped: {reason} ({when}); checked in {check_sec:.2f}s")
+        run_report.add("System upgrade", f"skipped, {reason} (checked {len(servers)} database(s) "
+                                         f"in {check_sec:.2f}s; last upgrade {when})")
+        return True
+
+    _print_action("pacman -Syu --noconfirm" + ("  # forced" if force else f"  # {reason}"))
+    started = time.monotonic()
+    res = run(["pacman", "-Syu", "--noconfirm"], check=False)  # streamed
+    elapsed = time.monotonic() - started
+    if res.returncode != 0:
+        state_store.set_value(STATE_KEY, None)  # unknown state: the next check asks for a full upgrade
+        run_report.add("System upgrade", f"pacman -Syu failed after {elapsed:.1f}s")
+        return False
+    if validators and len(validators) == len(servers):
+        state_store.set_value(STATE_KEY, {"at": time.time(), "databases": validators})
+    run_report.add("System upgrade", f"ran in {elapsed:.1f}s ({'forced' if force else reason})")
+    return True
+
+
+if __name__ == "__main__":
+    # Demonstration: show what the next run would do (HEAD requests only; no root, no upgrade).
+    conf = Path(sys.argv[1]) if len(sys.argv) > 1 else PACMAN_CONF
+    found = repo_servers(conf)
+    for name, db_url in found.items():
+        print(f"{name:<10} {db_url}")
+    ok, _, why = check_databases(found, state_store.get_value(STATE_KEY, None))
+    print("next run:", "skip -Syu" if ok else "run -Syu", f"({why})")
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Deferred, coalesced follow-up commands (udev, sysctl, journald, grub, fonts, systemd)
+Version: 1.0.0
+
+What the module does
+--------------------
+Some follow-up commands are expensive and only needed when a config file
+actually changed: `udevadm trigger` replays events for every device,
+`grub-mkconfig` probes every disk, `fc-cache` rescans every font. Modules
+used to run them inline, every time, sometimes several times per run.
+
+Modules now *notify* a named trigger instead, passing whether something
+changed (e.g. the flag from `utils.files.deploy_file`):
+
+    ok, changed = deploy_file(SYSCTL_FILE, SYSCTL_CONTENT, run)
+    triggers.notify("sysctl", changed)
+    triggers.notify("udev", changed, scope="pci")   # udevadm trigger --subsystem-match=pci
+
+The loader calls `run_pending(run)` once after the last module: every trigger
+that was notified with a change runs exactly once, in a fixed order
+(daemon-reload first, grub last). Notifications without a change are only
+counted.
+
+Pending triggers are also saved in the state store (key "triggers.pending")
+as soon as they are notified, and only cleared once they ran successfully.
+A run that is interrupted, or a trigger that fails, is therefore retried on
+the next run, even though the config file no longer looks changed.
+
+Built-in triggers
+-----------------
+daemon-reload  systemctl daemon-reload
+udev           udevadm control --reload + udevadm trigger, limited to the
+               notified subsystems (--subsystem-match) unless a notification
+               had no scope
+sysctl         sysctl --system
+journald       systemctl restart systemd-journald
+fc-cache       fc-cache -f
+grub           grub-mkconfig -o /boot/grub/grub.cfg (skipped without grub-mkconfig)
+
+`register(name, handler)` adds more: handler(run, scopes) -> bool.
+
+Report
+------
+The run summary lists each trigger that ran (with its udev subsystems) and
+how long it took, plus how many notifications needed nothing.
+
+Public API
+----------
+notify(name: str, changed: bool = True, scope: str | None = None) -> None
+register(name: str, handler: Callable[[Callable, set[str]], bool]) -> None
+run_pending(run: Callable) -> bool
+pending() -> dict[str, list[str]]
+"""
+
+from __future__ import annotations
+
+import shutil
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+from utils import run_report, state_store
+
+STATE_KEY = "triggers.pending"
+GRUB_CFG = "/boot/grub/grub.cfg"
+
+# Scope value meaning "everything" (a notification without a scope)
+_ALL = "*"
+
+_LOCK = threading.Lock()
+# name -> scopes, for triggers notified with a change
+_PENDING: Dict[str, Set[str]] = {}
+_STATS = {"unchanged": 0}
+
+
+def _print_action(text: str) -> None:
+    print(f"$ {text}")
+
+
+def _print_error(message: str) -> None:
+    """Print a clear error message to stderr so it stands out in logs."""
+    print(f"ERROR: {message}", file=sys.stderr)
+
+
+def _run_ok(run: Callable, cmd: List[str]) -> bool:
+    _print_action(" ".join(cmd))
+    res = run(cmd, check=False, capture_output=True)
+    if res.returncode != 0:
+        _print_error(f"{' '.join(cmd)} failed: {(res.stderr or res.stdout or '').strip()}")
+    return res.returncode == 0
+
+
+# -------------------------------
+# Built-in handlers
+# -------------------------------
+
+def _daemon_reload(run: Callable, scopes: Set[str]) -> bool:
+    return _run_ok(run, ["systemctl", "daemon-reload"])
+
+
+def _udev(run: Callable, scopes: Set[str]) -> bool:
+    if not _run_ok(run, ["udevadm", "control", "--reload"]):
+        return False
+    cmd = ["udevadm", "trigger"]
+    if _ALL not in scopes:
+        cmd += [f"--subsystem-match={subsystem}" for subsystem in sorted(scopes)]
+    return _run_ok(run, cmd)
+
+
+def _sysctl(run: Callable, scopes: Set[str]) -> bool:
+    return _run_ok(run, ["sysctl", "--system"])
+
+
+def _journald(run: Callable, scopes: Set[str]) -> bool:
+    return _run_ok(run, ["systemctl", "restart", "systemd-journald"])
+
+
+def _fc_cache(run: Callable, scopes: Set[str]) -> bool:
+    return _run_ok(run, ["fc-cache", "-f"])
+
+
+def _grub(run: Callable, scopes: Set[str]) -> bool:
+    if shutil.which("grub-mkconfig") is None:
+        _print_action("# grub-mkconfig not installed; grub trigger skipped")
+        return True
+    return _run_ok(run, ["grub-mkconfig", "-o", GRUB_CFG])
+
+
+# Run order: unit files before services restart, the slow bootloader config last.
+_HANDLERS: Dict[str, Callable[[Callable, Set[str]], bool]] = {
+    "daemon-reload": _daemon_reload,
+    "udev": _udev,
+    "sysctl": _sysctl,
+    "journald": _journald,
+    "fc-cache": _fc_cache,
+    "grub": _grub,
+}
+
+
+def register(name: str, handler: Callable[[Callable, Set[str]], bool]) -> None:
+    """Add (or replace) a named trigger; new ones run after the built-ins."""
+    with _LOCK:
+        _HANDLERS[name] = handler
+
+
+# -------------------------------
+# Notify / run
+# -------------------------------
+
+def _saved() -> Dict[str, Set[str]]:
+    stored = state_store.get_value(STATE_KEY, None) or {}
+    return {name: set(scopes) for name, scopes in stored.items()}
+
+
+def _save(pending_triggers: Dict[str, Set[str]]) -> None:
+    state_store.set_value(STATE_KEY, {name: sorted(scopes) for name, scopes in pending_triggers.items()})
+
+
+def notify(name: str, changed: bool = True, scope: Optional[str] = None) -> None:
+    """Ask for trigger `name` to run at the end of the run, if `changed`; `scope` narrows it (udev subsystem)."""
+    if name not in _HANDLERS:
+        raise ValueError(f"Unknown trigger: {name}")
+    with _LOCK:
+        if not changed:
+            _STATS["unchanged"] += 1
+            return
+        _PENDING.setdefault(name, set()).add(scope or _ALL)
+        merged = _saved()
+        for key, scopes in _PENDING.items():
+            merged.setdefault(key, set()).update(scopes)
+        _save(merged)
+    _print_action(f"# trigger {name}" + (f" ({scope})" if scope else "") + " queued for the end of the run")
+
+
+def pending() -> Dict[str, List[str]]:
+    """Return the triggers that would run now, with their scopes (this run's and earlier runs' leftovers)."""
+    with _LOCK:
+        merged = _saved()
+        for key, scopes in _PENDING.items():
+            merged.setdefault(key, set()).update(scopes)
+    return {name: sorted(scopes) for name, scopes in merged.items() if name in _HANDLERS}
+
+
+def run_pending(run: Callable) -> bool:
+    """
+    Run every pending trigger once, in order, and record the timings in the run summary.
+
+    Returns:
+        True if all of them succeeded; failed ones stay pending for the next run.
+    """
+    with _LOCK:
+        todo = _saved()
+        for key, scopes in _PENDING.items():
+            todo.setdefault(key, set()).update(scopes)
+        _PENDING.clear()
+        order = [name for name in _HANDLERS if name in todo]
+
+    failed: Dict[str, Set[str]] = {}
+    for name in order:
+        scopes = todo[name]
+        label = name + (f" [{', '.join(sorted(scopes))}]" if _ALL not in scopes else "")
+        started = time.monotonic()
+        try:
+            ok = bool(_HANDLERS[name](run, scopes))
+        except Exception as exc:
+            _print_error(f"Trigger {name} crashed: {exc}")
+            ok = False
+        elapsed = time.monotonic() - started
+        run_report.add("Triggers", f"{label}: {'ran' if ok else 'FAILED'} in {elapsed:.2f}s")
+        if not ok:
+            failed[name] = scopes
+
+    with _LOCK:
+        for key, scopes in _PENDING.items():  # notified while we were running
+            failed.setdefault(key, set()).update(scopes)
+        _save(failed)
+        unchanged = _STATS["unchanged"]
+        _STATS["unchanged"] = 0
+    if unchanged:
+        run_report.add("Triggers", f"{unchanged} notification(s) without changes; nothing to run for them")
+    if failed:
+        print(f"⚠️  Trigger(s) failed and will be retried next run: {', '.join(failed)}")
+    return not failed
+
+
+if __name__ == "__main__":
+    # Demonstration: show what would run at the end of a run (nothing is executed).
+    for trigger, trigger_scopes in pending().items():
+        print(f"{trigger:<14} {', '.join(trigger_scopes)}")
+    print(f"handlers: {', '.join(_HANDLERS)}")
@@ -2,7 +2,7 @@
 #!/usr/bin/env python3
 """
 Yay install helper (AUR) that is compatible with your sudo session flow.
-Version: 2.0.0
+Version: 2.4.0
 
 What the module does
 --------------------
@@ -20,15 +20,30 @@ Key behavior
 ------------
 - Uses: yay -S --needed --noconfirm <packages...>
   * `--needed` makes the operation idempotent (already-installed packages are skipped).
+- Packages already installed (read in-process from the local pacman database
+  via utils.pacman_db) are filtered out unless the AUR has a newer version
+  (utils.aur_rpc, cached AUR metadata with a TTL; `AUR_UPGRADE_CHECK=0`
+  turns the check off). When everything is installed and current, yay is
+  not started at all.
+- When a sudo runner is passed as `run`, packages are built by the parallel
+  AUR engine in utils.aur instead (dependency graph, concurrent makepkg,
+  one final `pacman -U`); `AUR_BUILDER=yay` keeps the single `yay -S`.
 - Prints shell-like actions before running.
 - Catches exceptions, prints clear errors, returns True/False.
 - Preflight note: we warn if non-interactive sudo is not yet available, so the user
   understands a prompt might occur (useful outside your main flow).
+- Preflight checks (`which yay`, `sudo -n true`) are cached for the session once
+  they succeed, so repeated calls do not spawn them again.
+- Modules that can wait should queue AUR packages with utils.aur_queue instead;
+  the loader installs the whole queue with one call at the end of the run.
 
 Public API
 ----------
+pending_packages(packages: list[str]) -> list[str]
+    The packages that are missing or have a newer AUR version.
 install_packages(packages: list[str], run=None) -> bool
-    Install one or more packages using yay as the current user.
+    Install one or more packages using yay as the current user (or, with
+    `run`, the parallel AUR engine).
 
 Example
 -------
@@ -39,10 +54,20 @@ ok = install_packages(["google-chrome", "visual-studio-code-bin"])
 
 from __future__ import annotations
 
-from typing import Iterable, List
+from typing import Dict, Iterable, List
+import os
 import shutil
 import subprocess
 import sys
+import threading
+
+from utils import aur, aur_rpc, pacman_db
+from utils.pacman import PACKAGE_LOCK, note_avoided
+
+# Successful preflight results, kept for the session (a failure is checked again next time,
+# e.g. yay gets bootstrapped by 000_core or the sudo timestamp gets seeded).
+_PREFLIGHT: Dict[str, bool] = {}
+_PREFLIGHT_LOCK = threading.Lock()
 
 
 def _print_action(command_like: str) -> None:
@@ -67,23 +92,52 @@ def _check_yay_available() -> bool:
     Returns:
         True if yay is found; False otherwise (with an error printed).
     """
+    if _PREFLIGHT.get("yay"):
+        return True
     yay_path = shutil.which("yay")
     if yay_path is None:
         _print_error("The 'yay' command was not found in PATH. Install yay before using this module.")
         return False
+    with _PREFLIGHT_LOCK:
+        _PREFLIGHT["yay"] = True
     return True
 
 
 def _noninteractive_sudo_available() -> bool:
     """
     Return True if sudo can be used without prompting (timestamp valid or NOPASSWD).
-    We probe with a harmless no-op: `sudo -n true`.
+    We probe with a harmless no-op: `sudo -n true` (once per session; the
+    sudo session keep-alive keeps the timestamp valid afterwards).
     """
+    if _PREFLIGHT.get("sudo"):
+        return True
     try:
         res = subprocess.run(["sudo", "-n", "true"], check=False, capture_output=False, text=True)
-        return res.returncode == 0
     except Exception:
         return False
+    if res.returncode != 0:
+        return False
+    with _PREFLIGHT_LOCK:
+        _PREFLIGHT["sudo"] = True
+    return True
+
+
+def pending_packages(packages: List[str]) -> List[str]:
+    """
+    Return the packages that need yay: not installed, or installed with a newer AUR version.
+
+    The AUR versions come from utils.aur_rpc's metadata cache, so this usually
+    costs no request at all (`AUR_UPGRADE_CHECK=0` skips the comparison).
+    """
+    missing = pacman_db.missing_packages(packages)
+    installed = [p for p in packages if p not in missing]
+    if not installed or os.environ.get("AUR_UPGRADE_CHECK", "1") == "0":
+        return missing
+    _, newer, _ = aur_rpc.outdated(installed)
+    aur_rpc.report()
+    if newer:
+        print(f"ℹ️  Newer AUR version available for: {', '.join(newer)}")
+    return [p for p in packages if p in missing or p in newer]
 
 
 def install_packages(packages: List[str], run=None) -> bool:
@@ -94,7 +148,8 @@ def install_packages(packages: List[str], run=None) -> bool:
         packages:
             A list of package names (strings), e.g., ["google-chrome", "visual-studio-code-bin"].
         run:
-            Ignored (accepted for API symmetry with pacman). yay must run as a normal user.
+            Optional sudo runner. When given, packages are built by utils.aur in
+            parallel and installed through it; yay itself is never run with sudo.
 
     Returns:
         True on success (including no-op for empty list), False on failure.
@@ -105,14 +160,24 @@ def install_packages(packages: List[str], run=None) -> bool:
         - Prints actions and surfaces diagnostics on failure.
     """
     try:
-        if not _check_yay_available():
-            return False
-
         cleaned = [p.strip() for p in packages if isinstance(p, str) and p.strip()]
         if not cleaned:
             _print_action("yay -S --needed --noconfirm  # (no packages provided; nothing to do)")
             return True
 
+        missing = pending_packages(cleaned)
+        if not missing:
+            note_avoided()
+            _print_action(f"{_join(['yay', '-S', '--needed', *cleaned])}  # installed and up to date; skipped")
+            return True
+        cleaned = missing
+
+        if run is not None and os.environ.get("AUR_BUILDER", "parallel") != "yay":
+            return aur.install_packages(cleaned, run)
+
+        if not _check_yay_available():
+            return False
+
         # Helpful heads-up when running outside your main seeded flow.
         if not _noninteractive_sudo_available():
             print(
@@ -124,7 +189,9 @@ def install_packages(packages: List[str], run=None) -> bool:
         _print_action(_join(cmd))
 
         # Run as the current user (NOT via sudo). yay will escalate internally if needed.
-        result = subprocess.run(cmd, check=False, text=True, capture_output=False)
+        # yay ends in a pacman transaction, so it shares the package lock.
+        with PACKAGE_LOCK:
+            result = subprocess.run(cmd, check=False, text=True, capture_output=False)
 
         if result.returncode != 0:
             _print_error("yay failed with a non-zero exit status.")